@@ -0,0 +1,71 @@
+"""
+Time ColumnLineageNoConn on single example files, the sqlglot parsing is left out.
+
+    PYTHONPATH=. python benchmarks/bench_column_lineage.py
+    PYTHONPATH=. python benchmarks/bench_column_lineage.py --files mimic-iii/severityscores/sapsii.sql
+
+The files are relative to the bundled examples, the default is the apsiii and elixhauser files.
+"""
+import argparse
+import os
+import time
+
+import lineagex
+from lineagex.ColumnLineageNoConn import ColumnLineageNoConn
+from lineagex.Instrumentation import Instrumentation
+from lineagex.LineageXNoConn import parse_sql
+from lineagex.SqlToDict import SqlToDict
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+FILES = [
+    "mimic-iii/severityscores/apsiii.sql",
+    "mimic-iv/score/apsiii.sql",
+    "mimic-iii/comorbidity/elixhauser_ahrq_v37.sql",
+    "mimic-iii/comorbidity/elixhauser_ahrq_v37_no_drg.sql",
+    "mimic-iii/comorbidity/elixhauser_quan.sql",
+    "mimic-iii/comorbidity/elixhauser_score_ahrq.sql",
+    "mimic-iii/comorbidity/elixhauser_score_quan.sql",
+]
+SCHEMAS = [
+    "mimiciii_clinical",
+    "mimiciii_derived",
+    "mimiciv_icu",
+    "mimiciv_hosp",
+    "mimiciv_derived",
+    "public",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--files", nargs="+", default=FILES)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    total = 0.0
+    for f in args.files:
+        s2d = SqlToDict(
+            path=os.path.join(EXAMPLES_DIR, f),
+            schema_list=SCHEMAS,
+            instrumentation=Instrumentation(verbose=False),
+        )
+        for name, sql in s2d.sql_files_dict.items():
+            sql_ast = parse_sql(sql=sql)
+            elapsed = []
+            for _ in range(args.repeat):
+                # ColumnLineageNoConn changes the AST
+                ast = sql_ast.copy()
+                start_time = time.perf_counter()
+                ColumnLineageNoConn(sql=sql, input_table_dict={}, sql_ast=ast)
+                elapsed.append(time.perf_counter() - start_time)
+            total += min(elapsed)
+            print("{:<55} {:.3f}s".format(f + " " + name, min(elapsed)))
+    print("{:<55} {:.3f}s".format("total", total))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Time ColumnLineageNoConn on statements over wide source tables, with the lowercase column indexes and with the
+columns lowered again on every lookup as before.
+
+    PYTHONPATH=. python benchmarks/bench_columns.py --columns 1000 --tables 3
+
+The statement selects every column of the source tables unqualified and in upper case through a CTE, so each column
+is looked up in input_table_dict and in the CTE.
+"""
+import argparse
+import time
+
+from sqlglot import parse_one
+
+from lineagex.ColumnLineageNoConn import ColumnLineageNoConn
+
+
+class Unindexed(ColumnLineageNoConn):
+    def _input_columns_lower(self, table=""):
+        return [x.lower() for x in self.input_table_dict[table]]
+
+    def _cte_columns_lower(self, table=""):
+        return {k.lower(): k for k in self.cte_dict[table]}
+
+
+def make_statement(columns, tables):
+    input_table_dict = {}
+    names = []
+    for t in range(tables):
+        cols = ["t{}_col_{}".format(t, c) for c in range(columns)]
+        input_table_dict["s.t{}".format(t)] = cols
+        names.extend(cols)
+    from_clause = ", ".join("s.t{}".format(t) for t in range(tables))
+    select = ", ".join(n.upper() for n in names)
+    sql = "WITH c AS (SELECT {0} FROM {1}) SELECT {0} FROM c".format(
+        select, from_clause
+    )
+    return sql, input_table_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--columns", type=int, default=1000)
+    parser.add_argument("--tables", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sql, input_table_dict = make_statement(args.columns, args.tables)
+    results = {}
+    for name, cls in [
+        ("lowered per lookup", Unindexed),
+        ("indexed", ColumnLineageNoConn),
+    ]:
+        elapsed = []
+        for _ in range(args.repeat):
+            sql_ast = parse_one(sql, read="postgres")
+            start_time = time.perf_counter()
+            col_lineage = cls(
+                sql=sql, input_table_dict=input_table_dict, sql_ast=sql_ast
+            )
+            elapsed.append(time.perf_counter() - start_time)
+        results[name] = col_lineage.column_dict
+        print(
+            "{:<20} {} columns {:.3f}s".format(
+                name, len(col_lineage.column_dict), min(elapsed)
+            )
+        )
+    print("same lineage: {}".format(len(set(map(str, results.values()))) == 1))
+
+
+if __name__ == "__main__":
+    main()
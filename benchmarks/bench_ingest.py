@@ -0,0 +1,59 @@
+"""
+Time SqlToDict reading and preprocessing a tree of many sql files with a growing number of worker processes.
+
+    PYTHONPATH=. python benchmarks/bench_ingest.py --copies 100 --jobs 1 2 4 8
+
+The tree is the bundled example corpora copied many times. The SQLs must be the same with any number of workers.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+import lineagex
+from lineagex.Instrumentation import Instrumentation
+from lineagex.SqlToDict import SqlToDict
+from lineagex.utils import get_files
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--copies", type=int, default=100)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    files = get_files(path=EXAMPLES_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.copies):
+            copy_dir = os.path.join(tmp, str(i))
+            os.mkdir(copy_dir)
+            for f in files:
+                shutil.copy(f, os.path.join(copy_dir, os.path.basename(f)))
+        print("{} files".format(len(files) * args.copies))
+        serial = None
+        for jobs in args.jobs:
+            instrumentation = Instrumentation(verbose=False)
+            s2d = SqlToDict(
+                path=tmp,
+                schema_list=["public"],
+                instrumentation=instrumentation,
+                jobs=jobs,
+            )
+            sql = list(s2d.sql_files_dict.items())
+            if serial is None:
+                serial = sql
+            print(
+                "jobs {:>2}  {} SQLs  ingestion {:.2f}s  same as the first {}".format(
+                    jobs, len(sql), instrumentation.ingest_time, sql == serial
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Time the removal of the database names before the schemas in SqlToDict._preprocess_sql with many schemas, as with
+a db connection where every schema of the database is given.
+
+    python benchmarks/bench_preprocess.py --schemas 500 --statements 10000
+
+The combined pattern of schema_prefix_regex is compared with one re.sub per schema, the way it was done before, on
+the same statements and checked to give the same sql. The whole SqlToDict run over the statements is timed as well.
+"""
+import argparse
+import contextlib
+import io
+import random
+import re
+import time
+
+from lineagex.SqlToDict import SqlToDict
+from lineagex.utils import schema_prefix_regex
+
+
+def make_statements(schemas, statements, seed=0):
+    rng = random.Random(seed)
+    sql = []
+    for i in range(statements):
+        s1, s2, s3 = rng.sample(schemas, 3)
+        sql.append(
+            "CREATE TABLE {}.table{} AS SELECT a.x, b.y, c.z FROM db.{}.t a JOIN {}.u b ON a.id = b.id "
+            "JOIN server.db.{}.v c ON c.id = a.id WHERE (a.x > 1)".format(
+                s1, i, s2, s3, s1
+            )
+        )
+    return sql
+
+
+def per_schema(sql, schemas):
+    for i in schemas:
+        sql = re.sub("[^ (,]*(\\.{}\\.)".format(i), "{}.".format(i), sql)
+    return sql
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--schemas", type=int, default=500)
+    parser.add_argument("--statements", type=int, default=10000)
+    parser.add_argument(
+        "--per-schema-statements",
+        type=int,
+        default=1000,
+        help="the one re.sub per schema is only timed on this many statements, it is slow",
+    )
+    args = parser.parse_args()
+
+    schemas = ["schema{}".format(i) for i in range(args.schemas)]
+    sql = make_statements(schemas, args.statements)
+
+    start_time = time.perf_counter()
+    regex = schema_prefix_regex(schemas)
+    compile_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    combined = [regex.sub(r"\1.", s) for s in sql]
+    combined_time = time.perf_counter() - start_time
+
+    sample = sql[: args.per_schema_statements]
+    start_time = time.perf_counter()
+    expected = [per_schema(s, schemas) for s in sample]
+    per_schema_time = time.perf_counter() - start_time
+    assert expected == combined[: len(sample)], "the combined pattern gives other sql"
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        s2d = SqlToDict(path=sql, schema_list=schemas)
+    run_time = time.perf_counter() - start_time
+
+    print("{} schemas, {} statements".format(args.schemas, args.statements))
+    print("  compile the combined pattern  {:.4f}s".format(compile_time))
+    print(
+        "  combined pattern              {:.4f}s ({:.1f} us per statement)".format(
+            combined_time, combined_time / len(sql) * 1e6
+        )
+    )
+    print(
+        "  one re.sub per schema         {:.4f}s for {} statements ({:.1f} us per statement), same sql".format(
+            per_schema_time,
+            len(sample),
+            per_schema_time / len(sample) * 1e6,
+        )
+    )
+    print(
+        "  SqlToDict                     {:.4f}s for {} statements".format(
+            run_time, len(s2d.sql_files_dict)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
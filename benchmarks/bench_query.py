@@ -0,0 +1,62 @@
+"""
+Measure the LineageQuery throughput on the synthetic project of bench_store.py.
+
+    python benchmarks/bench_query.py --tables 1000 --columns 100 --queries 5000
+
+Reports the time to build the index, and the queries per second for random columns both ways, first with an empty
+memo and then with the memo of the first pass.
+"""
+import argparse
+import json
+import random
+import time
+
+from bench_store import synthetic_lineage
+from lineagex.LineageQuery import LineageQuery
+
+
+def run(q, columns, **kwargs):
+    start_time = time.perf_counter()
+    reached = 0
+    for c in columns:
+        reached += len(q.upstream(c, **kwargs)) + len(q.downstream(c, **kwargs))
+    return 2 * len(columns) / (time.perf_counter() - start_time), reached
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--columns", type=int, default=100)
+    parser.add_argument("--queries", type=int, default=5000)
+    args = parser.parse_args()
+
+    output_dict = json.loads(
+        synthetic_lineage(tables=args.tables, columns=args.columns)
+    )
+    start_time = time.perf_counter()
+    q = LineageQuery(output_dict=output_dict)
+    print(
+        "index of {} columns built in {:.2f}s".format(
+            len(q.columns), time.perf_counter() - start_time
+        )
+    )
+    rng = random.Random(0)
+    columns = rng.sample(sorted(q.store.names[i] for i in q.columns), args.queries)
+    for label, kwargs in [
+        ("transitive", {}),
+        ("transitive, direct only", {"direct_only": True}),
+        ("depth 2", {"depth": 2}),
+    ]:
+        cold, reached = run(q, columns, **kwargs)
+        warm, _ = run(q, columns, **kwargs)
+        print(
+            "{}: {:,.0f} queries/s, {:,.0f} with the memo, {:.0f} columns reached on average".format(
+                label, cold, warm, reached / 2 / len(columns)
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Profile the no-connection run over the bundled example corpora and report how much of it is spent in sqlglot's
+Expression.sql, which renders a node back to sql through the generator.
+
+    PYTHONPATH=. python benchmarks/bench_render.py
+    PYTHONPATH=. python benchmarks/bench_render.py --corpora mimic-iii --top 15
+
+The parsing is profiled as well, the share of Expression.sql is given both of the whole run and of the time in
+ColumnLineageNoConn.
+"""
+import argparse
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+
+import lineagex
+from lineagex.LineageXNoConn import LineageXNoConn
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+
+# the same arguments as lineagex.example
+CORPORA = {
+    "dependency_example": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "github_example": ("schema1", "schema1, public"),
+    "mimic-iii": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "mimic-iv": ("mimiciv_derived", "mimiciv_icu, mimiciv_hosp"),
+}
+
+
+def cumulative(stats: pstats.Stats, filename: str, name: str) -> tuple:
+    """
+    The number of calls and the cumulative time of the functions with the name in files ending with filename
+    """
+    calls, total = 0, 0.0
+    for (f, _, func), (_, nc, _, ct, _) in stats.stats.items():
+        if func == name and f.endswith(filename):
+            calls += nc
+            total += ct
+    return calls, total
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--corpora", nargs="+", default=["mimic-iii", "mimic-iv"])
+    parser.add_argument("--top", type=int, default=0, help="print the top functions")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile()
+    with tempfile.TemporaryDirectory() as out_dir:
+        cwd = os.getcwd()
+        os.chdir(out_dir)
+        try:
+            for corpus in args.corpora:
+                target_schema, search_path_schema = CORPORA[corpus]
+                with contextlib.redirect_stdout(io.StringIO()):
+                    profiler.runcall(
+                        LineageXNoConn,
+                        sql=os.path.join(EXAMPLES_DIR, corpus),
+                        target_schema=target_schema,
+                        search_path_schema=search_path_schema,
+                    )
+        finally:
+            os.chdir(cwd)
+    stats = pstats.Stats(profiler)
+    _, run_time = cumulative(stats, "LineageXNoConn.py", "__init__")
+    _, lineage_time = cumulative(stats, "ColumnLineageNoConn.py", "__init__")
+    sql_calls, sql_time = cumulative(stats, os.path.join("sqlglot", "expressions.py"), "sql")
+    print("{:<30} {:.3f}s".format("run", run_time))
+    print("{:<30} {:.3f}s".format("ColumnLineageNoConn", lineage_time))
+    print(
+        "{:<30} {:.3f}s in {} calls, {:.1%} of the run, {:.1%} of ColumnLineageNoConn".format(
+            "Expression.sql",
+            sql_time,
+            sql_calls,
+            sql_time / run_time if run_time else 0,
+            sql_time / lineage_time if lineage_time else 0,
+        )
+    )
+    if args.top:
+        stats.sort_stats("cumulative").print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
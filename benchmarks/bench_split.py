@@ -0,0 +1,63 @@
+"""
+Measure the peak memory of reading dump files of growing size statement by statement, as SqlToDict does.
+
+    PYTHONPATH=. python benchmarks/bench_split.py --sizes 4 16 64
+
+The peak should stay about the same as the dump grows, only the chunk being read and the statement being split are
+held in memory, while reading the whole file grows with it.
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from bench_strip import make_dump
+from lineagex.utils import remove_comments_pg, split_sql
+
+
+def whole_file(path):
+    with open(path, mode="r", encoding="latin-1") as sql_file:
+        sql = remove_comments_pg(str1=sql_file.read())
+    return len(list(filter(None, sql.split(";"))))
+
+
+def streamed(path):
+    count = 0
+    with open(path, mode="r", encoding="latin-1") as sql_file:
+        for statement in split_sql(reader=sql_file):
+            if remove_comments_pg(str1=statement):
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=float, nargs="+", default=[4, 16, 64], help="in MB"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.sql")
+        for size in args.sizes:
+            with open(path, mode="w", encoding="latin-1") as sql_file:
+                sql_file.write(make_dump(int(size * 1024 * 1024)))
+            line = "{:>6.1f} MB".format(size)
+            for name, func in [("whole file", whole_file), ("streamed", streamed)]:
+                tracemalloc.start()
+                start_time = time.perf_counter()
+                count = func(path)
+                elapsed = time.perf_counter() - start_time
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                line += "  {} {} statements {:.2f}s peak {:.1f} MB".format(
+                    name, count, elapsed, peak / 1024 / 1024
+                )
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Time each stage of the no-connection pipeline over the bundled example corpora, and compare with a baseline.
+
+    python benchmarks/bench_stages.py --output bench.json
+    python benchmarks/bench_stages.py --baseline bench.json --threshold 0.2 --stage-threshold parse=0.5
+
+The stages are file reading, comment stripping, SqlToDict._preprocess_sql, sqlglot parsing, ColumnLineageNoConn,
+produce_json and the HTML writing, the rest of the run is reported as other. File reading is timed in a separate
+pass over the same files, the other stages are timed inside a real run. The peak memory is taken with tracemalloc
+in one more run, so it does not slow down the timed runs.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import sqlglot
+
+import lineagex
+import lineagex.LineageXNoConn
+import lineagex.SqlToDict
+import lineagex.utils
+from lineagex.LineageXNoConn import LineageXNoConn
+from lineagex.utils import get_files
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+
+# the same arguments as lineagex.example
+CORPORA = {
+    "dependency_example": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "github_example": ("schema1", "schema1, public"),
+    "mimic-iii": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "mimic-iv": ("mimiciv_derived", "mimiciv_icu, mimiciv_hosp"),
+}
+
+STAGES = [
+    "read",
+    "strip_comments",
+    "preprocess",
+    "parse",
+    "column_lineage",
+    "produce_json",
+    "html",
+]
+
+
+class StageTimer:
+    """
+    Patch the functions of each stage so the time spent in them is added up while the pipeline runs
+    """
+
+    def __init__(self) -> None:
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self.patches = []
+        # the time of the stages called from inside each running stage, so every stage is timed exclusively
+        self.child_times = []
+
+    def wrap(self, owner, attr, stage):
+        func = getattr(owner, attr)
+
+        def timed(*args, **kwargs):
+            self.child_times.append(0.0)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start_time
+                self.times[stage] += elapsed - self.child_times.pop()
+                if self.child_times:
+                    self.child_times[-1] += elapsed
+
+        self.patches.append((owner, attr, func))
+        setattr(owner, attr, timed)
+
+    def __enter__(self):
+        self.wrap(lineagex.SqlToDict, "remove_comments_pg", "strip_comments")
+        self.wrap(lineagex.SqlToDict, "remove_comments_sqlite", "strip_comments")
+        self.wrap(lineagex.SqlToDict.SqlToDict, "_rewrite_sql", "preprocess")
+        self.wrap(lineagex.SqlToDict.SqlToDict, "_add_sql", "preprocess")
+        self.wrap(lineagex.LineageXNoConn, "parse_sql", "parse")
+        self.wrap(lineagex.LineageXNoConn, "ColumnLineageNoConn", "column_lineage")
+        self.wrap(lineagex.utils, "_produce_html", "html")
+        self.wrap(lineagex.LineageXNoConn, "produce_json", "produce_json")
+        return self
+
+    def __exit__(self, *exc):
+        for owner, attr, func in reversed(self.patches):
+            setattr(owner, attr, func)
+        self.patches = []
+
+
+def read_files(path):
+    start_time = time.perf_counter()
+    size = 0
+    files = get_files(path=path)
+    for f in files:
+        with open(f, mode="r", encoding="latin-1") as sql_file:
+            size += len(sql_file.read())
+    return time.perf_counter() - start_time, len(files), size
+
+
+def run_corpus(name, measure_memory=False):
+    target_schema, search_path_schema = CORPORA[name]
+    path = os.path.join(EXAMPLES_DIR, name)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                if measure_memory:
+                    tracemalloc.start()
+                    LineageXNoConn(
+                        sql=path,
+                        target_schema=target_schema,
+                        search_path_schema=search_path_schema,
+                    )
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    return peak
+                with StageTimer() as timer:
+                    start_time = time.perf_counter()
+                    lx = LineageXNoConn(
+                        sql=path,
+                        target_schema=target_schema,
+                        search_path_schema=search_path_schema,
+                    )
+                    total_time = time.perf_counter() - start_time
+        finally:
+            os.chdir(cwd)
+    timer.times["read"], files, size = read_files(path)
+    return total_time, timer.times, files, size, len(lx.sql_files_dict)
+
+
+def bench(names, repeat):
+    results = {
+        "lineagex": lineagex.__version__,
+        "sqlglot": sqlglot.__version__,
+        "python": platform.python_version(),
+        "repeat": repeat,
+        "corpora": {},
+    }
+    for name in names:
+        runs = [run_corpus(name) for _ in range(repeat)]
+        stages = {s: statistics.median([r[1][s] for r in runs]) for s in STAGES}
+        total = statistics.median([r[0] for r in runs])
+        # the file reading pass is outside the timed run
+        stages["other"] = max(
+            total - sum(v for k, v in stages.items() if k != "read"), 0.0
+        )
+        results["corpora"][name] = {
+            "files": runs[0][2],
+            "bytes": runs[0][3],
+            "statements": runs[0][4],
+            "total": total,
+            "stages": stages,
+            "peak_memory": run_corpus(name, measure_memory=True),
+        }
+    return results
+
+
+def compare(results, baseline, threshold, stage_thresholds, memory_threshold, min_time):
+    """
+    Compare the results with the baseline
+    :return: the list of regressions, each a (corpus, metric, baseline value, new value) tuple
+    """
+    regressions = []
+    for name, result in results["corpora"].items():
+        base = baseline["corpora"].get(name)
+        if base is None:
+            continue
+        metrics = [("total", base["total"], result["total"], threshold)]
+        for stage, value in result["stages"].items():
+            if stage in base["stages"]:
+                metrics.append(
+                    (
+                        stage,
+                        base["stages"][stage],
+                        value,
+                        stage_thresholds.get(stage, threshold),
+                    )
+                )
+        for metric, old, new, limit in metrics:
+            # very short stages are mostly noise
+            if new - old > min_time and new > old * (1 + limit):
+                regressions.append((name, metric, old, new))
+        old, new = base["peak_memory"], result["peak_memory"]
+        if new > old * (1 + memory_threshold):
+            regressions.append((name, "peak_memory", old, new))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    for name, result in results["corpora"].items():
+        base = baseline["corpora"].get(name) if baseline else None
+        print(
+            "{}: {} files, {} statements, total {:.3f}s, peak memory {:.1f} MB".format(
+                name,
+                result["files"],
+                result["statements"],
+                result["total"],
+                result["peak_memory"] / 1024 / 1024,
+            )
+        )
+        for stage in STAGES + ["other"]:
+            line = "  {:<16} {:8.4f}s".format(stage, result["stages"][stage])
+            if base and stage in base["stages"]:
+                line += "  (baseline {:.4f}s)".format(base["stages"][stage])
+            print(line)
+
+
+def parse_stage_thresholds(values):
+    stage_thresholds = {}
+    for value in values:
+        stage, _, limit = value.partition("=")
+        if stage not in STAGES + ["other"]:
+            raise SystemExit(
+                "unknown stage {}, the stages are {}".format(
+                    stage, ", ".join(STAGES + ["other"])
+                )
+            )
+        stage_thresholds[stage] = float(limit)
+    return stage_thresholds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=sorted(CORPORA),
+        help="defaults to all of them",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument(
+        "--baseline", help="a JSON file from a previous run to compare with"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="allowed relative slowdown, 0.2 is 20%%",
+    )
+    parser.add_argument(
+        "--stage-threshold",
+        action="append",
+        default=[],
+        metavar="STAGE=LIMIT",
+        help="allowed relative slowdown of one stage, overrides --threshold",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.1,
+        help="allowed relative peak memory growth",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.05,
+        help="slowdowns below this many seconds are ignored",
+    )
+    args = parser.parse_args()
+    stage_thresholds = parse_stage_thresholds(args.stage_threshold)
+
+    results = bench(args.corpus or sorted(CORPORA), args.repeat)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+    print_results(results, baseline=baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        regressions = compare(
+            results,
+            baseline,
+            threshold=args.threshold,
+            stage_thresholds=stage_thresholds,
+            memory_threshold=args.memory_threshold,
+            min_time=args.min_time,
+        )
+        for name, metric, old, new in regressions:
+            print("REGRESSION {} {}: {:.4g} -> {:.4g}".format(name, metric, old, new))
+        if regressions:
+            sys.exit(1)
+        print("no regressions against {}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Time the no-connection run over generated models that expand a star over a wide upstream table.
+
+    PYTHONPATH=. python benchmarks/bench_star.py
+    PYTHONPATH=. python benchmarks/bench_star.py --width 2000 --models 500
+
+One model builds the wide table from a base table, the others take SELECT *, SELECT w.* and SELECT COUNT(*) over it
+in turn. The time of ColumnLineageNoConn is the resolve time of the run, the rest of the run is left out.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from lineagex.LineageXNoConn import LineageXNoConn
+
+STARS = [
+    "SELECT * FROM sch.wide",
+    "SELECT w.* FROM sch.wide w",
+    "SELECT COUNT(*) AS n FROM sch.wide WHERE c0 > 0",
+]
+
+
+def write_models(path: str, width: int, models: int) -> None:
+    with open(os.path.join(path, "wide.sql"), "w") as f:
+        f.write(
+            "SELECT {} FROM raw.src s;\n".format(
+                ", ".join("s.c{}".format(i) for i in range(width))
+            )
+        )
+    for i in range(models):
+        with open(os.path.join(path, "model_{}.sql".format(i)), "w") as f:
+            f.write(STARS[i % len(STARS)] + ";\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--width", type=int, default=1000)
+    parser.add_argument("--models", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as sql_dir, tempfile.TemporaryDirectory() as out_dir:
+        write_models(path=sql_dir, width=args.width, models=args.models)
+        cwd = os.getcwd()
+        os.chdir(out_dir)
+        try:
+            resolve, total = [], []
+            for _ in range(args.repeat):
+                start_time = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    lx = LineageXNoConn(
+                        sql=sql_dir, target_schema="sch", search_path_schema="sch, raw"
+                    )
+                total.append(time.perf_counter() - start_time)
+                resolve.append(lx.instrumentation.resolve_time)
+        finally:
+            os.chdir(cwd)
+    print("{} models over a table of {} columns".format(args.models, args.width))
+    print("{:<20} {:.3f}s".format("ColumnLineageNoConn", min(resolve)))
+    print("{:<20} {:.3f}s".format("run", min(total)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Compare the memory of the column lineage kept as plain dicts of lists with the LineageStore LineageQuery indexes it in,
+along with the memory of a whole run over the bundled example corpora.
+
+    python benchmarks/bench_store.py --output store.json
+
+The lineage of the bundled example corpora and of a synthetic project is loaded both ways from the same JSON text, so
+every name is a separate string as it is when the lineage is built, and the memory left allocated is taken with
+tracemalloc. The time to materialize every record from the store is reported as well. The synthetic project has
+--tables tables of --columns columns, each column reading a few columns of upstream tables along with the columns
+in their WHERE clause. For the example corpora the peak memory of the run and the memory left allocated after it,
+which is mostly the output_dict, are taken with tracemalloc as well.
+"""
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+import lineagex
+from lineagex.LineageStore import LineageStore
+from lineagex.LineageXNoConn import LineageXNoConn
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+
+# the same arguments as lineagex.example
+CORPORA = {
+    "mimic-iii": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "mimic-iv": ("mimiciv_derived", "mimiciv_icu, mimiciv_hosp"),
+}
+
+
+def run_corpus(name):
+    target_schema, search_path_schema = CORPORA[name]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            gc.collect()
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                lx = LineageXNoConn(
+                    sql=os.path.join(EXAMPLES_DIR, name),
+                    target_schema=target_schema,
+                    search_path_schema=search_path_schema,
+                )
+            gc.collect()
+            run_memory, run_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            os.chdir(cwd)
+    return json.dumps(lx.output_dict), run_memory, run_peak
+
+
+def synthetic_lineage(tables, columns, seed=0):
+    rng = random.Random(seed)
+    output = {}
+    for t in range(tables):
+        name = "schema{}.table{}".format(t % 10, t)
+        upstream = [
+            "schema{}.table{}".format(u % 10, u)
+            for u in rng.sample(range(t), min(t, 3))
+        ] or ["base.table{}".format(t)]
+        where = ["{}.column{}".format(u, rng.randrange(columns)) for u in upstream]
+        output[name] = {
+            "tables": upstream,
+            "columns": {
+                "column{}".format(c): [
+                    sorted(
+                        {
+                            "{}.column{}".format(
+                                rng.choice(upstream), rng.randrange(columns)
+                            )
+                            for _ in range(rng.randint(1, 3))
+                        }
+                    ),
+                    sorted(where),
+                ]
+                for c in range(columns)
+            },
+            "table_name": name,
+            "sql": "CREATE TABLE {} AS SELECT ...".format(name),
+        }
+    return json.dumps(output)
+
+
+def measure(text):
+    tracemalloc.start()
+    output_dict = json.loads(text)
+    dict_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del output_dict
+
+    tracemalloc.start()
+    store = LineageStore()
+    for name, record in json.loads(text).items():
+        store.add(name=name, record=record)
+    store_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    start_time = time.perf_counter()
+    for name in store.records:
+        store.materialize(name=name)
+    materialize_time = time.perf_counter() - start_time
+    return {
+        "tables": len(store.records),
+        "columns": sum(len(t.columns) for t in store.records.values()),
+        "names": len(store.names),
+        "dict_memory": dict_memory,
+        "store_memory": store_memory,
+        "materialize_time": materialize_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--columns", type=int, default=100)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {"lineagex": lineagex.__version__, "projects": {}}
+    for name in sorted(CORPORA):
+        text, run_memory, run_peak = run_corpus(name)
+        results["projects"][name] = measure(text)
+        results["projects"][name].update(run_memory=run_memory, run_peak=run_peak)
+    results["projects"]["synthetic"] = measure(
+        synthetic_lineage(tables=args.tables, columns=args.columns)
+    )
+    for name, result in results["projects"].items():
+        print(
+            "{}: {} tables, {} columns, {} distinct names, dict {:.2f} MB, store {:.2f} MB ({:.0%}), "
+            "materialize all {:.3f}s".format(
+                name,
+                result["tables"],
+                result["columns"],
+                result["names"],
+                result["dict_memory"] / 1024 / 1024,
+                result["store_memory"] / 1024 / 1024,
+                result["store_memory"] / result["dict_memory"],
+                result["materialize_time"],
+            )
+        )
+    for name in sorted(CORPORA):
+        print(
+            "{} run: peak {:.2f} MB, {:.2f} MB left allocated after the run".format(
+                name,
+                results["projects"][name]["run_peak"] / 1024 / 1024,
+                results["projects"][name]["run_memory"] / 1024 / 1024,
+            )
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
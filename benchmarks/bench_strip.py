@@ -0,0 +1,60 @@
+"""
+Time the comment stripping on dump files of growing size built from the bundled example corpora.
+
+    python benchmarks/bench_strip.py --sizes 1 2 4 8
+
+The time per MB should stay the same as the dump grows, the stripping is linear in the size of the sql.
+"""
+import argparse
+import os
+import time
+
+import lineagex
+from lineagex.utils import get_files, remove_comments_pg, remove_comments_sqlite
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+
+
+def make_dump(size):
+    """
+    Concatenate the example files until the dump has size bytes
+    """
+    sql = []
+    for f in get_files(path=EXAMPLES_DIR):
+        with open(f, mode="r", encoding="latin-1") as sql_file:
+            sql.append(sql_file.read())
+    corpus = "\n".join(sql)
+    return (corpus * (size // len(corpus) + 1))[:size]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--sizes", type=float, nargs="+", default=[1, 2, 4, 8], help="in MB"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        dump = make_dump(int(size * 1024 * 1024))
+        line = "{:>6.1f} MB".format(size)
+        for name, func in [
+            ("pg", remove_comments_pg),
+            ("sqlite", remove_comments_sqlite),
+        ]:
+            elapsed = []
+            for _ in range(args.repeat):
+                start_time = time.perf_counter()
+                func(str1=dump)
+                elapsed.append(time.perf_counter() - start_time)
+            best = min(elapsed)
+            line += "  {} {:.3f}s ({:.3f}s/MB)".format(name, best, best / size)
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the transactional scratch mode of LineageXWithConn with the create/drop path.
+
+    python benchmarks/bench_transactional.py --conn-string postgresql://... --sql lineagex/examples/mimic-iii \
+        --target-schema mimiciii_derived --search-path-schema "mimiciii_clinical, public"
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from lineagex.LineageXWithConn import LineageXWithConn
+
+
+def run(args, transactional):
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            start_time = time.time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                lx = LineageXWithConn(
+                    sql=args.sql,
+                    target_schema=args.target_schema,
+                    conn_string=args.conn_string,
+                    search_path_schema=args.search_path_schema,
+                    transactional=transactional,
+                )
+            total_time = time.time() - start_time
+        finally:
+            os.chdir(cwd)
+    return total_time, lx.cleanup_time, len(lx.new_view_list), lx.output_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conn-string", required=True)
+    parser.add_argument("--sql", required=True)
+    parser.add_argument("--target-schema", default="public")
+    parser.add_argument("--search-path-schema", default="public")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    args.sql = os.path.abspath(args.sql)
+
+    results = {}
+    outputs = {}
+    for transactional in [False, True]:
+        times = [run(args, transactional) for _ in range(args.repeat)]
+        results[transactional] = times
+        outputs[transactional] = times[-1][3]
+    for transactional, times in results.items():
+        print(
+            "{:<14} {} tables, total {:.3f}s, cleanup {:.4f}s (median of {})".format(
+                "transactional" if transactional else "create/drop",
+                times[0][2],
+                statistics.median([t[0] for t in times]),
+                statistics.median([t[1] for t in times]),
+                len(times),
+            )
+        )
+    saved = statistics.median([t[0] for t in results[False]]) - statistics.median(
+        [t[0] for t in results[True]]
+    )
+    print("time saved: {:.3f}s".format(saved))
+    print("same output: {}".format(outputs[False] == outputs[True]))
+
+
+if __name__ == "__main__":
+    main()
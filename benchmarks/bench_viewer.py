@@ -0,0 +1,187 @@
+"""
+Compare the inline lineage payload of index.html with the sharded one over the bundled example corpora.
+
+    python benchmarks/bench_viewer.py --shard-by table --output viewer.json
+
+For each corpus this reports the bytes the viewer has to load before it can show anything, the bytes of the shards
+loaded when index.html is opened with a table in the hash of the url (the tables upstream and downstream of it),
+averaged over all the tables, and the time and peak memory of parsing the initial payload. The parsing is done with the json
+module as a stand-in for JSON.parse in the browser, there is no browser to measure the viewer itself.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import lineagex
+from lineagex.LineageXNoConn import LineageXNoConn
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+
+# the same arguments as lineagex.example
+CORPORA = {
+    "dependency_example": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "github_example": ("schema1", "schema1, public"),
+    "mimic-iii": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "mimic-iv": ("mimiciv_derived", "mimiciv_icu, mimiciv_hosp"),
+}
+
+
+def run_corpus(name, shard_by):
+    """
+    Run the corpus inline and sharded
+    :return: the inline html, the manifest and the shard file -> content
+    """
+    target_schema, search_path_schema = CORPORA[name]
+    path = os.path.join(EXAMPLES_DIR, name)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for s in [None, shard_by]:
+                    LineageXNoConn(
+                        sql=path,
+                        target_schema=target_schema,
+                        search_path_schema=search_path_schema,
+                        shard_by=s,
+                    )
+                    if s is None:
+                        with open("index.html", "r", encoding="utf-8") as f:
+                            html = f.read()
+            with open("lineage/manifest.js", "r", encoding="utf-8") as f:
+                manifest = f.read()
+            shards = {}
+            for f in os.listdir("lineage/shards"):
+                shard = "lineage/shards/" + f
+                with open(shard, "r", encoding="utf-8") as shard_file:
+                    shards[shard] = shard_file.read()
+        finally:
+            os.chdir(cwd)
+    return html, manifest, shards
+
+
+def parse(payload):
+    """
+    Time and trace parsing the JSON in the payload
+    :return: the parsed object, the seconds and the peak memory in bytes
+    """
+    text = payload[payload.index("{") : payload.rindex("}") + 1]
+    if "inlineSource" in payload:
+        # undo the escaping of _produce_html
+        text = text.replace("\\u0022", '"')
+    start_time = time.perf_counter()
+    obj = json.loads(text)
+    elapsed = time.perf_counter() - start_time
+    tracemalloc.start()
+    json.loads(text)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return obj, elapsed, peak
+
+
+def table_bytes(tables, shards, name):
+    """
+    The bytes of the shards loaded for the table in the hash of the url, the same tables lineagex/shards.js loads
+    """
+    needed = {name}
+    for direction in ["upstream", "downstream"]:
+        todo = [name]
+        while todo:
+            for n in tables[todo.pop()][direction]:
+                if n not in needed:
+                    needed.add(n)
+                    todo.append(n)
+    return sum(
+        len(shards[s].encode("utf-8")) for s in {tables[t]["shard"] for t in needed}
+    )
+
+
+def bench(names, shard_by):
+    results = {"lineagex": lineagex.__version__, "shard_by": shard_by, "corpora": {}}
+    for name in names:
+        html, manifest, shards = run_corpus(name, shard_by)
+        _, inline_time, inline_peak = parse(html)
+        manifest_obj, manifest_time, manifest_peak = parse(manifest)
+        tables = manifest_obj["tables"]
+        results["corpora"][name] = {
+            "tables": len(tables),
+            "shards": len(shards),
+            "inline": {
+                "initial_bytes": len(html.encode("utf-8")),
+                "parse_time": inline_time,
+                "parse_peak_memory": inline_peak,
+            },
+            "sharded": {
+                "initial_bytes": len(manifest.encode("utf-8")),
+                "parse_time": manifest_time,
+                "parse_peak_memory": manifest_peak,
+                "table_bytes": statistics.mean(
+                    table_bytes(tables, shards, t) for t in tables
+                ),
+                "total_bytes": sum(len(s.encode("utf-8")) for s in shards.values()),
+            },
+        }
+    return results
+
+
+def print_results(results):
+    for name, result in results["corpora"].items():
+        inline, sharded = result["inline"], result["sharded"]
+        print(
+            "{}: {} tables in {} shards".format(
+                name, result["tables"], result["shards"]
+            )
+        )
+        print(
+            "  inline   initial {:>10,} bytes, parse {:.4f}s, peak {:.2f} MB".format(
+                inline["initial_bytes"],
+                inline["parse_time"],
+                inline["parse_peak_memory"] / 1024 / 1024,
+            )
+        )
+        print(
+            "  sharded  initial {:>10,} bytes, parse {:.4f}s, peak {:.2f} MB".format(
+                sharded["initial_bytes"],
+                sharded["parse_time"],
+                sharded["parse_peak_memory"] / 1024 / 1024,
+            )
+        )
+        print(
+            "           one table {:>8,.0f} bytes, all shards {:,} bytes".format(
+                sharded["table_bytes"],
+                sharded["total_bytes"],
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        choices=sorted(CORPORA),
+        help="defaults to all of them",
+    )
+    parser.add_argument("--shard-by", choices=["table", "schema"], default="table")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = bench(args.corpus or sorted(CORPORA), args.shard_by)
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare fetching the view definitions for a list of view names with one query per view, as LineageXWithConn did,
+and with the one VIEW_QUERY it runs now.
+
+    python benchmarks/bench_views.py --conn-string postgresql://... --views 10000
+
+A lineagex_bench_views schema is created with the views, each reading from the table or from an earlier view, and
+dropped at the end.
+"""
+
+import argparse
+import time
+
+import psycopg2
+
+from lineagex.Catalog import VIEW_QUERY
+
+SCHEMA = "lineagex_bench_views"
+
+
+def create_views(cur, views):
+    drop_views(cur, views)
+    cur.execute("CREATE SCHEMA {};".format(SCHEMA))
+    cur.execute("CREATE TABLE {}.t (a int, b text, c int)".format(SCHEMA))
+    statements = []
+    for i in range(views):
+        source = "t" if i < 10 else "v{}".format(i // 10)
+        statements.append(
+            "CREATE VIEW {0}.v{1} AS SELECT x.a, x.b, x.c + {1} AS c FROM {0}.{2} x".format(
+                SCHEMA, i, source
+            )
+        )
+    cur.execute(";".join(statements))
+
+
+def drop_views(cur, views):
+    # in batches from the last view, one DROP SCHEMA CASCADE runs out of locks with many views
+    for end in range(views, 0, -1000):
+        cur.execute(
+            ";".join(
+                "DROP VIEW IF EXISTS {}.v{}".format(SCHEMA, i)
+                for i in range(end - 1, max(end - 1000, 0) - 1, -1)
+            )
+        )
+    cur.execute("DROP SCHEMA IF EXISTS {} CASCADE;".format(SCHEMA))
+
+
+def per_view(cur, names):
+    sql_dict = {}
+    for t in names:
+        schema, view = t.split(".")
+        cur.execute(
+            "SELECT concat_ws('.',schemaname,viewname) AS view_name, definition FROM pg_catalog.pg_views WHERE schemaname = '{}' and viewname = '{}';".format(
+                schema, view
+            )
+        )
+        for view_name, definition in cur.fetchall():
+            sql_dict[view_name] = definition
+    return sql_dict
+
+
+def batched(cur, names):
+    pairs = [t.split(".") for t in names]
+    cur.execute(VIEW_QUERY, ([p[0] for p in pairs], [p[1] for p in pairs]))
+    return {view_name: definition for view_name, definition, _, _ in cur.fetchall()}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--conn-string", required=True)
+    parser.add_argument("--views", type=int, default=10000)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.conn_string)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        create_views(cur, args.views)
+        names = ["{}.v{}".format(SCHEMA, i) for i in range(args.views)]
+        results = {}
+        for name, func in [("one query per view", per_view), ("VIEW_QUERY", batched)]:
+            start_time = time.perf_counter()
+            results[name] = func(cur, names)
+            print(
+                "{:<20} {} views {:.3f}s".format(
+                    name, len(results[name]), time.perf_counter() - start_time
+                )
+            )
+        print("same definitions: {}".format(len(set(map(str, results.values()))) == 1))
+    finally:
+        drop_views(cur, args.views)
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Time ColumnLineageNoConn on generated SELECTs with thousands of columns, the sqlglot parsing is left out.
+
+    PYTHONPATH=. python benchmarks/bench_wide_select.py
+    PYTHONPATH=. python benchmarks/bench_wide_select.py --sizes 1000 2000 4000 --shapes order_by
+
+The shapes are
+    plain: s.c0, s.c1, ... from a join with a WHERE
+    order_by: s.c0 + o.d0 AS x0, ... with every tenth of the new columns in the ORDER BY
+    group_by: s.c0 AS x0, ... with all of the new columns in the GROUP BY
+A new column in the ORDER BY or GROUP BY adds its sources to the indirect sources of every column, so the lineage
+of order_by and group_by grows with the square of the columns. The time per column of plain and the time per
+thousand edges of the lineage of all of them should stay flat as the size grows.
+"""
+import argparse
+import time
+
+from lineagex.ColumnLineageNoConn import ColumnLineageNoConn
+from lineagex.LineageXNoConn import parse_sql
+
+
+def generate(shape: str, size: int) -> str:
+    if shape == "plain":
+        return "SELECT {} FROM sch.src s JOIN sch.other o ON s.id = o.id WHERE o.flag = 1".format(
+            ", ".join("s.c{}".format(i) for i in range(size))
+        )
+    if shape == "order_by":
+        return "SELECT {} FROM sch.src s JOIN sch.other o ON s.id = o.id WHERE o.flag = 1 ORDER BY {}".format(
+            ", ".join("s.c{0} + o.d{0} AS x{0}".format(i) for i in range(size)),
+            ", ".join("x{}".format(i) for i in range(0, size, 10)),
+        )
+    if shape == "group_by":
+        return "SELECT {} FROM sch.src s GROUP BY {}".format(
+            ", ".join("s.c{0} AS x{0}".format(i) for i in range(size)),
+            ", ".join("x{}".format(i) for i in range(size)),
+        )
+    raise ValueError("unknown shape {}".format(shape))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[250, 500, 1000, 2000])
+    parser.add_argument(
+        "--shapes", nargs="+", default=["plain", "order_by", "group_by"]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        "{:<10} {:>6} {:>10} {:>9} {:>12} {:>14}".format(
+            "shape", "size", "edges", "time", "us/column", "ms/1k edges"
+        )
+    )
+    for shape in args.shapes:
+        for size in args.sizes:
+            sql = generate(shape=shape, size=size)
+            sql_ast = parse_sql(sql=sql)
+            elapsed = []
+            for _ in range(args.repeat):
+                # ColumnLineageNoConn changes the AST
+                ast = sql_ast.copy()
+                start_time = time.perf_counter()
+                col_lineage = ColumnLineageNoConn(
+                    sql=sql, input_table_dict={}, sql_ast=ast
+                )
+                elapsed.append(time.perf_counter() - start_time)
+            edges = sum(len(v[0]) + len(v[1]) for v in col_lineage.column_dict.values())
+            best = min(elapsed)
+            print(
+                "{:<10} {:>6} {:>10} {:>8.3f}s {:>12.1f} {:>14.3f}".format(
+                    shape, size, edges, best, best / size * 1e6, best / edges * 1e6
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
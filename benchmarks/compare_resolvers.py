@@ -0,0 +1,163 @@
+"""
+Compare the qualify resolver with the heuristic one on the bundled example corpora, for the throughput and how much
+of the lineage they agree on.
+
+    PYTHONPATH=. python benchmarks/compare_resolvers.py
+    PYTHONPATH=. python benchmarks/compare_resolvers.py --corpora mimic-iv --repeat 5 --diff 10
+
+The qualify resolver needs the columns of the base tables, the corpora come without them, so they are taken from the
+columns a heuristic run guesses for the base tables. A column agrees when both resolvers give it the same direct and
+indirect sources, the columns only one of them finds count as disagreeing.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import lineagex
+from lineagex.LineageXNoConn import LineageXNoConn
+from lineagex.utils import _guess_base_table
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(lineagex.__file__)), "examples"
+)
+
+# the same arguments as lineagex.example
+CORPORA = {
+    "dependency_example": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "github_example": ("schema1", "schema1, public"),
+    "mimic-iii": ("mimiciii_derived", "mimiciii_clinical, public"),
+    "mimic-iv": ("mimiciv_derived", "mimiciv_icu, mimiciv_hosp"),
+}
+
+
+def run(corpus: str, input_table_dict: dict, resolver: str) -> tuple:
+    """
+    Run the corpus with the resolver
+    :return: the LineageXNoConn and the time it took
+    """
+    target_schema, search_path_schema = CORPORA[corpus]
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        lx = LineageXNoConn(
+            sql=os.path.join(EXAMPLES_DIR, corpus),
+            target_schema=target_schema,
+            search_path_schema=search_path_schema,
+            # the run adds its own tables to input_table_dict
+            input_table_dict=dict(input_table_dict),
+            resolver=resolver,
+        )
+    return lx, time.perf_counter() - start_time
+
+
+def base_columns(corpus: str) -> dict:
+    """
+    The columns of the base tables of the corpus as guessed by a heuristic run, the tables it could not find the
+    schema of are put in the first schema of the search path
+    """
+    lx, _ = run(corpus=corpus, input_table_dict={}, resolver="heuristic")
+    guessed = _guess_base_table(output_dict=lx.output_dict)
+    first_schema = CORPORA[corpus][1].split(",")[0].strip()
+    input_table_dict = {}
+    for k, v in guessed.items():
+        if k.split(".")[-1] in lx.sql_files_dict:
+            continue
+        if "." not in k:
+            k = first_schema + "." + k
+        input_table_dict[k] = sorted(set(input_table_dict.get(k, [])) | set(v))
+    return input_table_dict
+
+
+def compare(heuristic: dict, qualify: dict) -> tuple:
+    """
+    :return: the number of columns, the number of them that agree and the (table, column) that do not
+    """
+    total, agree, diffs = 0, 0, []
+    for name in sorted(set(heuristic) | set(qualify)):
+        h_cols = heuristic.get(name, {}).get("columns", {})
+        q_cols = qualify.get(name, {}).get("columns", {})
+        for col in sorted(set(h_cols) | set(q_cols)):
+            total += 1
+            if h_cols.get(col) == q_cols.get(col):
+                agree += 1
+            else:
+                diffs.append((name, col))
+    return total, agree, diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--corpora", nargs="+", default=list(CORPORA))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--diff", type=int, default=0, help="print the first columns that disagree"
+    )
+    args = parser.parse_args()
+
+    print(
+        "{:<20} {:<10} {:>6} {:>9} {:>8} {:>10} {:>10}".format(
+            "corpus", "resolver", "sql", "time", "sql/s", "qualified", "agreement"
+        )
+    )
+    with tempfile.TemporaryDirectory() as out_dir:
+        cwd = os.getcwd()
+        os.chdir(out_dir)
+        try:
+            for corpus in args.corpora:
+                input_table_dict = base_columns(corpus=corpus)
+                outputs = {}
+                for resolver in ("heuristic", "qualify"):
+                    elapsed = []
+                    for _ in range(args.repeat):
+                        lx, t = run(
+                            corpus=corpus,
+                            input_table_dict=input_table_dict,
+                            resolver=resolver,
+                        )
+                        elapsed.append(t)
+                    outputs[resolver] = lx.output_dict
+                    best = min(elapsed)
+                    if lx.qualifier is None:
+                        qualified, agreement = "", ""
+                    else:
+                        qualified = "{}/{}".format(
+                            lx.qualifier.qualified,
+                            lx.qualifier.qualified + lx.qualifier.fallbacks,
+                        )
+                        total, agree, diffs = compare(
+                            heuristic=outputs["heuristic"], qualify=lx.output_dict
+                        )
+                        agreement = "{:.1%}".format(agree / total if total else 1)
+                    print(
+                        "{:<20} {:<10} {:>6} {:>8.3f}s {:>8.1f} {:>10} {:>10}".format(
+                            corpus,
+                            resolver,
+                            lx.parsed,
+                            best,
+                            lx.parsed / best,
+                            qualified,
+                            agreement,
+                        )
+                    )
+                for name, col in diffs[: args.diff]:
+                    print("    {}.{}".format(name, col))
+                    for resolver in ("heuristic", "qualify"):
+                        print(
+                            "        {:<10} {}".format(
+                                resolver,
+                                outputs[resolver]
+                                .get(name, {})
+                                .get("columns", {})
+                                .get(col),
+                            )
+                        )
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from psycopg2.extensions import connection
+
+from .utils import find_column
+
+CATALOG_QUERY = """SELECT s.nspname, c.relname, c.relkind, s.ord, a.attname
+FROM unnest(current_schemas(true)) WITH ORDINALITY AS s(nspname, ord)
+    JOIN pg_catalog.pg_namespace n      ON n.nspname = s.nspname
+    LEFT JOIN pg_catalog.pg_class c     ON c.relnamespace = n.oid AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+    LEFT JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+ORDER BY s.ord, c.relname, a.attnum;"""
+
+SCHEMA_QUERY = """SELECT n.nspname, c.relname, c.relkind, 0 AS ord, a.attname
+FROM pg_catalog.pg_namespace n
+    JOIN pg_catalog.pg_class c      ON c.relnamespace = n.oid AND c.relkind IN ('r', 'v', 'm', 'p', 'f')
+    LEFT JOIN pg_catalog.pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+WHERE n.nspname = '{}'
+ORDER BY c.relname, a.attnum;"""
+
+RELATION_QUERY = """SELECT attname AS col
+FROM   pg_catalog.pg_attribute
+WHERE  attrelid = '{}'::regclass
+AND    attnum > 0
+AND    NOT attisdropped
+ORDER  BY attnum;"""
+
+# the definitions of the views asked for, as schema and view name pairs with a NULL view name for all the views in the
+# schema, along with the other relations each one reads from, in the order asked for
+VIEW_QUERY = """WITH r AS (
+    SELECT * FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS r(nspname, relname, ord)
+), v AS (
+    SELECT r.ord, n.nspname, c.relname, c.oid
+    FROM r
+        JOIN pg_catalog.pg_namespace n ON n.nspname = r.nspname
+        JOIN pg_catalog.pg_class c     ON c.relnamespace = n.oid AND c.relname = r.relname AND c.relkind = 'v'
+    UNION ALL
+    SELECT r.ord, n.nspname, c.relname, c.oid
+    FROM r
+        JOIN pg_catalog.pg_namespace n ON n.nspname = r.nspname
+        JOIN pg_catalog.pg_class c     ON c.relnamespace = n.oid AND c.relkind = 'v'
+    WHERE r.relname IS NULL
+)
+SELECT concat_ws('.', v.nspname, v.relname) AS view_name, pg_catalog.pg_get_viewdef(v.oid) AS definition,
+    ARRAY(
+        SELECT DISTINCT concat_ws('.', dn.nspname, dc.relname)
+        FROM pg_catalog.pg_rewrite rw
+            JOIN pg_catalog.pg_depend d     ON d.classid = 'pg_catalog.pg_rewrite'::regclass AND d.objid = rw.oid
+                                               AND d.refclassid = 'pg_catalog.pg_class'::regclass AND d.refobjid <> v.oid
+            JOIN pg_catalog.pg_class dc     ON dc.oid = d.refobjid
+            JOIN pg_catalog.pg_namespace dn ON dn.oid = dc.relnamespace
+        WHERE rw.ev_class = v.oid
+    ) AS dependencies,
+    v.ord
+FROM v
+ORDER BY v.ord, v.oid;"""
+
+
+class Catalog:
+    def __init__(
+        self,
+        engine: Any = None,
+        search_schema: Optional[str] = "",
+        instrumentation: Any = None,
+    ) -> None:
+        """
+        Run-scoped column catalog, it loads the columns of every relation in the search_path schemas with one query
+        and answers the find_column lookups from memory. Schemas outside the search_path are loaded on their first
+        qualified lookup, relations created during the run are added with their columns.
+        :param engine: the connection engine, psycopg2 connection or FalDbt
+        :param search_schema: the schemas for SET search_path
+        :param instrumentation: the Instrumentation of the run, the queries are added to the db time of the sql
+        """
+        self.engine = engine
+        self.search_schema = search_schema
+        self.instrumentation = instrumentation
+        # (schema, relation) -> list of columns
+        self.relation_dict = {}
+        # (schema, relation) -> relkind
+        self.relkind_dict = {}
+        # the schemas in search_path order, as resolved by the database
+        self.search_path = []
+        self.loaded_schemas = set()
+        self.fallback_dict = {}
+        self.lookups = 0
+        self.queries = 0
+        # the catalog is shared by the EXPLAIN workers
+        self.lock = threading.RLock()
+        self._load()
+
+    def find_column(self, table_name: Optional[str] = "") -> List:
+        """
+        Find the columns for the table, resolved the same way as regclass against the search_path
+        :param table_name: the table name, optionally schema-qualified and quoted
+        :return: the list of columns in the table
+        """
+        with self.lock:
+            self.lookups += 1
+            key = self._resolve(table_name=table_name)
+            if key is not None:
+                return list(self.relation_dict[key])
+            # not a relation the catalog knows of, ask the database the same way as before
+            if table_name not in self.fallback_dict:
+                start_time = time.time()
+                self.queries += self._queries_per_lookup()
+                self.fallback_dict[table_name] = find_column(
+                    table_name=table_name,
+                    engine=self.engine,
+                    search_schema=self.search_schema,
+                )
+                self._add_db_time(time.time() - start_time, self._queries_per_lookup())
+            return list(self.fallback_dict[table_name])
+
+    def relkind(self, table_name: Optional[str] = "") -> Optional[str]:
+        """
+        Find the relkind of the table, r for table, v for view, m for materialized view, p for partitioned table and
+        f for foreign table
+        :param table_name: the table name, optionally schema-qualified and quoted
+        :return: the relkind, None if the table is not found
+        """
+        with self.lock:
+            key = self._resolve(table_name=table_name)
+            if key is None:
+                return None
+            return self.relkind_dict[key]
+
+    def exists(
+        self,
+        schema: Optional[str] = "",
+        table_name: Optional[str] = "",
+        relkinds: Optional[str] = None,
+    ) -> bool:
+        """
+        Check if the relation exists in the schema
+        :param schema: the schema name
+        :param table_name: the relation name
+        :param relkinds: only count the relations of these relkinds, any relkind if not given
+        :return: True if the relation exists
+        """
+        with self.lock:
+            key = self._resolve(table_name=_quote(schema) + "." + _quote(table_name))
+            if key is None:
+                return False
+            return relkinds is None or self.relkind_dict[key] in relkinds
+
+    def add_relation(
+        self, table_name: Optional[str] = "", columns: Optional[List] = None
+    ) -> None:
+        """
+        Add a relation created during the run
+        :param table_name: the schema-qualified name it was created with
+        :param columns: the columns of the relation
+        """
+        with self.lock:
+            parts = _split_name(table_name)
+            key = (parts[-2], parts[-1])
+            self.relation_dict[key] = list(columns)
+            self.relkind_dict[key] = "r"
+            # an unqualified fallback lookup could resolve to the new relation now
+            for name in list(self.fallback_dict.keys()):
+                if _split_name(name)[-1] == key[1]:
+                    del self.fallback_dict[name]
+
+    def saved_queries(self) -> int:
+        """
+        The number of queries saved compared with one find_column per lookup
+        :return: the number of saved queries
+        """
+        return max(self.lookups * self._queries_per_lookup() - self.queries, 0)
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "queries": self.queries,
+            "saved": self.saved_queries(),
+        }
+
+    def _add_db_time(self, t: Optional[float] = 0, round_trips: Optional[int] = 1) -> None:
+        if self.instrumentation is not None:
+            self.instrumentation.add_db_time(t, round_trips=round_trips)
+
+    def _queries_per_lookup(self) -> int:
+        # SET search_path and the pg_attribute query for psycopg2, only the pg_attribute query for FalDbt
+        return 2 if isinstance(self.engine, connection) else 1
+
+    def _load(self) -> None:
+        """
+        Load the columns of all the relations in the search_path schemas
+        """
+        if isinstance(self.engine, connection):
+            cur = self.engine.cursor()
+            cur.execute("""SET search_path TO {};""".format(self.search_schema))
+            cur.execute(CATALOG_QUERY)
+            rows = cur.fetchall()
+            cur.close()
+            self.queries += 2
+        else:
+            rows = self._execute_fal(CATALOG_QUERY)
+            self.queries += 1
+        self._add_rows(rows=rows)
+        # the rows are in search_path order, a schema with no relations still has one row
+        for nspname, _, _, _, _ in rows:
+            if nspname not in self.search_path:
+                self.search_path.append(nspname)
+        self.loaded_schemas.update(self.search_path)
+
+    def _load_schema(self, schema: Optional[str] = "") -> None:
+        """
+        Load the columns of all the relations in a schema outside the search_path
+        :param schema: the schema name
+        """
+        start_time = time.time()
+        query = SCHEMA_QUERY.format(schema.replace("'", "''"))
+        if isinstance(self.engine, connection):
+            cur = self.engine.cursor()
+            cur.execute(query)
+            rows = cur.fetchall()
+            cur.close()
+        else:
+            rows = self._execute_fal(query)
+        self.queries += 1
+        self._add_db_time(time.time() - start_time)
+        self._add_rows(rows=rows)
+        self.loaded_schemas.add(schema)
+
+    def _add_rows(self, rows: Optional[List] = None) -> None:
+        for nspname, relname, relkind, _, attname in rows:
+            if _is_null(relname):
+                continue
+            key = (nspname, relname)
+            if key not in self.relation_dict:
+                self.relation_dict[key] = []
+                self.relkind_dict[key] = relkind
+            if not _is_null(attname):
+                self.relation_dict[key].append(attname)
+
+    def _execute_fal(self, query: Optional[str] = "") -> List:
+        df = self.engine.execute_sql(query)
+        return list(
+            zip(df["nspname"], df["relname"], df["relkind"], df["ord"], df["attname"])
+        )
+
+    def _resolve(self, table_name: Optional[str] = "") -> Optional[Tuple]:
+        """
+        Resolve the table name to a (schema, relation) in the catalog
+        :param table_name: the table name, optionally schema-qualified and quoted
+        :return: the (schema, relation), None if it is not in the catalog
+        """
+        parts = _split_name(table_name)
+        if len(parts) > 1:
+            # database.schema.table or schema.table
+            schema = parts[-2]
+            if schema not in self.loaded_schemas:
+                self._load_schema(schema=schema)
+            key = (schema, parts[-1])
+            return key if key in self.relation_dict else None
+        for schema in self.search_path:
+            key = (schema, parts[-1])
+            if key in self.relation_dict:
+                return key
+        return None
+
+
+def _split_name(table_name: Optional[str] = "") -> List:
+    """
+    Split the table name into its identifiers, unquoted identifiers are folded to lower case like in Postgres
+    :param table_name: the table name, optionally schema-qualified and quoted
+    :return: the list of identifiers
+    """
+    parts = []
+    current = ""
+    quoted = False
+    i = 0
+    while i < len(table_name):
+        ch = table_name[i]
+        if ch == '"':
+            if quoted and table_name[i + 1 : i + 2] == '"':
+                current += '"'
+                i += 1
+            else:
+                quoted = not quoted
+        elif ch == "." and not quoted:
+            parts.append(current)
+            current = ""
+        elif quoted:
+            current += ch
+        elif not ch.isspace():
+            current += ch.lower() if "A" <= ch <= "Z" else ch
+        i += 1
+    parts.append(current)
+    return parts
+
+
+def _is_null(value: Any = None) -> bool:
+    # FalDbt returns the NULLs from the LEFT JOIN as None or NaN
+    return value is None or value != value
+
+
+def _quote(name: Optional[str] = "") -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+if __name__ == "__main__":
+    pass
@@ -18,6 +18,7 @@ class ColumnLineage:
         conn: Any = None,
         part_tables: Optional[dict] = None,
         search_schema: Optional[str] = "",
+        catalog: Any = None,
     ) -> None:
         self.split_regex = re.compile(r"[^a-zA-Z0-9._]")
         self.all_used_col = []
@@ -33,6 +34,7 @@ class ColumnLineage:
         self.column_prefix_dict = {}
         self.conn = conn
         self.search_schema = search_schema
+        self.catalog = catalog
         self.sql_ast = parse_one(sql=sql, read="postgres")
         self.cte_column = self._find_cte_col()
         self.final_output = ""
@@ -514,10 +516,8 @@ class ColumnLineage:
                 self.possible_columns.append(i)
         # if an output has invalid char, its likely it's an expression, have to extract the columns
         if invalid_list:
-            all_table_cols = find_column(
-                table_name=plan["Schema"] + "." + plan["Relation Name"],
-                engine=self.conn,
-                search_schema=self.search_schema,
+            all_table_cols = self._find_column(
+                table_name=plan["Schema"] + "." + plan["Relation Name"]
             )
             for i in invalid_list:
                 # split the output and match columns from all the columns of the table
@@ -539,6 +539,18 @@ class ColumnLineage:
             "Alias"
         ]
 
+    def _find_column(self, table_name: Optional[str] = "") -> List:
+        """
+        Find the columns for the table, from the catalog if there is one
+        :param table_name: the table name
+        :return: the list of columns in the table
+        """
+        if self.catalog:
+            return self.catalog.find_column(table_name=table_name)
+        return find_column(
+            table_name=table_name, engine=self.conn, search_schema=self.search_schema
+        )
+
     def _find_parent_table(self, table: Optional[str] = "") -> str:
         """
         Find the parent table from a given table name
@@ -667,10 +679,8 @@ class ColumnLineage:
                         if table_alias_dict[t_name] in cte_col_dict.keys():
                             col_name = cte_col_dict[table_alias_dict[t_name]]
                         else:
-                            col_name = find_column(
-                                table_name=table_alias_dict[t_name],
-                                engine=self.conn,
-                                search_schema=self.search_schema,
+                            col_name = self._find_column(
+                                table_name=table_alias_dict[t_name]
                             )
                     # if * has no prefix
                     else:
@@ -679,11 +689,7 @@ class ColumnLineage:
                                 cte_col_dict[cte_name].extend(cte_col_dict[t_name])
                             else:
                                 cte_col_dict[cte_name].extend(
-                                    find_column(
-                                        table_name=t_name,
-                                        engine=self.conn,
-                                        search_schema=self.search_schema,
-                                    )
+                                    self._find_column(table_name=t_name)
                                 )
                 if isinstance(col_name, list):
                     cte_col_dict[cte_name].extend(col_name)
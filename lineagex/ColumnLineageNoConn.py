@@ -1,9 +1,12 @@
-from typing import List, Optional, Tuple
+from collections import deque
+from typing import Any, Callable, Iterator, List, Optional, Tuple
 
 import itertools
 from sqlglot import exp, parse_one
 from sqlglot import expressions
 
+from .SchemaQualifier import SchemaQualifier
+
 shared_conditions = [
     exp.Where,
     exp.EQ,
@@ -36,6 +39,193 @@ shared_conditions_with_table = [
 ]
 from_join_exp = [exp.From, exp.Join]
 compare_cond = [exp.EQ, exp.GT, exp.LT, exp.GTE, exp.LTE]
+shared_types = tuple(shared_conditions)
+# a CASE directly under these is kept by _shared_col_conds
+case_parents = [exp.Where, exp.Group, exp.Having, exp.Order]
+
+
+def _find_all(
+    node: expressions = None, types: Any = None, skip: Optional[Callable] = None
+) -> Iterator:
+    """
+    Find the nodes of the types under the node in breadth first order as find_all does, leaving out the nodes that
+    skip is true for along with everything under them, the same as popping them from a copy of the tree first
+    :param node: the root, it is never left out
+    :param types: the expression type or the tuple of them
+    :param skip: called with the child and its parent
+    :return: the iterator of the nodes found
+    """
+    queue = deque([node])
+    while queue:
+        item = queue.popleft()
+        if isinstance(item, types):
+            yield item
+        for _, v in item.iter_expressions():
+            if skip is None or not skip(v, item):
+                queue.append(v)
+
+
+def _has_skipped(node: expressions = None, skip: Optional[Callable] = None) -> bool:
+    """
+    Check if any node under the node is left out by skip
+    """
+    if skip is None:
+        return False
+    queue = deque([node])
+    while queue:
+        item = queue.popleft()
+        for _, v in item.iter_expressions():
+            if skip(v, item):
+                return True
+            queue.append(v)
+    return False
+
+
+def _pruned_copy(node: expressions = None, skip: Optional[Callable] = None) -> expressions:
+    """
+    Copy the node without the nodes that skip is true for
+    :param node: the root of the copy
+    :param skip: called with the child and its parent of the original tree
+    :return: the copy
+    """
+    copied = node.copy()
+    queue = deque([(node, copied)])
+    pruned = []
+    while queue:
+        original, copied_node = queue.popleft()
+        for (_, v), (_, c) in zip(original.iter_expressions(), copied_node.iter_expressions()):
+            if skip(v, original):
+                pruned.append(c)
+            else:
+                queue.append((v, c))
+    for c in pruned:
+        c.pop()
+    return copied
+
+
+def _plain_sql(node: expressions = None) -> Optional[str]:
+    """
+    Put together the sql of an identifier, a star or a column of those from the attributes of the node, the same as
+    the generator gives
+    :param node: the node
+    :return: the sql, or None if the node has anything else and has to go through the generator
+    """
+    if node.comments:
+        return None
+    if isinstance(node, exp.Identifier):
+        if not isinstance(node.this, str):
+            return None
+        text = node.this.replace('"', '""')
+        return '"' + text + '"' if node.args.get("quoted") else text
+    if isinstance(node, exp.Star):
+        return None if any(node.args.values()) else "*"
+    if isinstance(node, exp.Column):
+        return _plain_join(node=node, keys=("catalog", "db", "table", "this"))
+    if isinstance(node, exp.Table):
+        parts = _plain_table(table=node)
+        if parts is None:
+            return None
+        return parts[0] + " AS " + parts[1] if parts[1] else parts[0]
+    return None
+
+
+def _plain_join(
+    node: expressions = None, keys: Optional[tuple] = None, others: Optional[tuple] = ()
+) -> Optional[str]:
+    """
+    Join the sql of the parts of the node with dots, if the node has nothing but those parts and the others
+    """
+    if any(v for k, v in node.args.items() if k not in keys and k not in others):
+        return None
+    parts = []
+    for k in keys:
+        v = node.args.get(k)
+        if v:
+            part = _plain_sql(v) if isinstance(v, (exp.Identifier, exp.Star)) else None
+            if part is None:
+                return None
+            parts.append(part)
+    return ".".join(parts)
+
+
+def _plain_table(table: expressions = None) -> Optional[Tuple]:
+    """
+    The name and the alias of a table that has nothing but its name and a plain alias, from its attributes
+    :param table: the table expression
+    :return: the sql of the name and of the alias, the alias is empty if it has none, or None for other tables
+    """
+    if table.comments:
+        return None
+    alias = table.args.get("alias")
+    alias_sql = ""
+    if alias:
+        if not isinstance(alias, exp.TableAlias) or alias.comments:
+            return None
+        alias_sql = _plain_join(node=alias, keys=("this",))
+    name = _plain_join(node=table, keys=("catalog", "db", "this"), others=("alias",))
+    if name is None or alias_sql is None:
+        return None
+    return name, alias_sql
+
+
+def node_sql(node: expressions = None, cache: Optional[dict] = None) -> str:
+    """
+    The sql of the node as node.sql() gives it, the plain columns and tables are put together from their attributes
+    and only the rest goes through the generator
+    :param node: the node
+    :param cache: id of the node -> (node, sql), the node is kept so its id is not reused
+    :return: the sql
+    """
+    if cache is not None:
+        hit = cache.get(id(node))
+        if hit is not None and hit[0] is node:
+            return hit[1]
+    sql = _plain_sql(node)
+    if sql is None:
+        sql = node.sql()
+    if cache is not None:
+        cache[id(node)] = (node, sql)
+    return sql
+
+
+def table_name_alias(table: expressions = None, cache: Optional[dict] = None) -> Tuple:
+    """
+    The name and the alias of the table as they are read from the words of its sql, straight from the attributes for
+    a plain table
+    :param table: the table expression
+    :param cache: the cache of node_sql
+    :return: the name and the alias, the alias is empty if the table has none and both are None if the sql has no AS
+    """
+    if table.alias == "":
+        return node_sql(node=table, cache=cache), ""
+    parts = _plain_table(table=table)
+    # a name or alias with a space in it is cut up by the words
+    if parts is not None and " " not in parts[0] and " " not in parts[1]:
+        return parts
+    temp = node_sql(node=table, cache=cache).split(" ")
+    if temp[1] == "AS" or temp[1] == "as":
+        return temp[0], temp[2]
+    return None, None
+
+
+def _prefer_prefixed(cols: Optional[List] = None, prefixed: Optional[dict] = None) -> List:
+    """
+    Replace the column names that have a prefixed one, the prefixed names are added after the rest
+    :param cols: the column names
+    :param prefixed: the lowercase name without the prefix -> the prefixed name
+    :return: the new list of column names
+    """
+    present = set(cols)
+    kept = []
+    added = []
+    for i in cols:
+        # a prefixed name is never replaced
+        full = None if "." in i else prefixed.get(i.lower())
+        if full is None:
+            kept.append(i)
+        elif full not in present:
+            added.append(full)
+    return kept + added
 
 
 def parse_one_sql(sql: Optional[str] = "") -> expressions:
@@ -63,6 +253,10 @@ class ColumnLineageNoConn:
         sql: Optional[str] = "",
         dialect: str = "postgres",
         input_table_dict: Optional[dict] = None,
+        sql_ast: expressions = None,
+        column_index: Optional[dict] = None,
+        star_index: Optional[dict] = None,
+        qualifier: Optional[SchemaQualifier] = None,
     ):
         self.column_dict = {}
         self.table_alias_dict = {}
@@ -70,8 +264,35 @@ class ColumnLineageNoConn:
         self.cte_dict = {}
         self.unnest_dict = {}
         self.input_table_dict = input_table_dict
+        # table -> (columns, lowercase columns), can be shared by the statements of a run
+        self.column_index = column_index if column_index is not None else {}
+        # table -> (columns, the pairs of the column and the prefixed column for a star), shared like column_index
+        self.star_index = star_index if star_index is not None else {}
+        # cte name -> (cte columns, lowercase column -> column)
+        self.cte_index = {}
+        # id of the node -> (node, sql) for the nodes of this statement
+        self.sql_cache = {}
         # self.sql_ast = parse_one(sql, read=dialect)
-        self.sql_ast = parse_one_sql(sql='''''' + sql + '''''')
+        # the AST may be handed over from the table discovery, so the sql is only parsed once per run
+        if sql_ast is None:
+            self.sql_ast = parse_one_sql(sql='''''' + sql + '''''')
+            self.parse_count = 1
+        else:
+            self.sql_ast = sql_ast
+            self.parse_count = 0
+        # with a qualifier, the columns are qualified from the schema before the heuristics run, which only fill in
+        # what it can not qualify
+        if qualifier is not None:
+            try:
+                qualifier.qualify(sql_ast=self.sql_ast, input_table_dict=self.input_table_dict)
+            except Exception:
+                # sqlglot stopped half way through the AST, the heuristics run on it as parsed, the AST handed over is
+                # parsed with the dialect of the run
+                if sql_ast is None:
+                    self.sql_ast = parse_one_sql(sql=sql)
+                else:
+                    self.sql_ast = parse_one(sql, read=dialect)
+                self.parse_count += 1
         self.all_used_col = []
         self.table_list = []
         self.all_subquery_table = []
@@ -142,23 +363,14 @@ class ColumnLineageNoConn:
             # remove column name that doesn't have a table prefix but there is at least one with table prefix
             for k, v in self.column_dict.items():
                 temp_v = {}
-                for i in v[0] + v[1]:
-                    if len(i.split(".")) > 1:
-                        temp_v[i.split(".")[-1].lower()] = i
-                v_list = v[0].copy()
-                for i in v[0]:
-                    if i.lower() in temp_v.keys():
-                        v_list = [x for x in v_list if x != i]
-                        if temp_v[i.lower()] not in v[0]:
-                            v_list.append(temp_v[i.lower()])
-                v[0] = v_list
-                v_list = v[1].copy()
-                for i in v[1]:
-                    if i.lower() in temp_v.keys():
-                        v_list = [x for x in v_list if x != i]
-                        if temp_v[i.lower()] not in v[1]:
-                            v_list.append(temp_v[i.lower()])
-                v[1] = v_list
+                # the largest prefixed name is picked, so it is the same regardless of the set ordering before
+                for i in itertools.chain(v[0], v[1]):
+                    if "." in i:
+                        key = i[i.rfind(".") + 1 :].lower()
+                        if key not in temp_v or i > temp_v[key]:
+                            temp_v[key] = i
+                v[0] = _prefer_prefixed(cols=v[0], prefixed=temp_v)
+                v[1] = _prefer_prefixed(cols=v[1], prefixed=temp_v)
                 if "" in v[0]:
                     v[0].remove("")
                 if "" in v[1]:
@@ -169,7 +381,7 @@ class ColumnLineageNoConn:
                 # if col.dump()["args"]["this"]["args"]["quoted"] is True:
                 #     continue
                 cols = self._find_alias_col(
-                    col_sql=col.sql(), temp_table=self.sub_tables, ref=True
+                    col_sql=self._sql(col), temp_table=self.sub_tables, ref=True
                 )
                 temp_sub_cols.extend(cols[0] + cols[1])
             self.sub_cols.extend(temp_sub_cols)
@@ -180,11 +392,9 @@ class ColumnLineageNoConn:
         :param sql_ast: the ast tree for the sql
         :return: the list of eligeble tables
         """
-        temp_ast = sql_ast.copy()
-        for cond in shared_conditions:
-            for cond_sql in temp_ast.find_all(cond):
-                cond_sql.pop()
-        temp_table = self._resolve_table(part_ast=temp_ast)
+        temp_table = self._resolve_table(
+            part_ast=sql_ast, skip=lambda child, parent: isinstance(child, shared_types)
+        )
         # return self._find_all_tables(temp_table_list=temp_table)
         return temp_table
 
@@ -202,6 +412,11 @@ class ColumnLineageNoConn:
         :return: the dict that is written
         """
         n = 0
+        # key -> (entry, the set of its indirect columns) for the entries rewritten for a newly created column, so the
+        # rewrites do not rebuild the lists every time, they are put back as lists at the end
+        indirect_sets = {}
+        # the keys of those that hold all the used columns, only the columns new to the used ones are added to them
+        covering = set()
         for projection in sql_ast.find(exp.Select).expressions:
             col_name = projection.alias_or_name
             if col_name == "":
@@ -230,13 +445,40 @@ class ColumnLineageNoConn:
                 # If it is not from source table
                 if not from_source:
                     temp = target_dict[col_name].copy()
+                    held = indirect_sets.get(col_name)
+                    if held is not None and held[0] is target_dict[col_name]:
+                        temp[1] = list(held[1])
                     new_col = temp[0] + temp[1]
                     new_col.remove(col_name)
+                    kept = list(self.all_used_col)
+                    kept.remove(col_name)
+                    kept = set(kept)
+                    added = set(new_col) - (kept - {col_name})
+                    fresh = []
                     for k, v in target_dict.items():
-                        v[1].remove(col_name)
-                        target_dict[k] = [v[0], list(set(v[1] + new_col))]
-                    self.all_used_col.remove(col_name)
-                    self.all_used_col = set(set(self.all_used_col).union(set(new_col)))
+                        held = indirect_sets.get(k)
+                        if held is not None and held[0] is v:
+                            if col_name not in held[1]:
+                                # as removing it from the list would
+                                raise ValueError("list.remove(x): x not in list")
+                            held[1].remove(col_name)
+                            held[1].update(added if k in covering else new_col)
+                        else:
+                            v[1].remove(col_name)
+                            target_dict[k] = [v[0], []]
+                            indirect_sets[k] = (target_dict[k], set(v[1] + new_col))
+                            covering.discard(k)
+                            fresh.append(k)
+                    self.all_used_col = kept.union(set(new_col))
+                    # a used column that is left twice is still used but gone from the entries
+                    if col_name in kept and col_name not in added:
+                        covering.clear()
+                    for k in fresh:
+                        if self.all_used_col <= indirect_sets[k][1]:
+                            covering.add(k)
+        for k, (entry, indirect) in indirect_sets.items():
+            if target_dict.get(k) is entry:
+                entry[1] = list(indirect)
         return target_dict
 
     def _handle_union(self, sql_ast: expressions = None) -> None:
@@ -252,7 +494,7 @@ class ColumnLineageNoConn:
             self._shared_col_conds(part_ast=sql_ast, used_tables=main_tables)
             for col in sql_ast.find_all(exp.Column):
                 cols = self._find_alias_col(
-                    col_sql=col.sql(), temp_table=main_tables, ref=True
+                    col_sql=self._sql(col), temp_table=main_tables, ref=True
                 )
                 # if col.dump()["args"]["this"]["args"]["quoted"] is True:
                 #     continue
@@ -264,10 +506,16 @@ class ColumnLineageNoConn:
         After the cte are resolved, run the subquery ast that is with the shared conditions(WHERE, GROUP BY, etc)
         :param sql_ast: the ast without the cte
         """
+        # the tree is only walked again for the next condition while it has subqueries left
+        has_subquery = sql_ast.find(exp.Subquery) is not None
         # add in more conditions, including FROM/JOIN
         for cond in shared_conditions_with_table:
+            if not has_subquery:
+                break
+            resolved = False
             for cond_sql in sql_ast.find_all(cond):
                 for sub_ast in cond_sql.find_all(exp.Subquery):
+                    resolved = True
                     self.sub_tables = self._resolve_table(part_ast=sub_ast)
                     self.all_subquery_table.extend(
                         self._find_all_tables(temp_table_list=self.sub_tables)
@@ -299,6 +547,8 @@ class ColumnLineageNoConn:
                         self.cte_dict[sub_name] = temp_sub_dict
                     self._run_lineage(sub_ast, True)
                     sub_ast.pop()
+            if resolved:
+                has_subquery = sql_ast.find(exp.Subquery) is not None
 
     def _sub_shared_col_conds_cte(
         self, sql_ast: expressions = None
@@ -311,10 +561,16 @@ class ColumnLineageNoConn:
         potential_cte_sub_table = []
         all_cte_sub_cols = []
         sub_name = ""
+        # the tree is only walked again for the next condition while it has subqueries left
+        has_subquery = sql_ast.find(exp.Subquery) is not None
         # add in more conditions, including FROM/JOIN
         for cond in shared_conditions_with_table:
+            if not has_subquery:
+                break
+            resolved = False
             for cond_sql in sql_ast.find_all(cond):
                 for sub_ast in cond_sql.find_all(exp.Subquery):
+                    resolved = True
                     temp_sub_table = self._resolve_table(part_ast=sub_ast)
                     temp_sub_cols = []
                     temp_dict = {}
@@ -331,7 +587,7 @@ class ColumnLineageNoConn:
                                 temp_sub_cols.extend(value[1])
                         else:
                             cols = self._find_alias_col(
-                                col_sql=col.sql(), temp_table=temp_sub_table, ref=True
+                                col_sql=self._sql(col), temp_table=temp_sub_table, ref=True
                             )
                             temp_sub_cols.extend(cols[0] + cols[1])
                     temp_sub_cols = list(set(temp_sub_cols))
@@ -367,6 +623,8 @@ class ColumnLineageNoConn:
                         self.cte_dict[sub_name] = temp_sub_dict
                         sub_ast.replace(exp.Table(this=sub_name))
                     sub_ast.pop()
+            if resolved:
+                has_subquery = sql_ast.find(exp.Subquery) is not None
         return all_cte_sub_table, all_cte_sub_cols, potential_cte_sub_table, sub_name
 
     def _run_cte_lineage(self):
@@ -499,7 +757,7 @@ class ColumnLineageNoConn:
             temp_col = []
             proj_columns = []
             for p in projection.find_all(exp.Column):
-                temp_col.append(p.sql())
+                temp_col.append(self._sql(p))
             ref_temp_col = []
             for p in temp_col:
                 cols = self._find_alias_col(
@@ -565,11 +823,11 @@ class ColumnLineageNoConn:
                             ]
                     # If from an unknown table, leave it with a STAR as temporary name
                     else:
-                        target_dict[p.sql()] = [p.sql()] + (list(self.all_used_col))
+                        target_dict[self._sql(p)] = [self._sql(p)] + (list(self.all_used_col))
                 else:
                     # one projection can have many columns, append first
                     cols = self._find_alias_col(
-                        col_sql=p.sql(), temp_table=source_table, ref=False
+                        col_sql=self._sql(p), temp_table=source_table, ref=False
                     )
                     proj_columns.extend(cols[0])
                     ref_proj_cols.extend(cols[1])
@@ -583,23 +841,27 @@ class ColumnLineageNoConn:
                 target_dict[col_name] = [[""], list(self.all_used_col)]
         return target_dict
 
-    def _resolve_table(self, part_ast: expressions = None) -> List:
+    def _resolve_table(
+        self, part_ast: expressions = None, skip: Optional[Callable] = None
+    ) -> List:
         """
         Find the tables in the given ast
         :param part_ast: the ast to find the table
+        :param skip: leave out the nodes it is true for, called with the child and its parent
         """
         temp_table_list = []
         for cond in from_join_exp:
             # Resolve FROM and JOIN
-            for table_sql in part_ast.find_all(cond):
+            for table_sql in _find_all(part_ast, cond, skip):
                 # Skip GenerateSeries as a Table
-                if table_sql.find(exp.GenerateSeries):
-                    if table_sql.find(exp.GenerateSeries).depth <= table_sql.depth + 2:
+                generate_series = next(_find_all(table_sql, exp.GenerateSeries, skip), None)
+                if generate_series:
+                    if generate_series.depth <= table_sql.depth + 2:
                         continue
                 # Resolve Unnest for creating tables
-                elif table_sql.find(exp.Unnest):
+                elif next(_find_all(table_sql, exp.Unnest, skip), None):
                     temp_col_name = []
-                    for t in table_sql.find_all(exp.Identifier):
+                    for t in _find_all(table_sql, exp.Identifier, skip):
                         temp_col_name.append(t.text("this"))
                         dep_tables = []
                         if len(temp_col_name) == 2:
@@ -619,18 +881,18 @@ class ColumnLineageNoConn:
                             dep_tables = list(set(dep_tables))
                             self.table_alias_dict[temp_col_name[0]] = dep_tables
                             self.unnest_dict[temp_col_name[0]] = [dep_cols, []]
-                            if table_sql.find(exp.TableAlias):
-                                self.table_alias_dict[
-                                    table_sql.find(exp.TableAlias).text("this")
-                                ] = dep_tables
-                                self.unnest_dict[
-                                    table_sql.find(exp.TableAlias).text("this")
-                                ] = [dep_cols, []]
+                            table_alias = next(_find_all(table_sql, exp.TableAlias, skip), None)
+                            if table_alias:
+                                self.table_alias_dict[table_alias.text("this")] = dep_tables
+                                self.unnest_dict[table_alias.text("this")] = [dep_cols, []]
                         temp_table_list.extend(dep_tables)
-                for table in table_sql.find_all(exp.Table):
+                for table in _find_all(table_sql, exp.Table, skip):
                     if table.name == "no_name_subquery":
                         self.no_name_sub_flag = True
                         continue
+                    # the sql of the table is taken without the nodes left out
+                    if _has_skipped(table, skip):
+                        table = _pruned_copy(table, skip)
                     temp_table_list = self._find_table(
                         table=table, temp_table_list=temp_table_list
                     )
@@ -645,16 +907,23 @@ class ColumnLineageNoConn:
         :param temp_table_list: temporary list of tables for appending the used tables
         :return:
         """
-        if table.alias == "":
-            self.table_alias_dict[table.sql()] = table.sql()
-            temp_table_list.append(table.sql())
-        else:
-            temp = table.sql().split(" ")
-            if temp[1] == "AS" or temp[1] == "as":
-                self.table_alias_dict[temp[2]] = temp[0]
-                temp_table_list.append(temp[0])
+        name, alias = table_name_alias(table=table, cache=self.sql_cache)
+        if alias == "":
+            self.table_alias_dict[name] = name
+            temp_table_list.append(name)
+        elif name is not None:
+            self.table_alias_dict[alias] = name
+            temp_table_list.append(name)
         return temp_table_list
 
+    def _sql(self, node: expressions = None) -> str:
+        """
+        The sql of the node, kept for the statement
+        :param node: the node
+        :return: the sql
+        """
+        return node_sql(node=node, cache=self.sql_cache)
+
     def _find_all_tables(self, temp_table_list: Optional[List] = None) -> List:
         """
         Update the used table names, such as if a CTE, update it with the dependant tables
@@ -680,24 +949,25 @@ class ColumnLineageNoConn:
         :param part_ast: the ast of the sql to extract
         :param used_tables: the tables that this sql uses
         """
-        # remove the CASE since the conditions may confuse with keywords
-        temp_ast = part_ast.copy()
-        for case_ast in temp_ast.find_all(exp.Case):
-            if type(case_ast.parent) not in [
-                exp.Where,
-                exp.Group,
-                exp.Having,
-                exp.Order,
-            ]:
-                case_ast.pop()
+        # the SELECT resolved on their own
+        popped = set()
+
+        def skip(child: expressions, parent: expressions) -> bool:
+            # remove the CASE since the conditions may confuse with keywords
+            if isinstance(child, exp.Case) and type(parent) not in case_parents:
+                return True
+            return id(child) in popped
+
         # COMBINE THE CONDITIONS
         for cond in shared_conditions:
-            for cond_sql in temp_ast.find_all(cond):
+            for cond_sql in _find_all(part_ast, cond, skip):
                 # if cond in compare_cond and (type(cond_sql.parent) == exp.Alias or type(cond_sql.parent.parent == exp.Alias)):
                 #     continue
                 ## In the case that subquery is not realized at start(mostly when sqlglot gives inconsistent nodes)
-                if cond_sql.find(exp.Select):
-                    select_ast = cond_sql.find(exp.Select).pop()
+                select_ast = next(_find_all(cond_sql, exp.Select, skip), None)
+                if select_ast:
+                    popped.add(id(select_ast))
+                    select_ast = _pruned_copy(select_ast, skip)
                     select_table = temp_table_list = self._resolve_table(
                         part_ast=select_ast
                     )
@@ -717,13 +987,13 @@ class ColumnLineageNoConn:
                         self.all_used_col = list(self.all_used_col)
                     self.all_used_col.extend(list(set(temp_c)))
                     used_tables = self._find_all_tables(
-                        temp_table_list=self._resolve_table(part_ast=temp_ast)
+                        temp_table_list=self._resolve_table(part_ast=part_ast, skip=skip)
                     )
-                for cond_col in cond_sql.find_all(exp.Column):
+                for cond_col in _find_all(cond_sql, exp.Column, skip):
                     #if cond_col.dump()["args"]["this"]["args"]["quoted"] is True:
                     #    continue
                     cols = self._find_alias_col(
-                        col_sql=cond_col.sql(), temp_table=used_tables, ref=True
+                        col_sql=self._sql(cond_col), temp_table=used_tables, ref=True
                     )
                     if type(self.all_used_col) != 'list':
                         self.all_used_col = list(self.all_used_col)
@@ -750,7 +1020,7 @@ class ColumnLineageNoConn:
             for t in temp_table:
                 if t in self.input_table_dict.keys():
                     # resolve any case mismatching
-                    if col_sql.lower() in [x.lower() for x in self.input_table_dict[t]]:
+                    if col_sql.lower() in self._input_columns_lower(table=t):
                         if ref:
                             return [[], [t + "." + col_sql]]
                         else:
@@ -762,11 +1032,9 @@ class ColumnLineageNoConn:
                         return self.cte_dict[t][col_sql]
                     else:
                         # not in the cte columns, but could due to case sensitivity
-                        temp_cte_dict = {
-                            k.lower(): v for k, v in self.cte_dict[t].items()
-                        }
-                        if col_sql.lower() in temp_cte_dict.keys():
-                            return temp_cte_dict[col_sql.lower()]
+                        cte_columns = self._cte_columns_lower(table=t)
+                        if col_sql.lower() in cte_columns:
+                            return self.cte_dict[t][cte_columns[col_sql.lower()]]
                         else:
                             elim_table.append(t)
             deduced_table = set(temp_table) - set(elim_table)
@@ -783,9 +1051,9 @@ class ColumnLineageNoConn:
             if t in self.cte_dict.keys():
                 # CTE is stored, but the column name is not, resolve case sensitivity
                 if temp[1] not in self.cte_dict[t].keys():
-                    temp_cte_dict = {k.lower(): v for k, v in self.cte_dict[t].items()}
-                    if temp[1].lower() in temp_cte_dict.keys():
-                        return temp_cte_dict[temp[1].lower()]
+                    cte_columns = self._cte_columns_lower(table=t)
+                    if temp[1].lower() in cte_columns:
+                        return self.cte_dict[t][cte_columns[temp[1].lower()]]
                 else:
                     return self.cte_dict[t][temp[1]]
             else:
@@ -798,6 +1066,82 @@ class ColumnLineageNoConn:
         else:
             return [[col_sql], []]
 
+    def _input_columns_lower(self, table: Optional[str] = "") -> frozenset:
+        """
+        The lowercase columns of the table in input_table_dict, kept in column_index until the table is given new
+        columns
+        :param table: the table in input_table_dict
+        :return: the set of the lowercase column names
+        """
+        cols = self.input_table_dict[table]
+        entry = self.column_index.get(table)
+        if entry is None or entry[0] is not cols:
+            entry = (cols, frozenset([x.lower() for x in cols]))
+            self.column_index[table] = entry
+        return entry[1]
+
+    def _cte_columns_lower(self, table: Optional[str] = "") -> dict:
+        """
+        The lowercase columns of the cte or subquery, kept in cte_index until it is resolved again
+        :param table: the name in cte_dict
+        :return: the dict of the lowercase column name to the column name in cte_dict, the last one wins if two of
+        them only differ in case
+        """
+        cols = self.cte_dict[table]
+        entry = self.cte_index.get(table)
+        if entry is None or entry[0] is not cols:
+            entry = (cols, {k.lower(): k for k in cols})
+            self.cte_index[table] = entry
+        return entry[1]
+
+    def _input_star_columns(self, table: Optional[str] = "") -> Optional[tuple]:
+        """
+        The columns of the table in input_table_dict with the table name in front, as _find_alias_col gives them for a
+        star over the table, kept in star_index until the table is given new columns
+        :param table: the table in input_table_dict
+        :return: the tuple of the pairs of the column and the prefixed column, or None if they have to go through
+        _find_alias_col
+        """
+        # a table without the schema could be an alias or a cte, and the unnest columns are looked up first
+        if "." not in table or self.unnest_dict:
+            return None
+        cols = self.input_table_dict[table]
+        entry = self.star_index.get(table)
+        if entry is None or entry[0] is not cols:
+            entry = (cols, tuple([(x, table + "." + x) for x in cols]))
+            self.star_index[table] = entry
+        return entry[1]
+
+    def _expand_input_star(
+        self,
+        t_name: Optional[str] = "",
+        used_tables: Optional[List] = None,
+        target_dict: Optional[dict] = None,
+    ) -> None:
+        """
+        Add all the columns of the table in input_table_dict for a * over it
+        :param t_name: the table in input_table_dict
+        :param used_tables: the tables that are used
+        :param target_dict: the dict it is writing to
+        """
+        star_cols = self._input_star_columns(table=t_name)
+        if star_cols is None:
+            for s in self.input_table_dict[t_name]:
+                cols = self._find_alias_col(
+                    col_sql=t_name + "." + s,
+                    temp_table=used_tables,
+                    ref=False,
+                )
+                target_dict[s] = [
+                    cols[0],
+                    list(set(list(self.all_used_col) + cols[1])),
+                ]
+            return
+        # the prefixed columns are not used columns, so every column gets the same ones
+        used_col = set(list(self.all_used_col))
+        for s, col in star_cols:
+            target_dict[s] = [[col], list(used_col)]
+
     def _resolve_agg_star(
         self,
         col_name: Optional[str] = "",
@@ -824,16 +1168,9 @@ class ColumnLineageNoConn:
                     t_name = self.table_alias_dict[t_name]
                 if col_name == "*":
                     if t_name in self.input_table_dict.keys():
-                        for s in self.input_table_dict[t_name]:
-                            cols = self._find_alias_col(
-                                col_sql=t_name + "." + s,
-                                temp_table=used_tables,
-                                ref=False,
-                            )
-                            target_dict[s] = [
-                                cols[0],
-                                list(set(list(self.all_used_col) + cols[1])),
-                            ]
+                        self._expand_input_star(
+                            t_name=t_name, used_tables=used_tables, target_dict=target_dict
+                        )
                     elif t_name in self.cte_dict.keys():
                         for s in list(self.cte_dict[t_name].keys()):
                             cols = self._find_alias_col(
@@ -890,16 +1227,9 @@ class ColumnLineageNoConn:
                         if t_name in self.table_alias_dict.keys():
                             t_name = self.table_alias_dict[t_name]
                         if t_name in self.input_table_dict.keys():
-                            for s in self.input_table_dict[t_name]:
-                                cols = self._find_alias_col(
-                                    col_sql=t_name + "." + s,
-                                    temp_table=used_tables,
-                                    ref=False,
-                                )
-                                target_dict[s] = [
-                                    cols[0],
-                                    list(set(list(self.all_used_col) + cols[1])),
-                                ]
+                            self._expand_input_star(
+                                t_name=t_name, used_tables=used_tables, target_dict=target_dict
+                            )
                         elif t_name in self.cte_dict.keys():
                             for s in list(self.cte_dict[t_name].keys()):
                                 cols = self._find_alias_col(
@@ -922,14 +1252,18 @@ class ColumnLineageNoConn:
                         if t_name in self.table_alias_dict.keys():
                             t_name = self.table_alias_dict[t_name]
                         if t_name in self.input_table_dict.keys():
-                            temp_col = []
-                            for s in self.input_table_dict[t_name]:
-                                cols = self._find_alias_col(
-                                    col_sql=t_name + "." + s,
-                                    temp_table=used_tables,
-                                    ref=True,
-                                )
-                                temp_col = temp_col + cols[0] + cols[1]
+                            star_cols = self._input_star_columns(table=t_name)
+                            if star_cols is not None:
+                                temp_col = [x[1] for x in star_cols]
+                            else:
+                                temp_col = []
+                                for s in self.input_table_dict[t_name]:
+                                    cols = self._find_alias_col(
+                                        col_sql=t_name + "." + s,
+                                        temp_table=used_tables,
+                                        ref=True,
+                                    )
+                                    temp_col = temp_col + cols[0] + cols[1]
                             target_dict[col_name] = [
                                 [""],
                                 list(set(self.all_used_col).union(set(temp_col))),
@@ -0,0 +1,207 @@
+import heapq
+import threading
+from typing import Callable, List, Optional
+
+
+class StatementRecord:
+    """
+    What happened to one sql in the run, the times are in seconds
+    """
+
+    __slots__ = [
+        "name",
+        "parse_time",
+        "resolve_time",
+        "db_round_trips",
+        "db_time",
+        "outcome",
+        "error",
+        "message",
+    ]
+
+    def __init__(self, name: Optional[str] = "") -> None:
+        self.name = name
+        # sqlglot parsing
+        self.parse_time = 0.0
+        # ColumnLineage or ColumnLineageNoConn, without the db time
+        self.resolve_time = 0.0
+        self.db_round_trips = 0
+        self.db_time = 0.0
+        # parsed, failed, skipped, cached or reused
+        self.outcome = None
+        # the class name of the error if it failed
+        self.error = None
+        self.message = None
+
+    @property
+    def total_time(self) -> float:
+        return self.parse_time + self.resolve_time + self.db_time
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class Instrumentation:
+    def __init__(
+        self, verbose: Optional[bool] = True, callbacks: Optional[List[Callable]] = None
+    ) -> None:
+        """
+        Collect a StatementRecord for every sql in the run along with running totals, and take the progress messages
+        that used to be printed
+        :param verbose: print the progress messages
+        :param callbacks: functions called with the StatementRecord when a sql is finished
+        """
+        self.verbose = verbose
+        self.callbacks = list(callbacks) if callbacks else []
+        # name -> StatementRecord
+        self.records = {}
+        self.outcome_dict = {}
+        self.error_dict = {}
+        self.parse_time = 0.0
+        self.resolve_time = 0.0
+        self.db_time = 0.0
+        self.db_round_trips = 0
+        # reading and rewriting the sql in SqlToDict, before any of it is parsed
+        self.ingest_time = 0.0
+        # the EXPLAIN workers finish their sql concurrently
+        self.lock = threading.RLock()
+        # the sql each thread is working on
+        self.local = threading.local()
+
+    def add_callback(self, callback: Callable = None) -> None:
+        """
+        Register a function to be called with the StatementRecord when a sql is finished
+        :param callback: the function
+        """
+        self.callbacks.append(callback)
+
+    def log(self, message: Optional[str] = "") -> None:
+        if self.verbose:
+            print(message)
+
+    def record(self, name: Optional[str] = "") -> StatementRecord:
+        """
+        Get the record of the sql, it is created on first use
+        :param name: the name of the sql
+        :return: the StatementRecord
+        """
+        with self.lock:
+            if name not in self.records:
+                self.records[name] = StatementRecord(name=name)
+            return self.records[name]
+
+    def start(self, name: Optional[str] = "") -> StatementRecord:
+        """
+        Mark the sql as the one the current thread is working on, so the db time is added to it. A sql that finished
+        already, e.g. failed when it was run ahead as a dependency of another sql, is taken out of the totals until it
+        finishes again
+        :param name: the name of the sql
+        :return: the StatementRecord
+        """
+        record = self.record(name=name)
+        with self.lock:
+            if record.outcome is not None:
+                self._retract(record=record)
+        self.local.record = record
+        return record
+
+    def _retract(self, record: StatementRecord = None) -> None:
+        """
+        Take the finished record out of the totals, its times are added again with the next attempt's when it finishes
+        :param record: the StatementRecord
+        """
+        self.outcome_dict[record.outcome] -= 1
+        if not self.outcome_dict[record.outcome]:
+            del self.outcome_dict[record.outcome]
+        if record.error is not None:
+            self.error_dict[record.error] -= 1
+            if not self.error_dict[record.error]:
+                del self.error_dict[record.error]
+        self.parse_time -= record.parse_time
+        self.resolve_time -= record.resolve_time
+        self.db_time -= record.db_time
+        self.db_round_trips -= record.db_round_trips
+        record.outcome = None
+        record.error = None
+        record.message = None
+
+    def add_db_time(
+        self, t: Optional[float] = 0, round_trips: Optional[int] = 1
+    ) -> None:
+        """
+        Add the time of the database round trips to the sql the current thread is working on
+        :param t: the time in seconds
+        :param round_trips: the number of round trips
+        """
+        record = getattr(self.local, "record", None)
+        if record is not None:
+            record.db_time += t
+            record.db_round_trips += round_trips
+
+    def finish(
+        self,
+        name: Optional[str] = "",
+        outcome: Optional[str] = "parsed",
+        error: Optional[Exception] = None,
+        message: Optional[str] = None,
+    ) -> StatementRecord:
+        """
+        Finish the record of the sql, add it to the totals and call the callbacks
+        :param name: the name of the sql
+        :param outcome: parsed, failed, skipped, cached or reused
+        :param error: the exception if it failed
+        :param message: why it failed or was skipped
+        :return: the StatementRecord
+        """
+        record = self.record(name=name)
+        if getattr(self.local, "record", None) is record:
+            self.local.record = None
+        with self.lock:
+            if record.outcome is not None:
+                # finished already in this attempt, e.g. failed in _run_lineage_no_conn and again in the run loop
+                return record
+            record.outcome = outcome
+            if error is not None:
+                record.error = type(error).__name__
+                if message is None:
+                    message = str(error)
+            record.message = message
+            self.outcome_dict[outcome] = self.outcome_dict.get(outcome, 0) + 1
+            if record.error is not None:
+                self.error_dict[record.error] = self.error_dict.get(record.error, 0) + 1
+            self.parse_time += record.parse_time
+            self.resolve_time += record.resolve_time
+            self.db_time += record.db_time
+            self.db_round_trips += record.db_round_trips
+        for callback in self.callbacks:
+            callback(record)
+        return record
+
+    def summary(self, slowest: Optional[int] = 10) -> dict:
+        """
+        The totals of the finished sql, with the slowest ones
+        :param slowest: the number of slowest sql to include
+        :return: the dict with the summary
+        """
+        with self.lock:
+            finished = [r for r in self.records.values() if r.outcome is not None]
+            return {
+                "statements": len(finished),
+                "outcomes": dict(self.outcome_dict),
+                "errors": dict(self.error_dict),
+                "ingest_time": self.ingest_time,
+                "parse_time": self.parse_time,
+                "resolve_time": self.resolve_time,
+                "db_time": self.db_time,
+                "db_round_trips": self.db_round_trips,
+                "slowest": [
+                    (r.name, r.total_time)
+                    for r in heapq.nlargest(
+                        slowest, finished, key=lambda r: r.total_time
+                    )
+                ],
+            }
+
+
+if __name__ == "__main__":
+    pass
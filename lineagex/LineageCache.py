@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+from typing import Any, List, Optional, Tuple
+
+import sqlglot
+
+from . import __version__
+
+
+class TrackedTableDict:
+    """
+    Read-only view over input_table_dict that records every table name looked up, so the cache knows which
+    entries a lineage result depends on
+    """
+
+    def __init__(self, table_dict: Optional[dict] = None) -> None:
+        self.table_dict = table_dict
+        self.accessed = set()
+
+    def __contains__(self, key: Any) -> bool:
+        self.accessed.add(key)
+        return key in self.table_dict
+
+    def __getitem__(self, key: Any) -> Any:
+        self.accessed.add(key)
+        return self.table_dict[key]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        self.accessed.add(key)
+        return self.table_dict.get(key, default)
+
+    def keys(self) -> "TrackedTableDict":
+        return self
+
+
+class LineageCache:
+    def __init__(
+        self,
+        cache_dir: Optional[str] = ".lineagex_cache",
+        max_size: Optional[int] = 256 * 1024 * 1024,
+    ) -> None:
+        """
+        Persistent, content-addressed cache for the no-connection lineage results. Each statement keeps a small entry
+        keyed by the hash of its preprocessed sql and dialect, with the tables it references and the input_table_dict
+        names its last run looked up. The lineage result is keyed by the statement hash plus the current value of
+        each of those names, so a change in an upstream table's columns is a different key.
+        :param cache_dir: the directory to keep the cache in
+        :param max_size: the maximum size of the cache directory in bytes, least recently used entries are evicted
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.size = self._scan_size()
+
+    def stats(self) -> dict:
+        """
+        Report the hit and miss counts of this run along with the cache size
+        :return: the dict with the cache statistics
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": self.size,
+        }
+
+    def get_tables(self, sql: Optional[str] = "", dialect: Optional[str] = "") -> Optional[List]:
+        """
+        Get the tables referenced by the sql from a previous run, so the sql does not need to be parsed again
+        :param sql: the preprocessed sql
+        :param dialect: the dialect of the sql
+        :return: the list of tables, None if the sql is not cached
+        """
+        entry = self._read(self._statement_key(sql=sql, dialect=dialect))
+        if entry is None:
+            return None
+        return entry["tables"]
+
+    def put_tables(
+        self, sql: Optional[str] = "", dialect: Optional[str] = "", tables: Optional[List] = None
+    ) -> None:
+        """
+        Store the tables referenced by the sql
+        :param sql: the preprocessed sql
+        :param dialect: the dialect of the sql
+        :param tables: the tables referenced by the sql
+        """
+        key = self._statement_key(sql=sql, dialect=dialect)
+        entry = self._read(key, touch=False)
+        deps = entry["deps"] if entry is not None else None
+        self._write(key, {"tables": tables, "deps": deps})
+
+    def get(
+        self, sql: Optional[str] = "", dialect: Optional[str] = "", input_table_dict: Optional[dict] = None
+    ) -> Optional[Tuple[List, dict]]:
+        """
+        Look up the lineage result of the sql given the current input_table_dict
+        :param sql: the preprocessed sql
+        :param dialect: the dialect of the sql
+        :param input_table_dict: the current input_table_dict
+        :return: the table_list and column_dict on a hit, None on a miss
+        """
+        cached = self.lookup(sql=sql, dialect=dialect, input_table_dict=input_table_dict)
+        if cached is None:
+            return None
+        return cached[0], cached[1]
+
+    def lookup(
+        self, sql: Optional[str] = "", dialect: Optional[str] = "", input_table_dict: Optional[dict] = None
+    ) -> Optional[Tuple[List, dict, dict]]:
+        """
+        Look up the lineage result of the sql given the current input_table_dict, along with the entries it depends on
+        :param sql: the preprocessed sql
+        :param dialect: the dialect of the sql
+        :param input_table_dict: the current input_table_dict
+        :return: the table_list, column_dict and the input_table_dict entries they depend on, None on a miss
+        """
+        stmt_key = self._statement_key(sql=sql, dialect=dialect)
+        entry = self._read(stmt_key)
+        result = None
+        if entry is not None and entry["deps"] is not None:
+            deps = {k: input_table_dict.get(k) for k in entry["deps"]}
+            result = self._read(self._result_key(stmt_key=stmt_key, deps=deps))
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result["tables"], result["columns"], deps
+
+    def put(
+        self,
+        sql: Optional[str] = "",
+        dialect: Optional[str] = "",
+        deps: Optional[dict] = None,
+        table_list: Optional[List] = None,
+        column_dict: Optional[dict] = None,
+    ) -> None:
+        """
+        Store the lineage result of the sql
+        :param sql: the preprocessed sql
+        :param dialect: the dialect of the sql
+        :param deps: the input_table_dict entries the lineage run looked up, missing ones as None
+        :param table_list: the resulting table_list
+        :param column_dict: the resulting column_dict
+        """
+        stmt_key = self._statement_key(sql=sql, dialect=dialect)
+        entry = self._read(stmt_key, touch=False)
+        tables = entry["tables"] if entry is not None else None
+        self._write(stmt_key, {"tables": tables, "deps": sorted(deps.keys())})
+        self._write(
+            self._result_key(stmt_key=stmt_key, deps=deps),
+            {"tables": table_list, "columns": column_dict},
+        )
+
+    def _statement_key(self, sql: Optional[str] = "", dialect: Optional[str] = "") -> str:
+        return _hash([__version__, sqlglot.__version__, dialect, sql])
+
+    def _result_key(self, stmt_key: Optional[str] = "", deps: Optional[dict] = None) -> str:
+        return _hash([stmt_key, sorted(deps.items())])
+
+    def _path(self, key: Optional[str] = "") -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def _read(self, key: Optional[str] = "", touch: Optional[bool] = True) -> Optional[dict]:
+        """
+        Read an entry from the cache, and mark it as recently used
+        :param key: the key of the entry
+        :param touch: whether to update the last used time of the entry
+        :return: the entry, None if it is missing or unreadable
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if touch:
+                os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def _write(self, key: Optional[str] = "", entry: Optional[dict] = None) -> None:
+        """
+        Write an entry to the cache atomically, and evict the least recently used entries if the cache is too big
+        :param key: the key of the entry
+        :param entry: the json-serializable entry
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(entry).encode("utf-8")
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        self.size += len(data) - old_size
+        if self.max_size is not None and self.size > self.max_size:
+            self._evict()
+
+    def _scan_size(self) -> int:
+        size = 0
+        for _, path in self._entries():
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                continue
+        return size
+
+    def _entries(self) -> List[Tuple[float, str]]:
+        """
+        List all the entries in the cache directory with their last used time
+        :return: the list of (last used time, path)
+        """
+        entries = []
+        for sub_dir in os.scandir(self.cache_dir):
+            if not sub_dir.is_dir():
+                continue
+            for f in os.scandir(sub_dir.path):
+                if f.name.endswith(".json"):
+                    try:
+                        entries.append((f.stat().st_mtime, f.path))
+                    except OSError:
+                        continue
+        return entries
+
+    def _evict(self) -> None:
+        """
+        Remove the least recently used entries until the cache is down to 90% of max_size, so eviction does not run
+        on every write once the cache is full
+        """
+        target = self.max_size * 0.9
+        for _, path in sorted(self._entries()):
+            if self.size <= target:
+                break
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+            self.evictions += 1
+
+
+def _hash(obj: Any = None) -> str:
+    return hashlib.sha256(json.dumps(obj).encode("utf-8")).hexdigest()
+
+
+if __name__ == "__main__":
+    pass
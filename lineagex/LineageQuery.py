@@ -0,0 +1,247 @@
+from array import array
+from typing import List, Optional
+
+from .LineageStore import LineageStore
+
+# the kinds of the edges
+DIRECT = 0
+INDIRECT = 1
+
+
+def _csr(
+    size: Optional[int] = 0,
+    keys: Optional[array] = None,
+    values: Optional[array] = None,
+    kinds: Optional[array] = None,
+) -> tuple:
+    """
+    Group the edges by their key into arrays, the edges of node n are targets[offsets[n]:offsets[n + 1]]
+    :param size: the number of nodes
+    :param keys: the node each edge starts from
+    :param values: the node each edge goes to
+    :param kinds: DIRECT or INDIRECT for each edge
+    :return: offsets, targets and kinds
+    """
+    offsets = array("i", [0]) * (size + 1)
+    for k in keys:
+        offsets[k + 1] += 1
+    for n in range(size):
+        offsets[n + 1] += offsets[n]
+    position = array("i", offsets[:-1])
+    targets = array("i", [0]) * len(keys)
+    target_kinds = array("b", [0]) * len(keys)
+    for k, v, kind in zip(keys, values, kinds):
+        p = position[k]
+        targets[p] = v
+        target_kinds[p] = kind
+        position[k] = p + 1
+    return offsets, targets, target_kinds
+
+
+class LineageQuery:
+    def __init__(self, output_dict: Optional[dict] = None) -> None:
+        """
+        Answer transitive upstream and downstream questions over the lineage of a run. The edges are indexed both
+        ways once, and the reachability of each node is kept, so repeated questions and the questions about nodes
+        upstream or downstream of one already answered are cheap. A column is named schema.table.column and a table
+        schema.table, as in output.json. The lineage taken with a db connection does not tell the direct sources from
+        the indirect ones, all of them count as direct.
+        :param output_dict: the output_dict of the run, or the loaded output.json
+        """
+        self.store = LineageStore()
+        for key, val in output_dict.items():
+            self.store.add(name=key, record=val)
+        # (direction, level) -> (offsets, targets, kinds)
+        self.graphs = {}
+        self.columns = set()
+        self.tables = set()
+        self._build()
+        # (direction, level, node, depth, direct_only) -> frozenset of the nodes reached
+        self.memo = {}
+        # the same key -> the sorted names of the nodes reached
+        self.results = {}
+
+    def _build(self) -> None:
+        store = self.store
+        names = store.names
+        intern = store.intern
+        column_keys, column_values, column_kinds = array("i"), array("i"), array("b")
+        # (source table, table) -> DIRECT if any of the column edges between them is direct
+        table_edges = {}
+        for t in list(store.records.values()):
+            table = intern(t.table_name)
+            self.tables.add(table)
+            offsets = t.offsets
+            for idx, col in enumerate(t.columns):
+                column = intern(t.table_name + "." + names[col])
+                self.columns.add(column)
+                if t.split:
+                    segments = [
+                        (offsets[2 * idx], offsets[2 * idx + 1], DIRECT),
+                        (offsets[2 * idx + 1], offsets[2 * idx + 2], INDIRECT),
+                    ]
+                else:
+                    segments = [(offsets[idx], offsets[idx + 1], DIRECT)]
+                for start, end, kind in segments:
+                    for source in t.edges[start:end]:
+                        name = names[source]
+                        # the placeholder of the base tables in output.json
+                        if not name:
+                            continue
+                        self.columns.add(source)
+                        column_keys.append(column)
+                        column_values.append(source)
+                        column_kinds.append(kind)
+                        source_table = intern(name[: name.rfind(".")])
+                        self.tables.add(source_table)
+                        key = (source_table, table)
+                        table_edges[key] = min(table_edges.get(key, INDIRECT), kind)
+            # the tables that are only read, e.g. in a WHERE EXISTS
+            for source_table in t.tables:
+                if names[source_table]:
+                    self.tables.add(source_table)
+                    table_edges.setdefault((source_table, table), INDIRECT)
+        size = len(names)
+        table_keys = array("i", [k[1] for k in table_edges])
+        table_values = array("i", [k[0] for k in table_edges])
+        table_kinds = array("b", table_edges.values())
+        self.graphs[("upstream", "column")] = _csr(
+            size, column_keys, column_values, column_kinds
+        )
+        self.graphs[("downstream", "column")] = _csr(
+            size, column_values, column_keys, column_kinds
+        )
+        self.graphs[("upstream", "table")] = _csr(
+            size, table_keys, table_values, table_kinds
+        )
+        self.graphs[("downstream", "table")] = _csr(
+            size, table_values, table_keys, table_kinds
+        )
+
+    def upstream(
+        self,
+        name: Optional[str] = "",
+        depth: Optional[int] = None,
+        direct_only: Optional[bool] = False,
+        level: Optional[str] = "column",
+    ) -> List[str]:
+        """
+        Find what the column or table is derived from
+        :param name: the column, or the table with level table
+        :param depth: the number of hops to follow, all of them if not given
+        :param direct_only: only follow the direct sources, not the ones used in e.g. WHERE or JOIN
+        :param level: column or table
+        :return: the sorted names of the columns or tables upstream
+        """
+        return self._query(
+            direction="upstream",
+            name=name,
+            depth=depth,
+            direct_only=direct_only,
+            level=level,
+        )
+
+    def downstream(
+        self,
+        name: Optional[str] = "",
+        depth: Optional[int] = None,
+        direct_only: Optional[bool] = False,
+        level: Optional[str] = "column",
+    ) -> List[str]:
+        """
+        Find what is derived from the column or table, the impact of changing it
+        :param name: the column, or the table with level table
+        :param depth: the number of hops to follow, all of them if not given
+        :param direct_only: only follow the direct uses, not the ones in e.g. WHERE or JOIN
+        :param level: column or table
+        :return: the sorted names of the columns or tables downstream
+        """
+        return self._query(
+            direction="downstream",
+            name=name,
+            depth=depth,
+            direct_only=direct_only,
+            level=level,
+        )
+
+    def _query(
+        self,
+        direction: Optional[str] = "upstream",
+        name: Optional[str] = "",
+        depth: Optional[int] = None,
+        direct_only: Optional[bool] = False,
+        level: Optional[str] = "column",
+    ) -> List[str]:
+        if level not in ("column", "table"):
+            raise ValueError("level should be column or table, not {}".format(level))
+        if depth is not None and depth < 0:
+            raise ValueError("depth should not be negative")
+        node = self.store.ids.get(name)
+        if node is None or node not in (
+            self.columns if level == "column" else self.tables
+        ):
+            raise KeyError("{} {} is not in the lineage".format(level, name))
+        key = (direction, level, node, depth, direct_only)
+        result = self.results.get(key)
+        if result is None:
+            reached = self._reachable(
+                graph=(direction, level),
+                node=node,
+                depth=depth,
+                direct_only=direct_only,
+            )
+            names = self.store.names
+            result = tuple(sorted(names[i] for i in reached))
+            self.results[key] = result
+        return list(result)
+
+    def _reachable(
+        self,
+        graph: Optional[tuple] = None,
+        node: Optional[int] = 0,
+        depth: Optional[int] = None,
+        direct_only: Optional[bool] = False,
+    ) -> frozenset:
+        """
+        Walk the graph breadth first from the node, the nodes whose reachability is known are not walked again
+        :return: the nodes reached, without the node unless it is on a cycle
+        """
+        key = graph + (node, depth, direct_only)
+        reached = self.memo.get(key)
+        if reached is not None:
+            return reached
+        offsets, targets, kinds = self.graphs[graph]
+        reached = set()
+        seen = {node}
+        frontier = [node]
+        hops = 0
+        while frontier and (depth is None or hops < depth):
+            hops += 1
+            next_frontier = []
+            for n in frontier:
+                for e in range(offsets[n], offsets[n + 1]):
+                    if direct_only and kinds[e] == INDIRECT:
+                        continue
+                    m = targets[e]
+                    reached.add(m)
+                    if m in seen:
+                        continue
+                    seen.add(m)
+                    known = (
+                        self.memo.get(graph + (m, None, direct_only))
+                        if depth is None
+                        else None
+                    )
+                    if known is not None:
+                        reached.update(known)
+                        seen.update(known)
+                    else:
+                        next_frontier.append(m)
+            frontier = next_frontier
+        reached = frozenset(reached)
+        self.memo[key] = reached
+        return reached
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,112 @@
+from array import array
+from typing import Optional
+
+
+class TableLineage:
+    """
+    The lineage of one table, with the table and column names as ids in the LineageStore
+    """
+
+    __slots__ = ["table_name", "sql", "tables", "columns", "offsets", "edges", "split"]
+
+    def __init__(self) -> None:
+        self.table_name = ""
+        self.sql = ""
+        # ids of the tables used
+        self.tables = array("i")
+        # ids of the column names, in the order of the output
+        self.columns = array("i")
+        # the sources of column i are edges[offsets[i]:offsets[i + 1]], or with split the direct ones are
+        # edges[offsets[2 * i]:offsets[2 * i + 1]] and the indirect ones edges[offsets[2 * i + 1]:offsets[2 * i + 2]]
+        self.offsets = array("i")
+        self.edges = array("i")
+        # the sources are kept as [direct, indirect] instead of one list
+        self.split = True
+
+
+class LineageStore:
+    def __init__(self) -> None:
+        """
+        Keep the column level lineage with every table and column name stored once and referred to by an integer id,
+        the sources of the columns are kept in arrays of ids instead of lists of strings
+        """
+        # name -> id and id -> name
+        self.ids = {}
+        self.names = []
+        # output name -> TableLineage, in the order of the output
+        self.records = {}
+
+    def intern(self, name: Optional[str] = "") -> int:
+        """
+        Get the id of the name, it is given a new id on first use
+        :param name: the table or column name
+        :return: the id
+        """
+        i = self.ids.get(name)
+        if i is None:
+            i = len(self.names)
+            self.ids[name] = i
+            self.names.append(name)
+        return i
+
+    def add(self, name: Optional[str] = "", record: Optional[dict] = None) -> None:
+        """
+        Add the lineage of the table, replacing the one with the same name
+        :param name: the name in the output
+        :param record: the lineage in the output.json format
+        """
+        intern = self.intern
+        t = TableLineage()
+        t.table_name = record["table_name"]
+        t.sql = record["sql"]
+        t.tables = array("i", [intern(i) for i in record["tables"]])
+        t.offsets.append(0)
+        # the sources of every column are [direct, indirect] or one list for the whole record, a column without
+        # sources is an empty list only in the latter
+        first = next((v for v in record["columns"].values() if v), None)
+        t.split = first is not None and isinstance(first[0], list)
+        for col, sources in record["columns"].items():
+            t.columns.append(intern(col))
+            if t.split:
+                for s in sources:
+                    t.edges.extend([intern(i) for i in s])
+                    t.offsets.append(len(t.edges))
+            else:
+                t.edges.extend([intern(i) for i in sources])
+                t.offsets.append(len(t.edges))
+        self.records[name] = t
+
+    def materialize(self, name: Optional[str] = "") -> dict:
+        """
+        Build the lineage of the table in the output.json format
+        :param name: the name in the output
+        :return: the lineage
+        """
+        t = self.records[name]
+        names = self.names
+        edges = t.edges
+        offsets = t.offsets
+        columns = {}
+        for idx, col in enumerate(t.columns):
+            if t.split:
+                columns[names[col]] = [
+                    [names[i] for i in edges[offsets[2 * idx] : offsets[2 * idx + 1]]],
+                    [
+                        names[i]
+                        for i in edges[offsets[2 * idx + 1] : offsets[2 * idx + 2]]
+                    ],
+                ]
+            else:
+                columns[names[col]] = [
+                    names[i] for i in edges[offsets[idx] : offsets[idx + 1]]
+                ]
+        return {
+            "tables": [names[i] for i in t.tables],
+            "columns": columns,
+            "table_name": t.table_name,
+            "sql": t.sql,
+        }
+
+
+if __name__ == "__main__":
+    pass
@@ -1,31 +1,155 @@
+import bisect
+import json
+import os
 import time
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, List
 from typing import Optional
+from typing import Tuple
 
 from sqlglot import exp, expressions, parse_one
 
-from .ColumnLineageNoConn import ColumnLineageNoConn
+from .ColumnLineageNoConn import ColumnLineageNoConn, table_name_alias
+from .Instrumentation import Instrumentation
+from .LineageCache import LineageCache, TrackedTableDict
+from .SchemaQualifier import SchemaQualifier
 from .SqlToDict import SqlToDict
-from .utils import produce_json
+from .utils import add_guessed_columns, base_tables, produce_json
 
 
-def parse_one_sql(sql: Optional[str] = "") -> expressions:
+def parse_sql(sql: Optional[str] = "", dialect: str = "postgres") -> expressions:
     """
-    The function to try different dialects for parsing the SQL
+    Parse the sql once for the whole run with the dialect of the run, the AST is used both for finding the tables
+    and for ColumnLineageNoConn
     :param sql: the input sql
+    :param dialect: the dialect of the sql
     :return: the parsed sql AST
     """
-    dialects = ["postgres", "oracle", "mysql", "sqlite", ""]
-    parsed_sql = None
-    for dialect in dialects:
-        try:
-            parsed_sql = parse_one(sql, read=dialect)
-        except Exception as e:
-            continue
+    return parse_one(sql, read=dialect)
+
+
+class _OverlayTableDict:
+    """
+    Read-only input_table_dict for a worker process, the columns written by the upstream statements are looked up
+    before the shared base dict
+    """
+
+    def __init__(self, overlay: Optional[dict] = None, base: Optional[dict] = None) -> None:
+        self.overlay = overlay
+        self.base = base
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self.overlay or key in self.base
+
+    def __getitem__(self, key: Any) -> Any:
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.base[key]
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key in self.overlay:
+            return self.overlay[key]
+        return self.base.get(key, default)
+
+    def keys(self) -> "_OverlayTableDict":
+        return self
+
+
+_worker_input_table_dict = None
+_worker_dialect = None
+# the lowercase columns of the tables for ColumnLineageNoConn, kept for all the sql of the worker
+_worker_column_index = {}
+# the star expansions of the tables for ColumnLineageNoConn, kept the same way
+_worker_star_index = {}
+# the SchemaQualifier of the worker with the qualify resolver, its schema is kept the same way
+_worker_qualifier = None
+
+
+def _init_lineage_worker(
+    input_table_dict: Optional[dict] = None,
+    dialect: str = "postgres",
+    search_path_schema: Optional[List] = None,
+    resolver: Optional[str] = "heuristic",
+) -> None:
+    """
+    Keep the input_table_dict from the start of the run in the worker process, so it is only sent once per worker
+    """
+    global _worker_input_table_dict, _worker_dialect, _worker_column_index, _worker_star_index, _worker_qualifier
+    _worker_input_table_dict = input_table_dict
+    _worker_dialect = dialect
+    _worker_column_index = {}
+    _worker_star_index = {}
+    _worker_qualifier = _qualifier(dialect=dialect, search_path_schema=search_path_schema, resolver=resolver)
+
+
+def _qualifier(
+    dialect: str = "postgres", search_path_schema: Optional[List] = None, resolver: Optional[str] = "heuristic"
+) -> Optional[SchemaQualifier]:
+    """
+    The SchemaQualifier for the resolver
+    :param dialect: the dialect of the sql
+    :param search_path_schema: the schemas the unqualified tables are looked up in
+    :param resolver: heuristic or qualify
+    :return: the SchemaQualifier with qualify, None with heuristic
+    """
+    if resolver == "heuristic":
+        return None
+    if resolver == "qualify":
+        return SchemaQualifier(dialect=dialect, search_path_schema=search_path_schema)
+    raise ValueError("unknown resolver {}, it should be heuristic or qualify".format(resolver))
 
-        if parsed_sql is not None:
-            break
-    return parsed_sql
+
+def _run_lineage_worker(
+    sql: Optional[str] = "", overlay: Optional[dict] = None, sql_ast: expressions = None
+) -> Tuple:
+    """
+    Run ColumnLineageNoConn in a worker process
+    :param sql: the sql to run the lineage
+    :param overlay: the columns of the upstream tables written earlier in the run
+    :param sql_ast: the AST of the sql if it is already parsed
+    :return: the input_table_dict entries it looked up, the table_list, the column_dict, the error message if any,
+    the number of parses and the time it took
+    """
+    table_dict = _OverlayTableDict(overlay=overlay, base=_worker_input_table_dict)
+    tracked_dict = TrackedTableDict(table_dict)
+    parse_count = 0
+    start_time = time.time()
+    try:
+        if sql_ast is None:
+            # the tables came from the cache, so the sql is not parsed yet
+            sql_ast = parse_sql(sql=sql, dialect=_worker_dialect)
+            parse_count = 1
+        col_lineage = ColumnLineageNoConn(
+            sql=sql,
+            dialect=_worker_dialect,
+            input_table_dict=tracked_dict,
+            sql_ast=sql_ast,
+            column_index=_worker_column_index,
+            star_index=_worker_star_index,
+            qualifier=_worker_qualifier,
+        )
+        parse_count += col_lineage.parse_count
+        table_list, column_dict, error = col_lineage.table_list, col_lineage.column_dict, None
+    except Exception as e:
+        table_list, column_dict, error = None, None, str(e)
+    resolve_time = time.time() - start_time
+    deps = {k: table_dict.get(k) for k in tracked_dict.accessed}
+    return deps, table_list, column_dict, error, parse_count, resolve_time
+
+
+def _find_tables_worker(sql: Optional[str] = "") -> Tuple:
+    """
+    Parse the sql and find its tables in a worker process
+    :param sql: the sql to find the tables
+    :return: the list of tables, the AST, the error message if any and the time it took to parse
+    """
+    start_time = time.time()
+    try:
+        sql_ast = parse_sql(sql=sql, dialect=_worker_dialect)
+        parse_time = time.time() - start_time
+        return LineageXNoConn._resolve_table(part_ast=sql_ast), sql_ast, None, parse_time
+    except Exception as e:
+        return None, None, str(e), time.time() - start_time
 
 
 class LineageXNoConn:
@@ -35,22 +159,77 @@ class LineageXNoConn:
         dialect: str = "postgres",
         target_schema: Optional[str] = "public",
         search_path_schema: Optional[str] = "public",
-        input_table_dict: Optional[dict] = None
+        input_table_dict: Optional[dict] = None,
+        cache_dir: Optional[str] = None,
+        cache_size: Optional[int] = 256 * 1024 * 1024,
+        jobs: Optional[int] = None,
+        previous_output: Optional[str] = None,
+        changed_files: Optional[List] = None,
+        verbose: Optional[bool] = True,
+        callbacks: Optional[List[Callable]] = None,
+        on_record: Optional[Callable] = None,
+        shard_by: Optional[str] = None,
+        resolver: Optional[str] = "heuristic",
     ) -> None:
         self.output_dict = {}
         self.parsed = 0
         self.target_schema = target_schema
+        self.instrumentation = Instrumentation(verbose=verbose, callbacks=callbacks)
         search_path_schema = [x.strip() for x in search_path_schema.split(",")]
         search_path_schema.append(target_schema)
-        s2d = SqlToDict(path=sql, schema_list=search_path_schema, dialect=dialect)
+        self.search_path_schema = search_path_schema
+        self.resolver = resolver
+        # the MappingSchema of the qualify resolver is built up over the run
+        self.qualifier = _qualifier(dialect=dialect, search_path_schema=search_path_schema, resolver=resolver)
+        s2d = SqlToDict(
+            path=sql,
+            schema_list=search_path_schema,
+            dialect=dialect,
+            instrumentation=self.instrumentation,
+            jobs=jobs,
+        )
         self.sql_files_dict = s2d.sql_files_dict
         self.org_sql_files_dict = s2d.org_sql_files_dict
+        self.file_dict = s2d.file_dict
         self.dialect = dialect
+        # the lineage is cached apart for each resolver, the tables are the same for both
+        self.lineage_dialect = dialect if resolver == "heuristic" else dialect + ":" + resolver
         if input_table_dict is None:
             self.input_table_dict = {}
         else:
             self.input_table_dict = input_table_dict
+        if cache_dir is None:
+            self.cache = None
+        else:
+            self.cache = LineageCache(cache_dir=cache_dir, max_size=cache_size)
+        self.jobs = jobs if jobs else 1
+        self.sql_tables_dict = {}
+        # the ASTs parsed for finding the tables, handed to ColumnLineageNoConn
+        self.sql_ast_dict = {}
+        # the lowercase columns of the tables in input_table_dict, shared by the ColumnLineageNoConn of the run
+        self.column_index = {}
+        # the star expansions of the tables in input_table_dict, shared the same way
+        self.star_index = {}
+        self.parse_count = 0
+        self.precomputed_dict = {}
+        self.recomputed = 0
         self.finished_list = []
+        self.previous_output = previous_output
+        # the changed files as they are in file_dict, for a list of sql a file is the index of the sql in the list
+        if isinstance(sql, list):
+            self.changed_files = set([str(f) for f in changed_files]) if changed_files else set()
+        else:
+            self.changed_files = set([os.path.abspath(str(f)) for f in changed_files]) if changed_files else set()
+        # name -> (table_list, column_dict) taken from the previous output
+        self.reused_dict = {}
+        self.skipped = 0
+        # with on_record, the records are handed over instead of kept in output_dict, only what the base tables need
+        # is kept
+        self.on_record = on_record
+        self.record_tables = set()
+        self.record_names = []
+        self.base_table_noconn_dict = {}
+        self.shard_by = shard_by
         self._find_lineage_no_conn()
 
     def _find_lineage_no_conn(self):
@@ -60,12 +239,13 @@ class LineageXNoConn:
         """
         not_parsed = 0
         start_time = time.time()
+        if self.jobs > 1:
+            self._precompute_lineage()
+        else:
+            self._reuse_previous()
         for name, sql in self.sql_files_dict.items():
             try:
-                sql_ast = parse_one(sql, read=self.dialect)
-                #print(sql)
-                sql_ast = parse_one_sql(sql='''''' + sql + '''''')
-                all_tables = self._resolve_table(part_ast=sql_ast)
+                all_tables = self._find_sql_tables(name=name, sql=sql)
                 for t in all_tables:
                     if t in self.sql_files_dict.keys() and t not in self.finished_list:
                         self._run_lineage_no_conn(name=t, sql=self.sql_files_dict[t])
@@ -74,23 +254,63 @@ class LineageXNoConn:
                     self._run_lineage_no_conn(name=name, sql=sql)
                     self.finished_list.append(name)
             except Exception as e:
-                print("{} is not processed because it countered {}".format(name, e))
+                self.instrumentation.log(
+                    "{} is not processed because it countered {}".format(name, e)
+                )
+                self.instrumentation.finish(name=name, outcome="failed", error=e)
                 not_parsed += 1
                 continue
-        self._guess_schema_name()
-        print(
+        if self.on_record is None:
+            self._guess_schema_name()
+        self.instrumentation.log(
             "{} SQLs are parsed, {} SQLs are not parsed, took a total of {:.1f} seconds".format(
                 self.parsed, not_parsed, time.time() - start_time
             )
         )
-        produce_json(self.output_dict)
+        if self.jobs > 1:
+            self.instrumentation.log(
+                "{} worker processes, {} SQLs had to be re-run in order".format(
+                    self.jobs, self.recomputed
+                )
+            )
+        self.instrumentation.log(
+            "sqlglot parsed {} times for {} SQLs".format(
+                self.parse_count, len(self.sql_files_dict)
+            )
+        )
+        if self.cache:
+            self.instrumentation.log(
+                "lineage cache: {} hits, {} misses, {} evictions".format(
+                    self.cache.hits, self.cache.misses, self.cache.evictions
+                )
+            )
+        if self.previous_output:
+            self.instrumentation.log(
+                "{} SQLs are skipped and reused from {}".format(
+                    self.skipped, self.previous_output
+                )
+            )
+        if self.on_record is None:
+            produce_json(self.output_dict, shard_by=self.shard_by)
+            return
+        # the names the output would have after _guess_schema_name
+        tables_dict = self._schema_names(all_tables=self.record_tables)
+        for record in base_tables(
+            all_tables=list(self.record_tables),
+            output_names=[tables_dict.get(n, n) for n in self.record_names],
+            base_table_noconn_dict=self.base_table_noconn_dict,
+        ).values():
+            self.on_record(record)
 
     def _run_lineage_no_conn(self, name: Optional[str] = "", sql: Optional[str] = ""):
-        print(name, " processing")
+        self.instrumentation.log("{}  processing".format(name))
+        self.instrumentation.start(name=name)
+        try:
+            table_list, column_dict, outcome = self._get_lineage(name=name, sql=sql)
+        except Exception as e:
+            self.instrumentation.finish(name=name, outcome="failed", error=e)
+            raise
         self.parsed += 1
-        col_lineage = ColumnLineageNoConn(
-            sql=sql, dialect=self.dialect, input_table_dict=self.input_table_dict
-        )
         # if len(name.split(".")) == 1:
         #     self.output_dict[self.target_schema + "." + name] = {
         #         "tables": col_lineage.table_list,
@@ -100,19 +320,402 @@ class LineageXNoConn:
         # else:
         # if name in self.org_sql_files_dict.keys():
         #     sql = self.org_sql_files_dict[name]
-        self.output_dict[name] = {
-            "tables": col_lineage.table_list,
-            "columns": col_lineage.column_dict,
+        # the lists come from sets, sort them so the same lineage is always written the same way
+        record = {
+            "tables": sorted(table_list),
+            "columns": {k: [sorted(v[0]), sorted(v[1])] for k, v in column_dict.items()},
             "table_name": name,
             "sql": sql,
         }
+        if self.on_record is None:
+            self.output_dict[name] = record
+        else:
+            self.record_tables.update(record["tables"])
+            self.record_names.append(name)
+            add_guessed_columns(base_table_noconn_dict=self.base_table_noconn_dict, entry=record)
+            self.on_record(record)
         # add to the dict with the already parsed tables
-        self.input_table_dict[self.target_schema + "." + name] = list(
-            col_lineage.column_dict.keys()
+        # one list for both names, it is only read
+        columns = list(column_dict.keys())
+        self.input_table_dict[self.target_schema + "." + name] = columns
+        self.input_table_dict[name] = columns
+        self.instrumentation.finish(name=name, outcome=outcome)
+
+    def _find_sql_tables(self, name: Optional[str] = "", sql: Optional[str] = "") -> List:
+        """
+        Find the tables used by the sql, from the cache if the same sql was parsed before
+        :param name: the name of the sql
+        :param sql: the sql to find the tables
+        :return: the list of tables
+        """
+        if name in self.sql_tables_dict:
+            all_tables = self.sql_tables_dict[name]
+            if isinstance(all_tables, Exception):
+                raise all_tables
+            return all_tables
+        try:
+            all_tables = self._parse_sql_tables(name=name, sql=sql)
+        except Exception as e:
+            self.sql_tables_dict[name] = e
+            raise
+        self.sql_tables_dict[name] = all_tables
+        return all_tables
+
+    def _parse_sql_tables(self, name: Optional[str] = "", sql: Optional[str] = "") -> List:
+        """
+        Parse the sql and find its tables, or get them from the cache. The AST is kept for ColumnLineageNoConn.
+        :param name: the name of the sql
+        :param sql: the sql to find the tables
+        :return: the list of tables
+        """
+        if self.cache:
+            all_tables = self.cache.get_tables(sql=sql, dialect=self.dialect)
+            if all_tables is not None:
+                return all_tables
+        self.parse_count += 1
+        start_time = time.time()
+        try:
+            sql_ast = parse_sql(sql=sql, dialect=self.dialect)
+        finally:
+            self.instrumentation.record(name=name).parse_time += time.time() - start_time
+        self.sql_ast_dict[name] = sql_ast
+        all_tables = self._resolve_table(part_ast=sql_ast)
+        if self.cache:
+            self.cache.put_tables(sql=sql, dialect=self.dialect, tables=all_tables)
+        return all_tables
+
+    def _get_lineage(self, name: Optional[str] = "", sql: Optional[str] = "") -> Tuple[List, dict, str]:
+        """
+        Run the column lineage for the sql, or reuse the precomputed or cached result if the sql and the
+        input_table_dict entries it depends on are unchanged
+        :param name: the name of the sql
+        :param sql: the sql to run the lineage
+        :return: the table_list, column_dict and whether it was parsed, cached or reused
+        """
+        # ColumnLineageNoConn changes the AST, so it is only used once
+        sql_ast = self.sql_ast_dict.pop(name, None)
+        if name in self.reused_dict:
+            self.skipped += 1
+            table_list, column_dict = self.reused_dict[name]
+            return table_list, column_dict, "reused"
+        if name in self.precomputed_dict:
+            deps, table_list, column_dict, error, cached, resolve_time = self.precomputed_dict[name]
+            if all(self.input_table_dict.get(k) == v for k, v in deps.items()):
+                self.instrumentation.record(name=name).resolve_time += resolve_time
+                if error is not None:
+                    raise Exception(error)
+                if self.cache and not cached:
+                    self.cache.put(
+                        sql=sql,
+                        dialect=self.lineage_dialect,
+                        deps=deps,
+                        table_list=table_list,
+                        column_dict=column_dict,
+                    )
+                return table_list, column_dict, "cached" if cached else "parsed"
+            self.recomputed += 1
+        if sql_ast is None and name not in self.sql_tables_dict:
+            # run as a dependency before its own turn, find its tables now so the AST is not parsed twice
+            try:
+                self._find_sql_tables(name=name, sql=sql)
+            except Exception:
+                pass
+            sql_ast = self.sql_ast_dict.pop(name, None)
+        if not self.cache:
+            col_lineage = self._column_lineage(
+                name=name, sql=sql, input_table_dict=self.input_table_dict, sql_ast=sql_ast
+            )
+            return col_lineage.table_list, col_lineage.column_dict, "parsed"
+        cached = self.cache.get(
+            sql=sql, dialect=self.lineage_dialect, input_table_dict=self.input_table_dict
         )
-        self.input_table_dict[name] = list(col_lineage.column_dict.keys())
+        if cached is not None:
+            return cached[0], cached[1], "cached"
+        tracked_dict = TrackedTableDict(self.input_table_dict)
+        col_lineage = self._column_lineage(
+            name=name, sql=sql, input_table_dict=tracked_dict, sql_ast=sql_ast
+        )
+        self.cache.put(
+            sql=sql,
+            dialect=self.lineage_dialect,
+            deps={k: self.input_table_dict.get(k) for k in tracked_dict.accessed},
+            table_list=col_lineage.table_list,
+            column_dict=col_lineage.column_dict,
+        )
+        return col_lineage.table_list, col_lineage.column_dict, "parsed"
+
+    def _column_lineage(
+        self,
+        name: Optional[str] = "",
+        sql: Optional[str] = "",
+        input_table_dict: Any = None,
+        sql_ast: expressions = None,
+    ) -> ColumnLineageNoConn:
+        """
+        Run ColumnLineageNoConn for the sql and record the time it took
+        :param name: the name of the sql
+        :param sql: the sql to run the lineage
+        :param input_table_dict: the input_table_dict, or a TrackedTableDict over it
+        :param sql_ast: the AST of the sql if it is already parsed
+        :return: the ColumnLineageNoConn
+        """
+        if sql_ast is None:
+            # the tables came from the cache, so the sql is not parsed yet
+            self.parse_count += 1
+            start_time = time.time()
+            try:
+                sql_ast = parse_sql(sql=sql, dialect=self.dialect)
+            finally:
+                self.instrumentation.record(name=name).parse_time += time.time() - start_time
+        start_time = time.time()
+        try:
+            col_lineage = ColumnLineageNoConn(
+                sql=sql,
+                dialect=self.dialect,
+                input_table_dict=input_table_dict,
+                sql_ast=sql_ast,
+                column_index=self.column_index,
+                star_index=self.star_index,
+                qualifier=self.qualifier,
+            )
+        finally:
+            self.instrumentation.record(name=name).resolve_time += time.time() - start_time
+        self.parse_count += col_lineage.parse_count
+        return col_lineage
 
-    def _resolve_table(self, part_ast: expressions = None) -> List:
+    def _precompute_lineage(self) -> None:
+        """
+        Run ColumnLineageNoConn for all the sql in a process pool ahead of the in-order pass. The statements are put
+        into levels of the dependency DAG following the order the in-order pass would process them in, and each
+        statement is given the columns written by the statements before it. The in-order pass then takes a result
+        only if the input_table_dict entries it looked up match, and re-runs it otherwise, so the output_dict is the
+        same as a serial run.
+        """
+        base_dict = dict(self.input_table_dict)
+        with ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_lineage_worker,
+            initargs=(base_dict, self.dialect, self.search_path_schema, self.resolver),
+        ) as executor:
+            self._precompute_tables(executor=executor)
+            self._reuse_previous()
+            self._precompute_levels(executor=executor, base_dict=base_dict)
+
+    def _precompute_tables(self, executor: ProcessPoolExecutor = None) -> None:
+        """
+        Parse all the sql and find their tables in the process pool
+        :param executor: the process pool
+        """
+        futures = {}
+        for name, sql in self.sql_files_dict.items():
+            if self.cache:
+                all_tables = self.cache.get_tables(sql=sql, dialect=self.dialect)
+                if all_tables is not None:
+                    self.sql_tables_dict[name] = all_tables
+                    continue
+            futures[name] = executor.submit(_find_tables_worker, sql)
+        for name, future in futures.items():
+            try:
+                all_tables, sql_ast, error, parse_time = future.result()
+            except Exception:
+                # leave it to the in-order pass
+                continue
+            self.parse_count += 1
+            self.instrumentation.record(name=name).parse_time += parse_time
+            if error is not None:
+                self.sql_tables_dict[name] = Exception(error)
+                continue
+            self.sql_tables_dict[name] = all_tables
+            self.sql_ast_dict[name] = sql_ast
+            if self.cache:
+                self.cache.put_tables(
+                    sql=self.sql_files_dict[name], dialect=self.dialect, tables=all_tables
+                )
+
+    def _precompute_levels(
+        self, executor: ProcessPoolExecutor = None, base_dict: Optional[dict] = None
+    ) -> None:
+        """
+        Run ColumnLineageNoConn level by level of the dependency DAG in the process pool
+        :param executor: the process pool
+        :param base_dict: the input_table_dict at the start of the run
+        """
+        # the order the serial pass processes the sql in, if every sql succeeds
+        order = []
+        position = {}
+        for name, sql in self.sql_files_dict.items():
+            try:
+                all_tables = self._find_sql_tables(name=name, sql=sql)
+            except Exception:
+                continue
+            for t in all_tables + [name]:
+                if t in self.sql_files_dict.keys() and t not in position:
+                    position[t] = len(order)
+                    order.append(t)
+        # the positions that write each key of the input_table_dict
+        writer_dict = {}
+        for idx, name in enumerate(order):
+            for key in [self.target_schema + "." + name, name]:
+                writer_dict.setdefault(key, []).append(idx)
+        # a sql is one level above the last sql before it that writes a table it uses
+        level_list = []
+        levels = {}
+        for idx, name in enumerate(order):
+            level = 0
+            for t in set(self._used_tables(name=name)):
+                writers = writer_dict.get(t, [])
+                w = bisect.bisect_left(writers, idx)
+                if w > 0:
+                    level = max(level, levels[order[writers[w - 1]]] + 1)
+            levels[name] = level
+            if level == len(level_list):
+                level_list.append([])
+            level_list[level].append(name)
+        written = {}
+        for level_names in level_list:
+            futures = {}
+            for name in level_names:
+                if name in self.reused_dict:
+                    written[position[name]] = list(self.reused_dict[name][1].keys())
+                    continue
+                sql = self.sql_files_dict[name]
+                overlay = {}
+                for t in set(self._used_tables(name=name)):
+                    writers = writer_dict.get(t, [])
+                    # the latest successful write before this sql
+                    for w in reversed(writers[: bisect.bisect_left(writers, position[name])]):
+                        if w in written:
+                            overlay[t] = written[w]
+                            break
+                if self.cache:
+                    cached = self.cache.lookup(
+                        sql=sql,
+                        dialect=self.lineage_dialect,
+                        input_table_dict=_OverlayTableDict(overlay=overlay, base=base_dict),
+                    )
+                    if cached is not None:
+                        table_list, column_dict, deps = cached
+                        self.precomputed_dict[name] = (deps, table_list, column_dict, None, True, 0.0)
+                        written[position[name]] = list(column_dict.keys())
+                        continue
+                futures[name] = executor.submit(
+                    _run_lineage_worker, sql, overlay, self.sql_ast_dict.get(name)
+                )
+            for name, future in futures.items():
+                try:
+                    deps, table_list, column_dict, error, parse_count, resolve_time = future.result()
+                except Exception:
+                    # leave it to the in-order pass
+                    continue
+                self.parse_count += parse_count
+                self.precomputed_dict[name] = (deps, table_list, column_dict, error, False, resolve_time)
+                if error is None:
+                    written[position[name]] = list(column_dict.keys())
+
+    def _reuse_previous(self) -> None:
+        """
+        Find the sql whose result in the previous output.json can be reused. A sql is re-run if it is new, its sql or
+        its file changed, a new, changed or removed sql runs it ahead of its own turn, or it uses a table written by a
+        sql that is re-run or removed. The rest see the same input_table_dict entries as in the previous run as long as
+        the input_table_dict is the same, which output.json does not record, so their previous result is what a full
+        rebuild would give.
+        """
+        if not self.previous_output:
+            return
+        with open(self.previous_output, "r") as f:
+            previous_dict = json.load(f)
+        # the previous entries by the name of their sql, before _guess_schema_name put the schema in front
+        previous_sql_dict = {}
+        ambiguous = set()
+        for key, val in previous_dict.items():
+            if val["sql"] == "this is a base table":
+                continue
+            name = key if key in self.sql_files_dict else key.split(".")[-1]
+            if name in previous_sql_dict:
+                ambiguous.add(name)
+            previous_sql_dict[name] = val
+        rerun = set()
+        for name, sql in self.sql_files_dict.items():
+            try:
+                self._find_sql_tables(name=name, sql=sql)
+            except Exception:
+                # its tables are unknown
+                rerun.add(name)
+                continue
+            previous = previous_sql_dict.get(name)
+            if (
+                previous is None
+                or previous["sql"] != sql
+                or name in ambiguous
+                or self._file_changed(name=name)
+            ):
+                rerun.add(name)
+        removed = set(previous_sql_dict.keys()) - set(self.sql_files_dict.keys())
+        # the sql run ahead of their turn by the new, changed or removed sql, with either the old or the new sql
+        for name in rerun | removed:
+            all_tables = list(self._used_tables(name=name))
+            previous = previous_sql_dict.get(name)
+            if previous is not None and previous["sql"] != self.sql_files_dict.get(name):
+                all_tables.extend(self._previous_tables(sql=previous["sql"]))
+            rerun.update([t for t in all_tables if t in self.sql_files_dict.keys()])
+        # the downstream closure, by the table name without the schema
+        written = set([t.split(".")[-1] for t in rerun | removed])
+        grown = True
+        while grown:
+            grown = False
+            for name in self.sql_files_dict.keys():
+                if name in rerun:
+                    continue
+                if any(t.split(".")[-1] in written for t in self._used_tables(name=name)):
+                    rerun.add(name)
+                    written.add(name.split(".")[-1])
+                    grown = True
+        for name in self.sql_files_dict.keys():
+            if name not in rerun:
+                previous = previous_sql_dict[name]
+                self.reused_dict[name] = (previous["tables"], previous["columns"])
+                self.sql_ast_dict.pop(name, None)
+
+    def _file_changed(self, name: Optional[str] = "") -> bool:
+        """
+        Whether the file of the sql is in changed_files
+        :param name: the name of the sql
+        :return: whether its file changed
+        """
+        file = self.file_dict.get(name, "")
+        if file in self.changed_files:
+            return True
+        return os.path.abspath(file) in self.changed_files
+
+    def _previous_tables(self, sql: Optional[str] = "") -> List:
+        """
+        Find the tables used by a sql from the previous output
+        :param sql: the previous sql
+        :return: the list of tables, empty if it fails to parse
+        """
+        if self.cache:
+            all_tables = self.cache.get_tables(sql=sql, dialect=self.dialect)
+            if all_tables is not None:
+                return all_tables
+        try:
+            self.parse_count += 1
+            return self._resolve_table(part_ast=parse_sql(sql=sql, dialect=self.dialect))
+        except Exception:
+            return []
+
+    def _used_tables(self, name: Optional[str] = "") -> List:
+        """
+        The tables used by the sql that is already parsed, empty if it failed to parse
+        :param name: the name of the sql
+        :return: the list of tables
+        """
+        all_tables = self.sql_tables_dict.get(name, [])
+        if isinstance(all_tables, Exception):
+            return []
+        return all_tables
+
+    @staticmethod
+    def _resolve_table(part_ast: expressions = None) -> List:
         """
         Find the tables in the given ast
         :param part_ast: the ast to find the table
@@ -121,19 +724,20 @@ class LineageXNoConn:
         # Resolve FROM
         for table_sql in part_ast.find_all(exp.From):
             for table in table_sql.find_all(exp.Table):
-                temp_table_list = self._find_table(
+                temp_table_list = LineageXNoConn._find_table(
                     table=table, temp_table_list=temp_table_list
                 )
         # Resolve JOIN
         for table_sql in part_ast.find_all(exp.Join):
             for table in table_sql.find_all(exp.Table):
-                temp_table_list = self._find_table(
+                temp_table_list = LineageXNoConn._find_table(
                     table=table, temp_table_list=temp_table_list
                 )
         return temp_table_list
 
+    @staticmethod
     def _find_table(
-        self, table: expressions = None, temp_table_list: Optional[List] = None
+        table: expressions = None, temp_table_list: Optional[List] = None
     ) -> List:
         """
         Update table alias and find all aliased used table names
@@ -141,12 +745,9 @@ class LineageXNoConn:
         :param temp_table_list: temporary list of tables for appending the used tables
         :return:
         """
-        if table.alias == "":
-            temp_table_list.append(table.sql())
-        else:
-            temp = table.sql().split(" ")
-            if temp[1] == "AS" or temp[1] == "as":
-                temp_table_list.append(temp[0])
+        name, _ = table_name_alias(table=table)
+        if name is not None:
+            temp_table_list.append(name)
         return temp_table_list
 
     def _guess_schema_name(self):
@@ -156,16 +757,25 @@ class LineageXNoConn:
         all_tables = []
         for key, val in self.output_dict.items():
             all_tables.extend(val["tables"])
-        all_tables = list(set(all_tables))
-        tables_dict = {}
-        for t in all_tables:
-            tables_dict[t.split(".")[-1]] = t
-        for key, val in self.output_dict.copy().items():
+        tables_dict = self._schema_names(all_tables=all_tables)
+        for key in list(self.output_dict.keys()):
             if key in tables_dict.keys():
                 if tables_dict[key] != key:
+                    val = self.output_dict.pop(key)
+                    val["table_name"] = tables_dict[key]
                     self.output_dict[tables_dict[key]] = val
-                    self.output_dict[tables_dict[key]]["table_name"] = tables_dict[key]
-                    self.output_dict.pop(key)
+
+    @staticmethod
+    def _schema_names(all_tables: Any = None) -> dict:
+        """
+        Map the table names without the schema to the schema-qualified names used by the sql
+        :param all_tables: the tables used by the sql
+        :return: the dict of table name: schema-qualified name
+        """
+        tables_dict = {}
+        for t in sorted(set(all_tables)):
+            tables_dict[t.split(".")[-1]] = t
+        return tables_dict
 
 
 if __name__ == "__main__":
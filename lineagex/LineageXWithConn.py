@@ -1,14 +1,21 @@
-from typing import List, Optional, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Tuple, Union
+import heapq
+import threading
 import time
 
 import psycopg2
 from psycopg2 import OperationalError
 from psycopg2.extensions import connection
+from psycopg2.pool import ThreadedConnectionPool
+from sqlglot import exp, parse_one
 
+from .Catalog import RELATION_QUERY, VIEW_QUERY, Catalog
 from .ColumnLineage import ColumnLineage
+from .Instrumentation import Instrumentation
 from .SqlToDict import SqlToDict
 from .stack import *
-from .utils import find_column, produce_json
+from .utils import base_tables, produce_json
 
 
 class LineageXWithConn:
@@ -18,11 +25,26 @@ class LineageXWithConn:
         target_schema: Optional[str] = "public",
         conn_string: Optional[str] = "",
         search_path_schema: Optional[str] = "public",
+        transactional: Optional[bool] = False,
+        jobs: Optional[int] = None,
+        verbose: Optional[bool] = True,
+        callbacks: Optional[List[Callable]] = None,
+        on_record: Optional[Callable] = None,
+        shard_by: Optional[str] = None,
     ) -> None:
+        self.instrumentation = Instrumentation(verbose=verbose, callbacks=callbacks)
+        # with on_record, the records are handed over instead of kept in output_dict
+        self.on_record = on_record
+        self.record_tables = set()
+        self.record_names = []
+        self.shard_by = shard_by
         self.parsed = 0
         self.not_parsed = 0
         self.transaction_time = 0
+        self.worker_time_dict = {}
+        self.cleanup_time = 0
         self.part_tables = None
+        self.catalog = None
         self.df = None
         self.schema = target_schema
         self.search_schema = target_schema + "," + search_path_schema
@@ -30,11 +52,23 @@ class LineageXWithConn:
         self.s = Stack()
         self.sql = sql
         self.sql_files_dict = {}
-        self.creation_list = []
+        self.dependency_dict = {}
         self.finished_list = []
+        self.failed_set = set()
         self.output_dict = {}
+        self.transactional = transactional
+        self.jobs = jobs if jobs else 1
+        if self.transactional and self.jobs > 1:
+            # the tables created in one transaction are not visible to the other connections
+            self.instrumentation.log("WARNING: transactional mode runs on one connection, jobs is set to 1")
+            self.jobs = 1
+        self.conn_string = conn_string
+        self.pool = None
+        self.local = threading.local()
+        self.lock = threading.Lock()
         self.conn = self._check_db_connection(conn_string)
-        self.conn.autocommit = True
+        # in transactional mode everything is rolled back at the end, nothing is left behind in the database
+        self.conn.autocommit = not transactional
         self._run_table_lineage()
 
     def _run_table_lineage(self) -> None:
@@ -44,93 +78,91 @@ class LineageXWithConn:
         """
         start_time = time.time()
         self.part_tables, self.schema_list = self._get_part_tables()
+        self.catalog = Catalog(
+            engine=self.conn,
+            search_schema=self.search_schema,
+            instrumentation=self.instrumentation,
+        )
         # If the input is a list with no SELECT , assume it to be a list of views/schema
         if isinstance(self.sql, List) and not any(
             "SELECT " in s.upper() for s in self.sql
         ):
-            cur = self.conn.cursor()
-            cur.execute("""SET search_path TO {};""".format(self.search_schema))
-            for t in self.sql:
-                temp = t.split(".")
-                if len(temp) == 2:
-                    cur.execute(
-                        "SELECT concat_ws('.',schemaname,viewname) AS view_name, definition FROM pg_catalog.pg_views WHERE schemaname = '{}' and viewname = '{}';".format(
-                            temp[0], temp[1]
-                        )
-                    )
-                    view_ret = cur.fetchall()
-                    if view_ret:
-                        self.sql_files_dict[view_ret[0][0]] = view_ret[0][1]
-                    else:
-                        print(
-                            "{} is skipped because database returned no result on it".format(
-                                t
-                            )
-                        )
-                elif len(temp) == 1:
-                    cur.execute(
-                        "SELECT concat_ws('.',schemaname,viewname) AS view_name, definition FROM pg_catalog.pg_views WHERE schemaname = '{}';".format(
-                            temp[0]
-                        )
-                    )
-                    schema_ret = cur.fetchall()
-                    if schema_ret:
-                        for s in schema_ret:
-                            self.sql_files_dict[s[0]] = s[1]
-                    else:
-                        print(
-                            "{} is skipped because database returned no result on it".format(
-                                t
-                            )
-                        )
-            cur.close()
-            for name, sql in self.sql_files_dict.items():
+            self._fetch_views()
+            for name in self._serial_order():
+                sql = self.sql_files_dict[name]
                 try:
-                    print(name, " processing")
-                    col_lineage = ColumnLineage(
-                        plan=self._get_plan(sql=sql),
+                    self.instrumentation.log("{}  processing".format(name))
+                    self.instrumentation.start(name=name)
+                    self._savepoint(action="SAVEPOINT")
+                    col_lineage = self._column_lineage(
+                        name=name,
                         sql=sql,
-                        columns=find_column(
-                            table_name=name,
-                            engine=self.conn,
-                            search_schema=self.search_schema,
-                        ),
-                        conn=self.conn,
-                        part_tables=self.part_tables,
-                        search_schema=self.search_schema,
+                        columns=self.catalog.find_column(table_name=name),
+                    )
+                    self._savepoint(action="RELEASE SAVEPOINT")
+                    self._add_output(
+                        name=name,
+                        record={
+                            "tables": col_lineage.table_list,
+                            "columns": col_lineage.column_dict,
+                            "table_name": name,
+                            "sql": sql,
+                        },
                     )
-                    self.output_dict[name] = {
-                        "tables": col_lineage.table_list,
-                        "columns": col_lineage.column_dict,
-                        "table_name": name,
-                        "sql": sql,
-                    }
                     self.parsed += 1
+                    self.instrumentation.finish(name=name)
                 except Exception as e:
-                    print("{} is not processed because it countered {}".format(name, e))
+                    self._savepoint(action="ROLLBACK TO SAVEPOINT")
+                    self.instrumentation.log(
+                        "{} is not processed because it countered {}".format(name, e)
+                    )
+                    self.instrumentation.finish(name=name, outcome="failed", error=e)
                     self.not_parsed += 1
                     continue
         # path or a list of SQL that at least one element contains
         else:
-            self.sql_files_dict = SqlToDict(self.sql, self.schema_list).sql_files_dict
-            for name, sql in self.sql_files_dict.items():
+            self.sql_files_dict = SqlToDict(
+                self.sql,
+                self.schema_list,
+                instrumentation=self.instrumentation,
+                jobs=self.jobs,
+            ).sql_files_dict
+            self.dependency_dict = self._find_dependencies()
+            if self.jobs > 1:
+                self._explain_concurrently()
+            for name in self.sql_files_dict.keys():
                 try:
-                    if name not in self.finished_list:
-                        self._explain_sql(name=name, sql=sql)
+                    if name not in self.finished_list and name not in self.failed_set:
+                        self._explain_in_order(name=name)
                     else:
                         continue
                 except Exception as e:
-                    print("{} is not processed because it countered {}".format(name, e))
+                    self.instrumentation.log(
+                        "{} is not processed because it countered {}".format(name, e)
+                    )
+                    self.instrumentation.finish(name=name, outcome="failed", error=e)
                     self.not_parsed += 1
                     continue
-        produce_json(
-            output_dict=self.output_dict,
-            engine=self.conn,
-            search_schema=self.search_schema,
-        )
+        if self.on_record is None:
+            produce_json(
+                output_dict=self.output_dict,
+                engine=self.conn,
+                search_schema=self.search_schema,
+                catalog=self.catalog,
+                shard_by=self.shard_by,
+            )
+        else:
+            for record in base_tables(
+                all_tables=list(self.record_tables),
+                output_names=self.record_names,
+                engine=self.conn,
+                search_schema=self.search_schema,
+                catalog=self.catalog,
+            ).values():
+                self.on_record(record)
         self._delete_view()
         self.conn.close()
-        print(
+        self.instrumentation.log(
             "{} SQLs are parsed, {} SQLs are not parsed, took a total of {:.1f} seconds, total transaction time is {:.1f}".format(
                 self.parsed,
                 self.not_parsed,
@@ -138,22 +170,108 @@ class LineageXWithConn:
                 self.transaction_time,
             )
         )
+        if self.jobs > 1:
+            self.instrumentation.log(
+                "{} connections, transaction time per worker: {}".format(
+                    self.jobs,
+                    ", ".join(
+                        "{} {:.1f}".format(k, v)
+                        for k, v in sorted(self.worker_time_dict.items())
+                    ),
+                )
+            )
+        self.instrumentation.log(
+            "column catalog: {} lookups answered with {} queries, saved {} queries".format(
+                self.catalog.lookups, self.catalog.queries, self.catalog.saved_queries()
+            )
+        )
         # print("total transaction time: ", self.transaction_time)
 
+    def _fetch_views(self) -> None:
+        """
+        Fetch the definitions of the views and the views in the schemas of the input list with one query, along with
+        the views each one reads from, so they are explained after the views they depend on
+        :return: updates sql_files_dict, dependency_dict
+        """
+        schemas = []
+        views = []
+        for t in self.sql:
+            temp = t.split(".")
+            if len(temp) == 2:
+                schemas.append(temp[0])
+                views.append(temp[1])
+            elif len(temp) == 1:
+                schemas.append(temp[0])
+                views.append(None)
+            else:
+                # neither a view nor a schema, it is not asked for
+                schemas.append(None)
+                views.append(None)
+        start_time = time.time()
+        cur = self.conn.cursor()
+        cur.execute(
+            """SET search_path TO {};""".format(self.search_schema) + VIEW_QUERY,
+            (schemas, views),
+        )
+        rows = cur.fetchall()
+        cur.close()
+        self._add_transaction_time(time.time() - start_time)
+        found = set()
+        dependencies = {}
+        for view_name, definition, deps, position in rows:
+            found.add(position)
+            self.sql_files_dict[view_name] = definition
+            dependencies[view_name] = deps
+        for name, deps in dependencies.items():
+            self.dependency_dict[name] = [
+                d for d in deps if d in self.sql_files_dict and d != name
+            ]
+        for idx, t in enumerate(self.sql):
+            if schemas[idx] is not None and idx + 1 not in found:
+                self.instrumentation.log(
+                    "{} is skipped because database returned no result on it".format(t)
+                )
+
     def _delete_view(self) -> None:
         """
-        Delete all temporary tables in the new_view_list
+        Delete all temporary tables in the new_view_list, or roll back the transaction that created them in
+        transactional mode
         :return: None
         """
+        start_time = time.time()
+        if self.transactional:
+            self.conn.rollback()
+            self.instrumentation.log(
+                "{} temporary tables rolled back".format(len(self.new_view_list))
+            )
+            self.cleanup_time = time.time() - start_time
+            self.transaction_time += self.cleanup_time
+            return
         # reverse it just in case to drop dependencies first
         self.new_view_list = self.new_view_list[::-1]
-        start_time = time.time()
         cur = self.conn.cursor()
         for i in self.new_view_list:
             cur.execute("""DROP TABLE {} CASCADE""".format(i))
-            print(i + " dropped")
+            self.instrumentation.log(i + " dropped")
+        cur.close()
+        self.cleanup_time = time.time() - start_time
+        self.transaction_time += self.cleanup_time
+
+    def _savepoint(self, action: Optional[str] = "SAVEPOINT", name: Optional[str] = "lineagex") -> None:
+        """
+        Set, release or roll back to a savepoint in transactional mode, so one failed statement does not abort the
+        whole transaction
+        :param action: SAVEPOINT, RELEASE SAVEPOINT or ROLLBACK TO SAVEPOINT
+        :param name: the name of the savepoint
+        :return: None
+        """
+        if not self.transactional:
+            return
+        start_time = time.time()
+        cur = self._conn().cursor()
+        cur.execute("""{} {};""".format(action, name))
         cur.close()
-        self.transaction_time += time.time() - start_time
+        self.instrumentation.add_db_time(time.time() - start_time)
 
     def _create_view(self, name: Optional[str] = "", sql: Optional[str] = "") -> None:
         """
@@ -165,25 +283,37 @@ class LineageXWithConn:
         """
         # connect and create view
         start_time = time.time()
-        cur = self.conn.cursor()
-        cur.execute(
-            """SET search_path TO {}, {};""".format(self.search_schema, self.schema)
-        )
-        if sql.endswith(";"):
+        # keep the new table even if explaining the sql fails later
+        self._savepoint(action="SAVEPOINT", name="lineagex_create")
+        cur = self._conn().cursor()
+        try:
             cur.execute(
-                """CREATE TABLE {}.{} AS {} WITH NO DATA;""".format(
-                    self.schema, name, sql[:-1]
-                )
+                """SET search_path TO {}, {};""".format(self.search_schema, self.schema)
             )
-        else:
+            if sql.endswith(";"):
+                sql = sql[:-1]
+            # get the columns of the new table in the same round trip
             cur.execute(
-                """CREATE TABLE {}.{} AS {} WITH NO DATA;""".format(
-                    self.schema, name, sql
+                """CREATE TABLE {0}.{1} AS {2} WITH NO DATA;\n{3}""".format(
+                    self.schema,
+                    name,
+                    sql,
+                    RELATION_QUERY.format(
+                        "{}.{}".format(self.schema, name).replace("'", "''")
+                    ),
                 )
             )
-        cur.close()
-        self.transaction_time += time.time() - start_time
-        print(self.schema + "." + name + " created")
+            cols = [s[0] for s in cur.fetchall()]
+        except Exception:
+            self.instrumentation.add_db_time(time.time() - start_time, round_trips=2)
+            self._savepoint(action="ROLLBACK TO SAVEPOINT", name="lineagex_create")
+            raise
+        finally:
+            cur.close()
+        self._savepoint(action="RELEASE SAVEPOINT", name="lineagex_create")
+        self.catalog.add_relation(table_name=self.schema + "." + name, columns=cols)
+        self._add_transaction_time(time.time() - start_time, round_trips=2)
+        self.instrumentation.log(self.schema + "." + name + " created")
 
     def _get_plan(self, sql: Optional[str] = "") -> dict:
         """
@@ -192,14 +322,19 @@ class LineageXWithConn:
         :return: the physical plan of the sql
         """
         start_time = time.time()
-        cur = self.conn.cursor()
-        cur.execute("""SET search_path TO {};""".format(self.search_schema))
-        cur.execute(
-            """EXPLAIN (VERBOSE TRUE, FORMAT JSON, COSTS FALSE) {}""".format(sql)
-        )
-        log_plan = cur.fetchall()
-        cur.close()
-        self.transaction_time += time.time() - start_time
+        cur = self._conn().cursor()
+        try:
+            cur.execute("""SET search_path TO {};""".format(self.search_schema))
+            cur.execute(
+                """EXPLAIN (VERBOSE TRUE, FORMAT JSON, COSTS FALSE) {}""".format(sql)
+            )
+            log_plan = cur.fetchall()
+        except Exception:
+            self.instrumentation.add_db_time(time.time() - start_time, round_trips=2)
+            raise
+        finally:
+            cur.close()
+        self._add_transaction_time(time.time() - start_time, round_trips=2)
         while True:
             if isinstance(log_plan, list) or isinstance(log_plan, tuple):
                 log_plan = log_plan[0]
@@ -208,79 +343,383 @@ class LineageXWithConn:
                 break
         return log_plan
 
-    def _explain_sql(self, name: Optional[str] = "", sql: Optional[str] = "") -> None:
+    def _conn(self) -> connection:
+        """
+        The connection of the current worker, every worker keeps its own connection so the search_path it sets is not
+        changed by the others
+        :return: the psycopg2 connection
+        """
+        return getattr(self.local, "conn", self.conn)
+
+    def _column_lineage(
+        self, name: Optional[str] = "", sql: Optional[str] = "", columns: Optional[List] = None
+    ) -> ColumnLineage:
+        """
+        Get the plan of the sql and run ColumnLineage on it, the time ColumnLineage takes besides the database is
+        recorded as the resolve time of the sql
+        :param name: the name of the sql
+        :param sql: the sql
+        :param columns: the columns of the table of the sql
+        :return: the ColumnLineage
+        """
+        plan = self._get_plan(sql=sql)
+        record = self.instrumentation.record(name=name)
+        db_time = record.db_time
+        start_time = time.time()
+        try:
+            return ColumnLineage(
+                plan=plan,
+                sql=sql,
+                columns=columns,
+                conn=self._conn(),
+                part_tables=self.part_tables,
+                search_schema=self.search_schema,
+                catalog=self.catalog,
+            )
+        finally:
+            record.resolve_time += time.time() - start_time - (record.db_time - db_time)
+
+    def _add_transaction_time(self, t: Optional[float] = 0, round_trips: Optional[int] = 1) -> None:
+        self.instrumentation.add_db_time(t, round_trips=round_trips)
+        with self.lock:
+            self.transaction_time += t
+            worker = threading.current_thread().name
+            self.worker_time_dict[worker] = self.worker_time_dict.get(worker, 0) + t
+
+    def _find_dependencies(self) -> dict:
+        """
+        Find the dependencies of each sql before running any of them. A table referenced by the sql is a dependency
+        if it has a sql in sql_files_dict and does not exist in the database yet, so it has to be created first.
+        :return: the dict of name: the list of names it depends on
+        """
+        dependency_dict = {}
+        for name, sql in self.sql_files_dict.items():
+            dependency_dict[name] = []
+            start_time = time.time()
+            try:
+                sql_ast = parse_one(sql, read="postgres")
+            except Exception:
+                # left to the does not exist error at runtime
+                continue
+            finally:
+                self.instrumentation.record(name=name).parse_time += time.time() - start_time
+            cte_names = set([cte.alias_or_name for cte in sql_ast.find_all(exp.CTE)])
+            for table in sql_ast.find_all(exp.Table):
+                table_name = table.name
+                if (
+                    table_name == name
+                    or table_name not in self.sql_files_dict.keys()
+                    or table_name in dependency_dict[name]
+                ):
+                    continue
+                if not table.args.get("db") and table_name in cte_names:
+                    continue
+                parts = [
+                    table.args[k].sql(dialect="postgres")
+                    for k in ["catalog", "db", "this"]
+                    if table.args.get(k)
+                ]
+                if self.catalog.relkind(table_name=".".join(parts)) is None:
+                    dependency_dict[name].append(table_name)
+        return dependency_dict
+
+    def _explain_in_order(self, name: Optional[str] = "") -> None:
+        """
+        Explain the sql after all of its dependencies, in topological order. It goes through the dependency graph with
+        the stack instead of recursion, so long chains of dependencies do not hit the recursion limit.
+        :param name: name of the sql
+        :return: updates finished_list, failed_set
+        """
+        self.s.push(name)
+        on_stack = {name}
+        while not self.s.isEmpty():
+            current = self.s.peek()
+            if current in self.finished_list or current in self.failed_set:
+                on_stack.discard(self.s.pop())
+                continue
+            pending = [
+                d
+                for d in self.dependency_dict.get(current, [])
+                if d not in self.finished_list
+            ]
+            missing = [
+                d
+                for d in pending
+                if d in self.failed_set
+                and not self.catalog.exists(schema=self.schema, table_name=d)
+            ]
+            pending = [d for d in pending if d not in self.failed_set]
+            if missing:
+                self._add_failed(
+                    name=current,
+                    outcome="skipped",
+                    message=current
+                    + " is skipped because it is missing dependency table "
+                    + missing[0],
+                )
+            elif pending:
+                if pending[0] in on_stack:
+                    self._add_failed(
+                        name=current,
+                        outcome="skipped",
+                        message="{} is skipped because it has a circular dependency with {}".format(
+                            current, pending[0]
+                        ),
+                    )
+                    continue
+                self.instrumentation.log(
+                    current
+                    + " is dependant on "
+                    + pending[0]
+                    + ", creating that first\n"
+                )
+                self.s.push(pending[0])
+                on_stack.add(pending[0])
+            else:
+                dependency = self._explain_sql(
+                    name=current, sql=self.sql_files_dict[current]
+                )
+                # a dependency the static pass did not find
+                if dependency is not None:
+                    self.dependency_dict.setdefault(current, []).append(dependency)
+
+    def _serial_order(self) -> List:
+        """
+        The order _explain_in_order would explain the sql in, every sql after its dependencies
+        :return: the list of names
+        """
+        order = []
+        done = set()
+        for name in self.sql_files_dict.keys():
+            if name in done:
+                continue
+            s = Stack()
+            s.push(name)
+            on_stack = {name}
+            while not s.isEmpty():
+                current = s.peek()
+                pending = [
+                    d
+                    for d in self.dependency_dict.get(current, [])
+                    if d not in done and d not in on_stack
+                ]
+                if pending:
+                    s.push(pending[0])
+                    on_stack.add(pending[0])
+                    continue
+                on_stack.discard(s.pop())
+                if current not in done:
+                    done.add(current)
+                    order.append(current)
+        return order
+
+    def _explain_concurrently(self) -> None:
+        """
+        Explain the sql with a pool of connections, every sql is submitted as soon as all of its dependencies are
+        finished. The lineage is put back into the order of the serial run at the end.
+        :return: updates finished_list, failed_set
+        """
+        order = self._serial_order()
+        position = {name: idx for idx, name in enumerate(order)}
+        dependents_dict = {}
+        remaining_dict = {}
+        ready = []
+        for name in order:
+            deps = set(self.dependency_dict.get(name, []))
+            remaining_dict[name] = len(deps)
+            for d in deps:
+                dependents_dict.setdefault(d, []).append(name)
+            if not deps:
+                heapq.heappush(ready, (position[name], name))
+        if self.pool is None:
+            self.pool = ThreadedConnectionPool(1, self.jobs, self.conn_string)
+        running = {}
+        try:
+            with ThreadPoolExecutor(
+                max_workers=self.jobs, thread_name_prefix="lineagex"
+            ) as executor:
+                while ready or running:
+                    while ready:
+                        _, name = heapq.heappop(ready)
+                        future = executor.submit(self._explain_worker, name)
+                        running[future] = name
+                    done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        dependency = future.result()
+                        if dependency is not None:
+                            # a dependency the static pass did not find
+                            self.dependency_dict.setdefault(name, []).append(dependency)
+                            if dependency in self.failed_set and not self.catalog.exists(
+                                schema=self.schema, table_name=dependency
+                            ):
+                                # it is already released, nothing would count it down
+                                self._add_failed(
+                                    name=name,
+                                    outcome="skipped",
+                                    message=name
+                                    + " is skipped because it is missing dependency table "
+                                    + dependency,
+                                )
+                                self._release_dependents(
+                                    name=name,
+                                    dependents_dict=dependents_dict,
+                                    remaining_dict=remaining_dict,
+                                    ready=ready,
+                                    position=position,
+                                )
+                            elif dependency in self.finished_list or dependency in self.failed_set:
+                                heapq.heappush(ready, (position[name], name))
+                            else:
+                                remaining_dict[name] = 1
+                                dependents_dict.setdefault(dependency, []).append(name)
+                            continue
+                        self._release_dependents(
+                            name=name,
+                            dependents_dict=dependents_dict,
+                            remaining_dict=remaining_dict,
+                            ready=ready,
+                            position=position,
+                        )
+        finally:
+            self.pool.closeall()
+        # what is left is waiting on itself
+        for name in order:
+            if name not in self.finished_list and name not in self.failed_set:
+                self._add_failed(
+                    name=name,
+                    outcome="skipped",
+                    message="{} is skipped because it has a circular dependency".format(name),
+                )
+        finished = set(self.finished_list)
+        self.finished_list = [name for name in order if name in finished]
+        if self.on_record is not None:
+            # handed over as they finished
+            return
+        output_dict = {}
+        for name in self.finished_list:
+            output_name = self._output_name(name=name)
+            output_dict[output_name] = self.output_dict[output_name]
+        self.output_dict = output_dict
+
+    def _release_dependents(
+        self,
+        name: Optional[str] = "",
+        dependents_dict: Optional[dict] = None,
+        remaining_dict: Optional[dict] = None,
+        ready: Optional[List] = None,
+        position: Optional[dict] = None,
+    ) -> None:
+        """
+        Mark the sql as done for the ones depending on it, the ones with no unfinished dependencies left are ready. If
+        the sql failed and its table does not exist, the ones depending on it fail as well.
+        """
+        s = Stack()
+        s.push(name)
+        while not s.isEmpty():
+            current = s.pop()
+            missing = current in self.failed_set and not self.catalog.exists(
+                schema=self.schema, table_name=current
+            )
+            for d in dependents_dict.pop(current, []):
+                if d in self.finished_list or d in self.failed_set:
+                    continue
+                if missing:
+                    self._add_failed(
+                        name=d,
+                        outcome="skipped",
+                        message=d + " is skipped because it is missing dependency table " + current,
+                    )
+                    s.push(d)
+                    continue
+                remaining_dict[d] -= 1
+                if remaining_dict[d] == 0:
+                    heapq.heappush(ready, (position[d], d))
+
+    def _explain_worker(self, name: Optional[str] = "") -> Optional[str]:
+        """
+        Explain the sql on a connection from the pool
+        :param name: name of the sql
+        :return: the missing dependency if there is one
+        """
+        conn = self.pool.getconn()
+        conn.autocommit = True
+        self.local.conn = conn
+        try:
+            return self._explain_sql(name=name, sql=self.sql_files_dict[name])
+        finally:
+            del self.local.conn
+            self.pool.putconn(conn)
+
+    def _output_name(self, name: Optional[str] = "") -> str:
+        if (
+            name.isnumeric()
+            or name.find("_DELETION_") != -1
+            or name.find("_INSERTION_") != -1
+        ):
+            return name
+        return self.schema + "." + name
+
+    def _explain_sql(self, name: Optional[str] = "", sql: Optional[str] = "") -> Optional[str]:
         """
-        Main function for extracting the table name from the sql. It tries to explain the current file's sql by
-        analyzing the logical plan. But if its dependency is missing, the current one is put onto a stack and checking
-        on the dependency table, then pops the stack when the current one is done.
+        Main function for extracting the table name from the sql. It creates the table for the sql if needed and
+        analyzes the logical plan. The dependencies should be created by _explain_in_order already, if one is still
+        missing, it is returned so that it can be created first.
         :param name: name of the file
         :param sql: the sql from the file
-        :return: updates file_list, sql_list, table_list, new_view_list
+        :return: the missing dependency if there is one, updates file_list, sql_list, table_list, new_view_list
         """
+        explaining = False
+        outcome = "failed"
+        error = None
+        message = None
+        self.instrumentation.start(name=name)
         try:
-            print(name + " processing")
-            if name in self.creation_list:
-                self._create_view(name=name, sql=sql)
-                self.new_view_list.append(self.schema + "." + name)
-                self.creation_list.pop(self.creation_list.index(name))
-                table_name = self.schema + "." + name
-            elif name.isnumeric():
+            self.instrumentation.log(name + " processing")
+            if name.isnumeric():
                 table_name = "lineagex_temp_{}".format(name)
                 self._create_view(name=table_name, sql=sql)
-                self.new_view_list.append(self.schema + "." + table_name)
+                self._add_new_view(table_name=self.schema + "." + table_name)
             elif name.find("_DELETION_") != -1 or name.find("_INSERTION_") != -1:
                 table_name = name.replace(".", "_")
                 self._create_view(name=table_name, sql=sql)
-                self.new_view_list.append(self.schema + "." + table_name)
+                self._add_new_view(table_name=self.schema + "." + table_name)
             else:
-                cur = self.conn.cursor()
-                cur.execute("""SET search_path TO {};""".format(self.search_schema))
-                cur.execute(
-                    """SELECT CONCAT (schemaname,'.', tablename) from pg_tables WHERE schemaname = '{0}' and tablename = '{1}'""".format(
-                        self.schema, name
-                    )
-                )
-                table_result = cur.fetchone()
-                cur.close()
-                if not table_result:
+                if not self.catalog.exists(
+                    schema=self.schema, table_name=name, relkinds="rp"
+                ):
                     self._create_view(name=name, sql=sql)
-                    self.new_view_list.append(self.schema + "." + name)
+                    self._add_new_view(table_name=self.schema + "." + name)
                 table_name = self.schema + "." + name
-            cols = find_column(
-                table_name=table_name,
-                engine=self.conn,
-                search_schema=self.search_schema,
-            )
-            col_lineage = ColumnLineage(
-                plan=self._get_plan(sql=sql),
-                sql=sql,
-                columns=cols,
-                conn=self.conn,
-                part_tables=self.part_tables,
-                search_schema=self.search_schema,
-            )
+            self._savepoint(action="SAVEPOINT")
+            explaining = True
+            cols = self.catalog.find_column(table_name=table_name)
+            col_lineage = self._column_lineage(name=name, sql=sql, columns=cols)
             if (
                 name.isnumeric()
                 or name.find("_DELETION_") != -1
                 or name.find("_INSERTION_") != -1
             ):
                 table_name = name
-            self.output_dict[table_name] = {
-                "tables": col_lineage.table_list,
-                "columns": col_lineage.column_dict,
-                "table_name": table_name,
-                "sql": sql,
-            }
-            self.finished_list.append(name)
-            self.parsed += 1
-            while not self.s.isEmpty():
-                if self.s.peek() in self.sql_files_dict.keys():
-                    sql = self.sql_files_dict[self.s.peek()]
-                    return self._explain_sql(name=self.s.pop(), sql=sql)
-                else:
-                    print("no sql file for the dependencies")
-            return
+            self._savepoint(action="RELEASE SAVEPOINT")
+            with self.lock:
+                self._add_output(
+                    name=table_name,
+                    record={
+                        "tables": col_lineage.table_list,
+                        "columns": col_lineage.column_dict,
+                        "table_name": table_name,
+                        "sql": sql,
+                    },
+                )
+                self.finished_list.append(name)
+                self.parsed += 1
+            self.instrumentation.finish(name=name)
+            return None
         except psycopg2.ProgrammingError as e:
+            error = e
+            if explaining:
+                self._savepoint(action="ROLLBACK TO SAVEPOINT")
             # does not exist error code
             if e.pgcode == "42P01":
                 error_msg = e.pgerror
@@ -288,39 +727,71 @@ class LineageXWithConn:
                 relation_idx = error_msg.find("relation")
                 schema_table = error_msg[relation_idx:no_find_idx]
                 table_name = schema_table.split(" ")[-2].split(".")[-1].strip('"')
-                self.s.push(name)
-                # print(table_name, self.sql_files_dict)
-                if table_name in self.sql_files_dict.keys():
+                if (
+                    table_name in self.sql_files_dict.keys()
+                    and table_name not in self.finished_list
+                    and table_name not in self.failed_set
+                ):
                     if self.schema + "." + table_name in self.new_view_list:
-                        print(
-                            "{}.{} is already created, but the created schema is different from the queried schema for {} in {}.sql".format(
-                                self.schema, table_name, table_name, name
-                            )
+                        message = "{}.{} is already created, but the created schema is different from the queried schema for {} in {}.sql".format(
+                            self.schema, table_name, table_name, name
                         )
-                        return
-                    print(
-                        name
-                        + " is dependant on "
-                        + table_name
-                        + ", creating that first\n"
-                    )
-                    self.creation_list.append(table_name)
-                    sql = self.sql_files_dict[table_name]
-                    return self._explain_sql(name=table_name, sql=sql)
+                    else:
+                        return table_name
                 else:
-                    print(
+                    outcome = "skipped"
+                    message = (
                         name
                         + " is skipped because it is missing dependency table "
                         + table_name
                     )
-                    self.not_parsed += 1
-                    return
             else:
-                print(e)
-                self.not_parsed += 1
+                message = str(e)
         except Exception as e:
-            print(e)
+            error = e
+            if explaining:
+                self._savepoint(action="ROLLBACK TO SAVEPOINT")
+            message = str(e)
+        self._add_failed(name=name, outcome=outcome, error=error, message=message)
+        return None
+
+    def _add_output(self, name: Optional[str] = "", record: Optional[dict] = None) -> None:
+        """
+        Add the lineage of the sql to the lineage of the run, or hand it to on_record
+        :param name: the name in the output
+        :param record: the lineage in the output.json format
+        """
+        if self.on_record is None:
+            self.output_dict[name] = record
+            return
+        self.record_tables.update(record["tables"])
+        self.record_names.append(name)
+        self.on_record(record)
+
+    def _add_new_view(self, table_name: Optional[str] = "") -> None:
+        with self.lock:
+            self.new_view_list.append(table_name)
+
+    def _add_failed(
+        self,
+        name: Optional[str] = "",
+        outcome: Optional[str] = "failed",
+        error: Optional[Exception] = None,
+        message: Optional[str] = None,
+    ) -> None:
+        """
+        Mark the sql as failed or skipped, and log why
+        :param name: the name of the sql
+        :param outcome: failed or skipped
+        :param error: the exception if it failed
+        :param message: why it failed or was skipped
+        """
+        if message is not None:
+            self.instrumentation.log(message)
+        with self.lock:
             self.not_parsed += 1
+            self.failed_set.add(name)
+        self.instrumentation.finish(name=name, outcome=outcome, error=error, message=message)
 
     def _check_db_connection(self, conn_string: Optional[str] = "") -> connection:
         """
@@ -329,9 +800,9 @@ class LineageXWithConn:
         """
         try:
             psycopg2.connect(conn_string)
-            print("database connected")
+            self.instrumentation.log("database connected")
         except OperationalError:
-            print("authentication error")
+            self.instrumentation.log("authentication error")
         return psycopg2.connect(conn_string)
 
     def _get_part_tables(self) -> Tuple[dict, List]:
@@ -0,0 +1,115 @@
+from typing import Any, List, Optional
+
+from sqlglot import exp, expressions
+from sqlglot.optimizer.qualify_columns import qualify_columns
+from sqlglot.schema import MappingSchema
+
+# marks the projections that had no alias, the aliases sqlglot gives them are taken off again
+_UNALIASED = "lineagex_unaliased"
+
+
+class SchemaQualifier:
+    def __init__(self, dialect: str = "postgres", search_path_schema: Optional[List] = None) -> None:
+        """
+        Qualify the columns of the statements of a run with sqlglot, from the columns of their source tables in
+        input_table_dict. The MappingSchema is kept for the whole run and a table is only added to it again when its
+        columns in input_table_dict are replaced.
+        :param dialect: the dialect of the sql
+        :param search_path_schema: the schemas the unqualified tables are looked up in
+        """
+        self.schema = MappingSchema(dialect=dialect)
+        self.search_path_schema = search_path_schema if search_path_schema else []
+        # table -> the columns it was added to the schema with
+        self.tables = {}
+        self.qualified = 0
+        self.fallbacks = 0
+
+    def qualify(self, sql_ast: expressions = None, input_table_dict: Any = None) -> bool:
+        """
+        Qualify every column of the sql and expand the stars in one optimizer pass, in place. If sqlglot fails, the
+        error is raised and the AST is left half way qualified.
+        :param sql_ast: the AST of the sql
+        :param input_table_dict: the input_table_dict, or a TrackedTableDict over it
+        :return: whether it is qualified, the AST is left as it is if a source table is not in input_table_dict
+        """
+        tables, ctes, selects = [], set(), []
+        for node in sql_ast.find_all(exp.Table, exp.CTE, exp.Select):
+            if isinstance(node, exp.Table):
+                tables.append(node)
+            elif isinstance(node, exp.CTE):
+                ctes.add(node.alias_or_name)
+            else:
+                selects.append(node)
+        try:
+            covered = self._add_sources(tables=tables, ctes=ctes, input_table_dict=input_table_dict)
+        except Exception:
+            covered = False
+        projs = [
+            proj
+            for select in selects
+            for proj in select.expressions
+            if not isinstance(proj, exp.Alias) and not proj.args.get("alias")
+        ]
+        # a star over a select with a column without a name would give it the name sqlglot makes up for it
+        if covered and any(p.is_star for p in projs) and any(not p.output_name for p in projs):
+            covered = False
+        if not covered:
+            self.fallbacks += 1
+            return False
+        for proj in projs:
+            proj.meta[_UNALIASED] = True
+        # the columns are qualified with the alias of their table, which ColumnLineageNoConn maps to the table
+        for table in tables:
+            if not table.alias:
+                table.set("alias", exp.TableAlias(this=exp.to_identifier(table.name)))
+        try:
+            # the columns sqlglot can not tell the table of are left unqualified for the heuristics
+            qualify_columns(sql_ast, schema=self.schema, infer_schema=False)
+        except Exception:
+            self.fallbacks += 1
+            raise
+        for node in sql_ast.find_all(exp.Union, exp.Select):
+            if isinstance(node, exp.Union):
+                # sqlglot sets the projections of the left select on its union as well, they are only kept on the
+                # select
+                node.args.pop("expressions", None)
+                continue
+            projs = []
+            for proj in node.expressions:
+                if isinstance(proj, exp.Alias) and proj.this.meta.get(_UNALIASED):
+                    proj = proj.this
+                elif isinstance(proj, exp.Subquery) and proj.meta.get(_UNALIASED):
+                    proj.set("alias", None)
+                projs.append(proj)
+            node.set("expressions", projs)
+        self.qualified += 1
+        return True
+
+    def _add_sources(
+        self, tables: Optional[List] = None, ctes: Optional[set] = None, input_table_dict: Any = None
+    ) -> bool:
+        """
+        Add the source tables of the sql to the schema
+        :param tables: the tables in the sql
+        :param ctes: the names of the CTEs in the sql
+        :param input_table_dict: the input_table_dict, or a TrackedTableDict over it
+        :return: whether all the source tables are in input_table_dict
+        """
+        for table in tables:
+            if not isinstance(table.this, exp.Identifier) or table.args.get("catalog"):
+                return False
+            if table.db:
+                names = [table.db + "." + table.name]
+            elif table.name in ctes:
+                continue
+            else:
+                names = [s + "." + table.name for s in self.search_path_schema]
+            found = [n for n in names if n in input_table_dict]
+            if not found:
+                return False
+            for name in found:
+                columns = input_table_dict[name]
+                if self.tables.get(name) is not columns:
+                    self.schema.add_table(name, list(columns))
+                    self.tables[name] = columns
+        return True
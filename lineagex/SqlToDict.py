@@ -1,22 +1,64 @@
 import os
 import re
-from typing import List, Optional, Union
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
 
-from .utils import find_select, get_files, remove_comments_sqlite, remove_comments_pg
+from .Instrumentation import Instrumentation
+from .utils import (
+    find_select,
+    get_files,
+    remove_comments_pg,
+    remove_comments_sqlite,
+    schema_prefix_regex,
+    split_sql,
+)
 
 rem_regex = re.compile(r"[^a-zA-Z0-9_.]")
 
+# the SqlToDict of each ingestion worker process, only used to read and rewrite the files
+_worker_s2d = None
+
+
+def _init_ingest_worker(schema_list: Optional[List] = None, dialect: Optional[str] = "postgres") -> None:
+    global _worker_s2d
+    _worker_s2d = SqlToDict(
+        path=[], schema_list=schema_list, dialect=dialect, instrumentation=Instrumentation(verbose=False)
+    )
+
+
+def _ingest_worker(file: Optional[str] = "") -> List[Tuple[str, str]]:
+    """
+    Read and rewrite all the statements of the file in a worker process
+    :param file: the path of the sql file
+    :return: the list of the sql rewritten and the original statement
+    """
+    return _worker_s2d._read_file(file=file)
+
 
 class SqlToDict:
     def __init__(
-        self, path: Optional[Union[List, str]] = "", schema_list: Optional[List] = None, dialect: Optional[str] = "postgres"
+        self,
+        path: Optional[Union[List, str]] = "",
+        schema_list: Optional[List] = None,
+        dialect: Optional[str] = "postgres",
+        instrumentation: Optional[Instrumentation] = None,
+        jobs: Optional[int] = None,
     ) -> None:
         self.path = path
         self.schema_list = schema_list
+        # compiled once for all the sql
+        self.schema_regex = schema_prefix_regex(schema_list) if schema_list else None
         self.dialect = dialect
+        self.instrumentation = instrumentation if instrumentation else Instrumentation()
+        # the number of worker processes reading the files
+        self.jobs = jobs if jobs else 1
         self.sql_files = []
         self.sql_files_dict = {}
         self.org_sql_files_dict = {}
+        # the file each sql comes from
+        self.file_dict = {}
+        self.curr_file = ""
         self.deletion_dict = {}
         self.insertion_dict = {}
         self.curr_name = ""
@@ -28,43 +70,103 @@ class SqlToDict:
         The driver function to make the input into the dict format, name of sql:sql
         :return:
         """
+        start_time = time.time()
         if isinstance(self.path, list):
             for idx, val in enumerate(self.path):
+                self.curr_file = str(idx)
                 self._preprocess_sql(new_sql=val, file=str(idx), org_sql=val)
         else:
             self.sql_files = get_files(path=self.path)
-            for f in self.sql_files:
-                org_sql = open(f, mode="r", encoding="latin-1").read()
-                if self.dialect == "sqlite":
-                    new_sql = remove_comments_sqlite(str1=org_sql)
-                elif self.dialect == "postgres":
-                    new_sql = remove_comments_pg(str1=org_sql)
-                else:
-                    new_sql = remove_comments_pg(str1=org_sql)
-                #new_sql = remove_comments(str1=org_sql)
-                org_sql_split = list(filter(None, new_sql.split(";")))
-                # pop DROP IF EXISTS
-                if len(org_sql_split) > 0:
-                    for s in org_sql_split:
-                        temp_str = s.upper()
-                        if temp_str.find("SELECT ") == -1 and (
-                            temp_str.startswith("DROP TABLE IF EXISTS")
-                            or temp_str.startswith("DROP VIEW IF EXISTS")
-                        ):
-                            org_sql_split.pop(org_sql_split.index(s))
-                if f.endswith(".sql") or f.endswith(".SQL"):
-                    f = os.path.basename(f)[:-4]
-                if len(org_sql_split) <= 1:
-                    self._preprocess_sql(new_sql=org_sql_split[0], file=f, org_sql=org_sql)
-                else:
-                    for idx, val in enumerate(org_sql_split):
-                        self._preprocess_sql(new_sql=val, file=f + "_" + str(idx), org_sql=org_sql)
+            if self.jobs > 1 and len(self.sql_files) > 1:
+                # the files are read and rewritten by the workers, and added in the order of the files
+                with ProcessPoolExecutor(
+                    max_workers=self.jobs,
+                    initializer=_init_ingest_worker,
+                    initargs=(self.schema_list, self.dialect),
+                ) as executor:
+                    for f, statements in zip(
+                        self.sql_files,
+                        executor.map(_ingest_worker, self.sql_files, chunksize=16),
+                    ):
+                        self._add_file(file=f, statements=statements)
+            else:
+                for f in self.sql_files:
+                    statements = (
+                        (self._rewrite_sql(new_sql=new_sql), org_sql)
+                        for new_sql, org_sql in self._read_statements(file=f)
+                    )
+                    self._add_file(file=f, statements=statements)
         for key, value in self.sql_files_dict.copy().items():
             if key.startswith("."):
                 self.sql_files_dict[key[1:]] = value
                 del self.sql_files_dict[key]
+                self.file_dict[key[1:]] = self.file_dict.pop(key, "")
+        ingest_time = time.time() - start_time
+        self.instrumentation.ingest_time += ingest_time
+        self.instrumentation.log(
+            "{} SQLs are read, took {:.1f} seconds".format(len(self.sql_files_dict), ingest_time)
+        )
         #print(self.sql_files_dict)
 
+    def _read_file(self, file: Optional[str] = "") -> List[Tuple[str, str]]:
+        """
+        Read and rewrite all the statements of the file
+        :param file: the path of the sql file
+        :return: the list of the sql rewritten and the original statement
+        """
+        return [
+            (self._rewrite_sql(new_sql=new_sql), org_sql)
+            for new_sql, org_sql in self._read_statements(file=file)
+        ]
+
+    def _add_file(self, file: Optional[str] = "", statements: Optional[Iterable] = None) -> None:
+        """
+        Add the statements of the file, the sql is named after the file alone if it is the only one in it
+        :param file: the path of the sql file
+        :param statements: the sql rewritten and the original statement
+        :return: None
+        """
+        self.curr_file = file
+        name = file
+        if file.endswith(".sql") or file.endswith(".SQL"):
+            name = os.path.basename(file)[:-4]
+        # look one statement ahead to know if it is the only one
+        statements = iter(statements)
+        prev = next(statements, None)
+        idx = 0
+        for curr in statements:
+            self._add_sql(ret_sql=prev[0], file=name + "_" + str(idx), org_sql=prev[1])
+            prev = curr
+            idx += 1
+        if prev is not None:
+            self._add_sql(
+                ret_sql=prev[0], file=name if idx == 0 else name + "_" + str(idx), org_sql=prev[1]
+            )
+
+    def _read_statements(self, file: Optional[str] = "") -> Iterator[Tuple[str, str]]:
+        """
+        Read the statements of the file one at a time, so the memory does not grow with the size of the file, without
+        the comments and the DROP IF EXISTS
+        :param file: the path of the sql file
+        :return: the iterator of the statement without the comments and the original statement
+        """
+        postgres = self.dialect != "sqlite"
+        with open(file, mode="r", encoding="latin-1") as reader:
+            for org_sql in split_sql(reader=reader, postgres=postgres):
+                if postgres:
+                    new_sql = remove_comments_pg(str1=org_sql)
+                else:
+                    new_sql = remove_comments_sqlite(str1=org_sql)
+                if not new_sql:
+                    continue
+                temp_str = new_sql.upper()
+                if temp_str.find("SELECT ") == -1 and (
+                    temp_str.startswith("DROP TABLE IF EXISTS")
+                    or temp_str.startswith("DROP VIEW IF EXISTS")
+                ):
+                    continue
+                yield new_sql, org_sql
+
     def _preprocess_sql(
         self, new_sql: Optional[str] = "", file: Optional[str] = "", org_sql: Optional[str] = ""
     ) -> None:
@@ -73,6 +175,15 @@ class SqlToDict:
         :param new_sql: the sql for parsing, file: file name for the sql, org_sql: the most original sql
         :return: None
         """
+        self._add_sql(ret_sql=self._rewrite_sql(new_sql=new_sql), file=file, org_sql=org_sql)
+
+    def _rewrite_sql(self, new_sql: Optional[str] = "") -> str:
+        """
+        Remove the comments and database names and add the quotes to datetime_add/datetime_sub, it only reads the
+        settings so the files can be rewritten concurrently
+        :param new_sql: the sql for parsing
+        :return: the sql rewritten
+        """
         #ret_sql = remove_comments(str1=new_sql)
         if self.dialect == "sqlite":
             ret_sql = remove_comments_sqlite(str1=new_sql)
@@ -81,10 +192,12 @@ class SqlToDict:
         elif self.dialect == "postgres":
             ret_sql = remove_comments_pg(str1=new_sql)
             ret_sql = ret_sql.replace("`", '')
+        else:
+            # the other dialects keep their quoting for sqlglot
+            ret_sql = remove_comments_pg(str1=new_sql)
         # remove any database names in the query
-        if self.schema_list:
-            for i in self.schema_list:
-                ret_sql = re.sub("[^ (,]*(\.{}\.)".format(i), "{}.".format(i), ret_sql)
+        if self.schema_regex:
+            ret_sql = self.schema_regex.sub(r"\1.", ret_sql)
         ret_sql = re.sub(
             r"DATETIME_DIFF\((.+?),\s?(.+?),\s?(DAY|MINUTE|SECOND|HOUR|YEAR)\)",
             r"DATETIME_DIFF(\1, \2, '\3'::TEXT)",
@@ -120,6 +233,17 @@ class SqlToDict:
                     )
                 else:
                     continue
+        return ret_sql
+
+    def _add_sql(
+        self, ret_sql: Optional[str] = "", file: Optional[str] = "", org_sql: Optional[str] = ""
+    ) -> None:
+        """
+        Name the rewritten sql and add it to the dicts, it has to be called in the order of the input so the names
+        are the same in every run
+        :param ret_sql: the sql rewritten, file: file name for the sql, org_sql: the most original sql
+        :return: None
+        """
         if re.search(
             "CREATE VIEW IF NOT EXISTS", ret_sql, flags=re.IGNORECASE
         ) or re.search("CREATE TABLE IF NOT EXISTS", ret_sql, flags=re.IGNORECASE):
@@ -136,9 +260,10 @@ class SqlToDict:
                     ret_sql = ret_sql[:c_idx] + " " + sub[sub.index(temp[7]):]
                 name = temp[5]
                 if name in self.sql_files_dict.keys():
-                    print("WARNING: duplicate script detected for {}".format(name))
+                    self.instrumentation.log("WARNING: duplicate script detected for {}".format(name))
                 self.sql_files_dict[name] = ret_sql
                 self.org_sql_files_dict[name] = org_sql
+                self.file_dict[name] = self.curr_file
 
         elif re.search("CREATE VIEW", ret_sql, flags=re.IGNORECASE) or re.search(
             "CREATE TABLE", ret_sql, flags=re.IGNORECASE
@@ -156,9 +281,10 @@ class SqlToDict:
                     ret_sql = ret_sql[:c_idx] + " " + sub[sub.index(temp[4]):]
                 name = temp[2]
                 if name in self.sql_files_dict.keys():
-                    print("WARNING: duplicate script detected for {}".format(name))
+                    self.instrumentation.log("WARNING: duplicate script detected for {}".format(name))
                 self.sql_files_dict[name] = ret_sql
                 self.org_sql_files_dict[name] = org_sql
+                self.file_dict[name] = self.curr_file
 
         # adjust to INSERT/DELETE/SELECT/
         elif ret_sql.find("INSERT INTO") != -1:
@@ -174,6 +300,7 @@ class SqlToDict:
             self.curr_name = self.curr_name + "_INSERTION_{}".format(insert_counter)
             self.sql_files_dict[self.curr_name] = find_select(q=ret_sql)
             self.org_sql_files_dict[self.curr_name] = org_sql
+            self.file_dict[self.curr_name] = self.curr_file
         elif ret_sql.find("DELETE FROM") != -1:
             # find the current name in the insertion dict and how many times it has been deleted
             self.curr_name = re.sub(rem_regex, "", ret_sql.split(" ")[2])
@@ -187,18 +314,21 @@ class SqlToDict:
             self.curr_name = self.curr_name + "_DELETION_{}".format(delete_counter)
             self.sql_files_dict[self.curr_name] = find_select(q=ret_sql)
             self.org_sql_files_dict[self.curr_name] = org_sql
+            self.file_dict[self.curr_name] = self.curr_file
         elif re.search("CREATE EXTENSION", ret_sql, flags=re.IGNORECASE):
             return
         else:
             if os.path.isfile(file):
                 name = os.path.basename(file)[:-4]
                 if name in self.sql_files_dict.keys():
-                    print("WARNING: duplicate script detected for {}".format(name))
+                    self.instrumentation.log("WARNING: duplicate script detected for {}".format(name))
                 self.sql_files_dict[name] = ret_sql
                 self.org_sql_files_dict[name] = org_sql
+                self.file_dict[name] = self.curr_file
             else:
                 self.sql_files_dict[file] = ret_sql
                 self.org_sql_files_dict[file] = org_sql
+                self.file_dict[file] = self.curr_file
 
 
 if __name__ == "__main__":
@@ -1,9 +1,12 @@
 import os
 import pkgutil
+import queue
+import threading
 import webbrowser
 from IPython.display import display, HTML
-from typing import List, Optional, Union
+from typing import Callable, Iterator, List, Optional, Union
 
+from .LineageQuery import LineageQuery
 from .LineageXNoConn import LineageXNoConn
 from .LineageXWithConn import LineageXWithConn
 
@@ -11,7 +14,7 @@ IMPLEMENTED_DIALECTS_WITH_CONN = ("postgres",)
 
 
 def save_js_file():
-    for filename in ["app.js", "vendor.js"]:
+    for filename in ["app.js", "vendor.js", "shards.js"]:
         data = pkgutil.get_data(__name__, filename)
 
         with open(filename, "w", encoding="utf-8") as js_file:
@@ -30,6 +33,20 @@ def validate_sql(sql: Union[List, str]) -> None:
         )
 
 
+def validate_shard_by(shard_by: Optional[str]) -> None:
+    if shard_by not in (None, "table", "schema"):
+        raise ValueError(
+            "Wrong shard_by input, please input table, schema or None for inlining the lineage in the html"
+        )
+
+
+def validate_resolver(resolver: Optional[str]) -> None:
+    if resolver not in ("heuristic", "qualify"):
+        raise ValueError(
+            "Wrong resolver input, please input heuristic or qualify for resolving the columns without conn_string"
+        )
+
+
 def validate_schema(target_schema: str, search_path_schema: str) -> tuple:
     if target_schema == "" and search_path_schema == "":
         target_schema = "public"
@@ -51,8 +68,24 @@ class lineagex:
         search_path_schema: Optional[str] = "",
         dialect: str = "postgres",
         input_table_dict: Optional[dict] = None,
+        cache_dir: Optional[str] = None,
+        cache_size: Optional[int] = 256 * 1024 * 1024,
+        jobs: Optional[int] = None,
+        transactional: Optional[bool] = False,
+        previous_output: Optional[str] = None,
+        changed_files: Optional[List] = None,
+        verbose: Optional[bool] = True,
+        callbacks: Optional[List[Callable]] = None,
+        on_record: Optional[Callable] = None,
+        shard_by: Optional[str] = None,
+        resolver: Optional[str] = "heuristic",
     ) -> None:
         validate_sql(sql)
+        validate_shard_by(shard_by)
+        validate_resolver(resolver)
+        self.cache_stats = None
+        self.lineage_query = None
+        self.skipped = 0
         target_schema, search_path_schema = validate_schema(
             target_schema, search_path_schema
         )
@@ -66,9 +99,17 @@ class lineagex:
                 target_schema=target_schema,
                 conn_string=conn_string,
                 search_path_schema=search_path_schema,
+                transactional=transactional,
+                jobs=jobs,
+                verbose=verbose,
+                callbacks=callbacks,
+                on_record=on_record,
+                shard_by=shard_by,
             )
-            save_js_file()
+            if on_record is None:
+                save_js_file()
             self.output_dict = lx.output_dict
+            self.instrumentation = lx.instrumentation
         else:
             lx = LineageXNoConn(
                 sql=sql,
@@ -76,9 +117,33 @@ class lineagex:
                 target_schema=target_schema,
                 search_path_schema=search_path_schema,
                 input_table_dict=input_table_dict,
+                cache_dir=cache_dir,
+                cache_size=cache_size,
+                jobs=jobs,
+                previous_output=previous_output,
+                changed_files=changed_files,
+                verbose=verbose,
+                callbacks=callbacks,
+                on_record=on_record,
+                shard_by=shard_by,
+                resolver=resolver,
             )
-            save_js_file()
+            if on_record is None:
+                save_js_file()
             self.output_dict = lx.output_dict
+            self.instrumentation = lx.instrumentation
+            self.skipped = lx.skipped
+            if lx.cache:
+                self.cache_stats = lx.cache.stats()
+
+    def query(self) -> LineageQuery:
+        """
+        The upstream and downstream queries over the lineage, the index is built on first use
+        :return: the LineageQuery
+        """
+        if self.lineage_query is None:
+            self.lineage_query = LineageQuery(output_dict=self.output_dict)
+        return self.lineage_query
 
     def show(self):
         with open("index.html", "r", encoding="utf-8") as file_html:
@@ -100,5 +165,85 @@ class lineagex:
         webbrowser.open_new_tab(f"file://{p}")
 
 
+def iter_lineage(
+    sql: Optional[Union[List, str]] = None,
+    target_schema: Optional[str] = "",
+    conn_string: Optional[str] = None,
+    search_path_schema: Optional[str] = "",
+    dialect: str = "postgres",
+    input_table_dict: Optional[dict] = None,
+    cache_dir: Optional[str] = None,
+    cache_size: Optional[int] = 256 * 1024 * 1024,
+    jobs: Optional[int] = None,
+    transactional: Optional[bool] = False,
+    previous_output: Optional[str] = None,
+    changed_files: Optional[List] = None,
+    verbose: Optional[bool] = False,
+    callbacks: Optional[List[Callable]] = None,
+    resolver: Optional[str] = "heuristic",
+    buffer_size: Optional[int] = 1000,
+) -> Iterator[dict]:
+    """
+    Run the lineage in the background and yield the lineage of each table in the output.json format as soon as it is
+    finished, the base tables come last. The records are not kept, so the run takes bounded memory, but the schema
+    names are not guessed for them as in output.json, and no output.json or index.html is written.
+    :param buffer_size: the number of finished records to hold if they are not consumed fast enough, the run waits
+    for the consumer beyond it
+    :return: the iterator of records, the rest of the parameters are the same as lineagex
+    """
+    records = queue.Queue(maxsize=buffer_size)
+    done = object()
+    errors = []
+    stopped = threading.Event()
+
+    def on_record(record: Optional[dict] = None) -> None:
+        # the consumer is gone, let the run finish and clean up
+        if not stopped.is_set():
+            records.put(record)
+
+    def run() -> None:
+        try:
+            lineagex(
+                sql=sql,
+                target_schema=target_schema,
+                conn_string=conn_string,
+                search_path_schema=search_path_schema,
+                dialect=dialect,
+                input_table_dict=input_table_dict,
+                cache_dir=cache_dir,
+                cache_size=cache_size,
+                jobs=jobs,
+                transactional=transactional,
+                previous_output=previous_output,
+                changed_files=changed_files,
+                verbose=verbose,
+                callbacks=callbacks,
+                on_record=on_record,
+                resolver=resolver,
+            )
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            if not stopped.is_set():
+                records.put(done)
+
+    thread = threading.Thread(target=run, name="lineagex", daemon=True)
+    thread.start()
+    try:
+        while True:
+            record = records.get()
+            if record is done:
+                break
+            yield record
+    finally:
+        # the consumer stopped early, the run goes on in the background without the records
+        stopped.set()
+        # unblock it if it is waiting on a full buffer
+        while not records.empty():
+            records.get_nowait()
+    if errors:
+        raise errors[0]
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,102 @@
+/*
+ * Load the lineage written as shards by produce_shards and hand it to the viewer the same way the inline html does,
+ * as window.inlineSource, before vendor.js and app.js are loaded.
+ *
+ * The manifest (window.lineageManifest) has the shard and the upstream and downstream tables of every table. With a
+ * table in the hash of the url, e.g. index.html#schema1.table2, only the shards of the tables upstream and downstream
+ * of it are loaded, otherwise all of them. The shards are script files setting window.lineageShards[<shard path>],
+ * so they can be loaded from the local file system as well.
+ */
+(function () {
+  var manifest = window.lineageManifest;
+
+  function loadScript(src) {
+    return new Promise(function (resolve, reject) {
+      var script = document.createElement("script");
+      script.type = "text/javascript";
+      script.src = src;
+      script.onload = function () {
+        resolve();
+      };
+      script.onerror = function () {
+        reject("could not load " + src);
+      };
+      document.body.appendChild(script);
+    });
+  }
+
+  function loadShard(shard) {
+    var shards = window.lineageShards;
+    if (shards && shards[shard]) {
+      return Promise.resolve(shards[shard]);
+    }
+    return loadScript(shard).then(function () {
+      var shards = window.lineageShards;
+      if (!shards || !shards[shard]) {
+        throw "invalid shard " + shard;
+      }
+      return shards[shard];
+    });
+  }
+
+  // the table with the tables upstream and downstream of it, not the other tables reading from its sources
+  function lineageTables(name) {
+    var seen = {};
+    seen[name] = true;
+    ["upstream", "downstream"].forEach(function (direction) {
+      var queue = [name];
+      while (queue.length) {
+        manifest.tables[queue.shift()][direction].forEach(function (t) {
+          if (!seen[t]) {
+            seen[t] = true;
+            queue.push(t);
+          }
+        });
+      }
+    });
+    return Object.keys(seen);
+  }
+
+  function selectedTables() {
+    var name = decodeURIComponent(window.location.hash.slice(1));
+    if (name && manifest.tables[name]) {
+      return lineageTables(name);
+    }
+    return Object.keys(manifest.tables);
+  }
+
+  var names = selectedTables();
+  var shards = [];
+  names.forEach(function (name) {
+    var shard = manifest.tables[name].shard;
+    if (shards.indexOf(shard) < 0) {
+      shards.push(shard);
+    }
+  });
+  Promise.all(shards.map(loadShard))
+    .then(function (records) {
+      var loaded = {};
+      records.forEach(function (record) {
+        Object.keys(record).forEach(function (name) {
+          loaded[name] = record[name];
+        });
+      });
+      var source = {};
+      names.forEach(function (name) {
+        source[name] = loaded[name];
+      });
+      window.inlineSource = JSON.stringify(source);
+      return loadScript("vendor.js");
+    })
+    .then(function () {
+      return loadScript("app.js");
+    })
+    .catch(function (error) {
+      document.getElementById("main").textContent = String(error);
+    });
+
+  // another table in the hash needs other shards
+  window.addEventListener("hashchange", function () {
+    window.location.reload();
+  });
+})();
@@ -1,10 +1,102 @@
+import io
 import json
 import os
 import re
-from typing import Any, List, Optional
+from typing import Any, Iterator, List, Optional
 
 from psycopg2.extensions import connection
 
+# the directory next to index.html with the lineage shards
+SHARD_DIR = "lineage"
+
+
+# the line breaks of str.splitlines, a line comment ends at them
+LINE_BREAKS = "\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029"
+# where a comment or a quoted string or identifier starts
+_SQL_SPECIAL_PG = re.compile(r"--|#|/\*|'|\"|[Ee]'|\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+_SQL_SPECIAL_SQLITE = re.compile(r"--|#|/\*|'|\"|`")
+_SQL_QUOTED = {
+    "'": re.compile(r"'(?:[^']|'')*'?"),
+    '"': re.compile(r'"(?:[^"]|"")*"?'),
+    "`": re.compile(r"`(?:[^`]|``)*`?"),
+    "E'": re.compile(r"[Ee]'(?:[^'\\]|\\[\s\S]|'')*'?"),
+}
+_IDENTIFIER_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$"
+)
+_LINE_END = re.compile("[{}]".format(LINE_BREAKS))
+_COMMA_SPACE = re.compile(r"\s*,\s*")
+_MULTI_SPACE = re.compile(r"\s\s+")
+_LINE_BREAK_SPACE = str.maketrans(dict.fromkeys(LINE_BREAKS, " "))
+
+
+def _normalize_space(code: Optional[str] = "") -> str:
+    # remove the spaces around commas, and make the runs of spaces and the line breaks one space
+    code = _COMMA_SPACE.sub(",", code)
+    return _MULTI_SPACE.sub(" ", code).translate(_LINE_BREAK_SPACE)
+
+
+def _strip_sql(sql: Optional[str] = "", postgres: Optional[bool] = True) -> str:
+    """
+    Remove the comments and excessive spaces from the sql in one pass. The quoted strings and identifiers, and the
+    dollar-quoted strings for postgres, are kept as they are. Outside of them the -- and # comments to the end of the
+    line and the /* */ comments, nested for postgres, are dropped, the spaces around commas are removed and the other
+    runs of spaces become one space.
+    :param sql: the original sql
+    :param postgres: scan the sql as postgres, otherwise as sqlite
+    :return: the sql without the comments
+    """
+    special = _SQL_SPECIAL_PG if postgres else _SQL_SPECIAL_SQLITE
+    out = []
+    # the sql outside of the quotes since the last quote, with the comments taken out
+    code = []
+    pos = 0
+    end = len(sql)
+    while pos < end:
+        m = special.search(sql, pos)
+        if m is None:
+            code.append(sql[pos:])
+            break
+        start = m.start()
+        token = m.group()
+        if (token[0] in "$Ee") and start and sql[start - 1] in _IDENTIFIER_CHARS:
+            # part of an identifier, e.g. a$b$ or name'
+            code.append(sql[pos : start + 1])
+            pos = start + 1
+            continue
+        code.append(sql[pos:start])
+        if token in ("--", "#"):
+            line_end = _LINE_END.search(sql, start)
+            pos = end if line_end is None else line_end.start()
+            continue
+        if token == "/*":
+            pos = m.end()
+            depth = 1
+            while depth:
+                close = sql.find("*/", pos)
+                if close == -1:
+                    pos = end
+                    break
+                opening = sql.find("/*", pos, close) if postgres else -1
+                if opening == -1:
+                    depth -= 1
+                    pos = close + 2
+                else:
+                    depth += 1
+                    pos = opening + 2
+            code.append(" ")
+            continue
+        if token.startswith("$"):
+            close = sql.find(token, m.end())
+            pos = end if close == -1 else close + len(token)
+        else:
+            pos = _SQL_QUOTED["E'" if len(token) == 2 else token].match(sql, start).end()
+        out.append(_normalize_space("".join(code)))
+        code = []
+        out.append(sql[start:pos])
+    out.append(_normalize_space("".join(code)))
+    return "".join(out).strip()
+
 
 def remove_comments_sqlite(str1: Optional[str] = "") -> str:
     """
@@ -12,49 +104,7 @@ def remove_comments_sqlite(str1: Optional[str] = "") -> str:
     :param str1: the original sql
     :return: the parsed sql
     """
-    # remove the /* */ comments
-    q = re.sub(r"/\*[^*]*\*+(?:[^*/][^*]*\*+)*/", "", str1)
-    # remove whole line -- and # comments
-    lines = [line for line in q.splitlines() if not re.match("^\s*(--|#)", line)]
-    # remove trailing -- and # comments
-    # pattern = r"(?:--|#)(?!.*(['""])[^'""]*\1)[^'\n\r]*"
-    # q = " ".join([re.sub(pattern, "", line) for line in lines])
-    q = ""
-    comment_symbol = ["--", "#"]
-    for line in lines:
-        new_line = line
-        for c in comment_symbol:
-            quoted = False
-            # if there is a comment symbol
-            if line.find(c) != -1:
-                c_idx = line.find(c)
-                # if there is a ' on the left
-                if line.rfind("'", c_idx) != -1:
-                    q_idx = line.rfind("'", c_idx)
-                    # find the corresponding ' on the right
-                    if line.find("'", q_idx) != -1:
-                        quoted = True
-                if not quoted:
-                    new_line = re.split("--|#", line)[0]
-        q += " " + new_line
-
-    # q = " ".join(
-    #     [
-    #         re.split("--|#", line)[0]
-    #         if line.find("'#") == -1
-    #         and line.find('"#') == -1
-    #         and line.find("'--") == -1
-    #         and line.find('"--') == -1
-    #         else line
-    #         for line in lines
-    #     ]
-    # )
-    # replace all spaces around commas
-    q = re.sub(r"\s*,\s*", ",", q)
-    # replace all multiple spaces to one space
-    str1 = re.sub("\s\s+", " ", q)
-    str1 = str1.replace("\n", " ").strip()
-    return str1
+    return _strip_sql(sql=str1, postgres=False)
 
 
 def remove_comments_pg(str1: Optional[str] = "") -> str:
@@ -63,18 +113,156 @@ def remove_comments_pg(str1: Optional[str] = "") -> str:
     :param str1: the original sql
     :return: the parsed sql
     """
-    # remove the /* */ comments
-    q = re.sub(r"/\*[^*]*\*+(?:[^*/][^*]*\*+)*/", "", str1)
-    # remove whole line -- and # comments
-    lines = [line for line in q.splitlines() if not re.match("^\s*(--|#)", line)]
-    # remove trailing -- and # comments
-    q = " ".join([re.split("--|#", line)[0] for line in lines])
-    # replace all spaces around commas
-    q = re.sub(r"\s*,\s*", ",", q)
-    # replace all multiple spaces to one space
-    str1 = re.sub("\s\s+", " ", q)
-    str1 = str1.replace("\n", " ").strip()
-    return str1
+    return _strip_sql(sql=str1, postgres=True)
+
+
+# the longest token that can be cut by the end of a chunk, a $tag$ with the longest postgres identifier
+_MAX_TOKEN = 66
+_COPY_FROM_STDIN = re.compile(r"\bCOPY\b[^;]*\bFROM\s+stdin\s*$", re.IGNORECASE)
+_COPY_END = re.compile(r"\n\\\.(?:\r?\n|$)")
+
+
+def split_sql(
+    reader: Any = None,
+    postgres: Optional[bool] = True,
+    chunk_size: Optional[int] = 1024 * 1024,
+) -> Iterator[str]:
+    """
+    Split the sql into statements at the semicolons that are not in quotes, dollar quotes or comments, reading it in
+    chunks so only the statement being split is held in memory. The data of COPY ... FROM stdin in pg_dump output is
+    skipped.
+    :param reader: the open file, or the sql as a string
+    :param postgres: scan the sql as postgres, otherwise as sqlite
+    :param chunk_size: the number of characters read at a time
+    :return: the iterator of the statements as they are in the file, without the semicolon
+    """
+    if isinstance(reader, str):
+        reader = io.StringIO(reader)
+    special = _SQL_SPECIAL_PG if postgres else _SQL_SPECIAL_SQLITE
+    semicolon = re.compile(";|" + special.pattern)
+    buf = ""
+    final = False
+    # where the current statement starts and where to scan from
+    start = 0
+    pos = 0
+    copy_data = False
+    while True:
+        if copy_data:
+            m = _COPY_END.search(buf, pos)
+            if m is not None:
+                copy_data = False
+                start = pos = m.end()
+                continue
+            # keep only what can be the start of the end marker
+            start = pos = max(len(buf) - 3, pos)
+        else:
+            # a token that starts in the last characters can be cut by the end of the chunk, it is found once the
+            # next chunk is read
+            endpos = len(buf) if final else max(len(buf) - _MAX_TOKEN, pos)
+            m = semicolon.search(buf, pos)
+            if m is None or m.start() >= endpos:
+                pos = endpos
+            else:
+                token = m.group()
+                token_start = m.start()
+                if token == ";":
+                    statement = buf[start:token_start]
+                    yield statement
+                    start = pos = m.end()
+                    copy_data = postgres and bool(_COPY_FROM_STDIN.search(statement))
+                    continue
+                if (token[0] in "$Ee") and token_start and buf[token_start - 1] in _IDENTIFIER_CHARS:
+                    # part of an identifier
+                    pos = token_start + 1
+                    continue
+                end = _token_end(buf=buf, token=token, start=token_start, postgres=postgres)
+                if end is not None and (end < len(buf) or final):
+                    pos = end
+                    continue
+                if final:
+                    pos = len(buf)
+        if final:
+            break
+        chunk = reader.read(chunk_size)
+        if not chunk:
+            final = True
+        # drop what was split already
+        buf = buf[start:] + chunk
+        pos -= start
+        start = 0
+    if copy_data:
+        return
+    if buf[start:].strip():
+        yield buf[start:]
+
+
+def _token_end(
+    buf: Optional[str] = "",
+    token: Optional[str] = "",
+    start: Optional[int] = 0,
+    postgres: Optional[bool] = True,
+) -> Optional[int]:
+    """
+    Find where the comment or quote that starts at start ends
+    :return: the position after it, None if it does not end in the buf
+    """
+    if token in ("--", "#"):
+        m = _LINE_END.search(buf, start)
+        return None if m is None else m.start()
+    if token == "/*":
+        pos = start + 2
+        depth = 1
+        while depth:
+            close = buf.find("*/", pos)
+            if close == -1:
+                return None
+            opening = buf.find("/*", pos, close) if postgres else -1
+            if opening == -1:
+                depth -= 1
+                pos = close + 2
+            else:
+                depth += 1
+                pos = opening + 2
+        return pos
+    if token.startswith("$"):
+        close = buf.find(token, start + len(token))
+        return None if close == -1 else close + len(token)
+    end = _SQL_QUOTED["E'" if len(token) == 2 else token].match(buf, start).end()
+    # it only stops before the end of the buf at the closing quote
+    return end if end < len(buf) else None
+
+
+def schema_prefix_regex(schema_list: Optional[List] = None) -> Any:
+    """
+    Compile the pattern that removes the database names before any of the schemas, e.g. db.schema1.table becomes
+    schema1.table, as one pass over the sql instead of one per schema. The schema names are matched with a trie of
+    their characters, so the many schemas of a database do not slow it down.
+    :param schema_list: the schemas
+    :return: the compiled pattern, substitute it with r"\1."
+    """
+    trie = {}
+    for schema in schema_list:
+        node = trie
+        for ch in schema:
+            node = node.setdefault(ch, {})
+        # the end of a schema name
+        node[""] = {}
+    return re.compile(r"[^ (,]*\.({})\.".format(_trie_pattern(trie)))
+
+
+def _trie_pattern(node: Optional[dict] = None) -> str:
+    branches = [
+        re.escape(ch) + _trie_pattern(child)
+        for ch, child in sorted(node.items())
+        if ch != ""
+    ]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:{})".format("|".join(branches))
+    if "" in node:
+        # a schema name ends here and a longer one goes on
+        pattern = "(?:{})?".format(pattern)
+    return pattern
 
 
 def find_column(
@@ -169,31 +357,77 @@ def produce_json(
     output_dict: Optional[dict] = None,
     engine: connection = None,
     search_schema: Optional[str] = "",
+    catalog: Any = None,
+    shard_by: Optional[str] = None,
 ) -> dict:
     """
     Product the output.json and put into the html
     :param output_dict: the parsed object with column level lineage
     :param engine: db connection
     :param search_schema: search schemas for db
+    :param catalog: the Catalog of the run, one is loaded if there is a db connection but no catalog
+    :param shard_by: table or schema to write the lineage for the html as shards loaded on demand, inline if not given
     :return: the output.json format with information about the base table
     """
     # Get all the table names that are not in the output_dict(mostly base tables)
     all_tables = []
     for key, val in output_dict.items():
         all_tables.extend(val["tables"])
-    all_tables = list(
-        set(all_tables)
-        - set(output_dict.keys())
-        - set([i.split(".")[-1] for i in list(output_dict.keys())])
-    )
-    for i in all_tables:
-        if len(i.split(".")) > 1 and i.split(".")[-1] in all_tables:
-            all_tables.pop(all_tables.index(i.split(".")[-1]))
-    base_table_dict = {}
-    # If no conn is provided, try to guess the base table's columns
     base_table_noconn_dict = {}
+    # If no conn is provided, try to guess the base table's columns
     if not engine and not search_schema:
         base_table_noconn_dict = _guess_base_table(output_dict=output_dict)
+    base_table_dict = base_tables(
+        all_tables=all_tables,
+        output_names=list(output_dict.keys()),
+        base_table_noconn_dict=base_table_noconn_dict,
+        engine=engine,
+        search_schema=search_schema,
+        catalog=catalog,
+    )
+    base_table_dict.update(output_dict)
+    with open("output.json", "w") as outfile:
+        json.dump(base_table_dict, outfile)
+    # _produce_html(output_json=str(base_table_dict).replace("'", '"'))
+    if shard_by:
+        produce_shards(output_json=base_table_dict, shard_by=shard_by)
+        _produce_html(manifest=SHARD_DIR + "/manifest.js")
+    else:
+        _produce_html(output_json=base_table_dict)
+    return base_table_dict
+
+
+def base_tables(
+    all_tables: Optional[List] = None,
+    output_names: Optional[List] = None,
+    base_table_noconn_dict: Optional[dict] = None,
+    engine: connection = None,
+    search_schema: Optional[str] = "",
+    catalog: Any = None,
+) -> dict:
+    """
+    Find the base tables, the tables used by the sql that are not in the output, and their columns
+    :param all_tables: the tables used by the sql
+    :param output_names: the names in the output
+    :param base_table_noconn_dict: the guessed columns of the base tables when there is no db connection
+    :param engine: db connection
+    :param search_schema: search schemas for db
+    :param catalog: the Catalog of the run, one is loaded if there is a db connection but no catalog
+    :return: the base table entries in the output.json format
+    """
+    all_tables = sorted(
+        set(all_tables)
+        - set(output_names)
+        - set([i.split(".")[-1] for i in output_names])
+    )
+    # an unqualified table is left out when it is also used with its schema
+    qualified = set(t.split(".")[-1] for t in all_tables if len(t.split(".")) > 1)
+    all_tables = [t for t in all_tables if len(t.split(".")) > 1 or t not in qualified]
+    base_table_dict = {}
+    if engine and search_schema and catalog is None and all_tables:
+        from .Catalog import Catalog
+
+        catalog = Catalog(engine=engine, search_schema=search_schema)
     # Iterate through the base tables, and add into the output_dict
     for t in all_tables:
         base_table_dict[t] = {}
@@ -202,24 +436,15 @@ def produce_json(
         # if db conn is provided
         if engine and search_schema:
             if t.endswith("_ANALYZED"):
-                cols = find_column(
-                    table_name=t[:-9], engine=engine, search_schema=search_schema
-                )
+                cols = catalog.find_column(table_name=t[:-9])
             else:
-                cols = find_column(
-                    table_name=t, engine=engine, search_schema=search_schema
-                )
+                cols = catalog.find_column(table_name=t)
         else:
             cols = base_table_noconn_dict.get(t, [])
         for i in cols:
             base_table_dict[t]["columns"][i] = [[""], [""]]
         base_table_dict[t]["table_name"] = str(t)
         base_table_dict[t]["sql"] = "this is a base table"
-    base_table_dict.update(output_dict)
-    with open("output.json", "w") as outfile:
-        json.dump(base_table_dict, outfile)
-    # _produce_html(output_json=str(base_table_dict).replace("'", '"'))
-    _produce_html(output_json=base_table_dict)
     return base_table_dict
 
 
@@ -231,24 +456,170 @@ def _guess_base_table(output_dict: Optional[dict] = None) -> dict:
     """
     base_table_noconn_dict = {}
     for key, val in output_dict.items():
-        temp_v = list(val["columns"].values())
-        temp_v = [i[0] + i[1] for i in temp_v]
-        for col_val in temp_v:
-            for t in col_val:
-                idx = t.rfind(".")
-                if t[:idx] in base_table_noconn_dict.keys():
-                    if t[idx + 1 :] not in base_table_noconn_dict[t[:idx]]:
-                        base_table_noconn_dict[t[:idx]].append(t[idx + 1 :])
-                else:
-                    base_table_noconn_dict[t[:idx]] = [t[idx + 1 :]]
+        add_guessed_columns(base_table_noconn_dict=base_table_noconn_dict, entry=val)
     return base_table_noconn_dict
 
 
-def _produce_html(output_json: Optional[dict] = "") -> None:
+def add_guessed_columns(
+    base_table_noconn_dict: Optional[dict] = None, entry: Optional[dict] = None
+) -> None:
+    """
+    Add the columns the entry uses to the guessed columns of the base tables
+    :param base_table_noconn_dict: the guessed columns so far, table: list of columns
+    :param entry: the lineage of one table in the output.json format
+    """
+    temp_v = list(entry["columns"].values())
+    temp_v = [i[0] + i[1] for i in temp_v]
+    for col_val in temp_v:
+        for t in col_val:
+            idx = t.rfind(".")
+            if t[:idx] in base_table_noconn_dict.keys():
+                if t[idx + 1 :] not in base_table_noconn_dict[t[:idx]]:
+                    base_table_noconn_dict[t[:idx]].append(t[idx + 1 :])
+            else:
+                base_table_noconn_dict[t[:idx]] = [t[idx + 1 :]]
+
+
+class NdjsonWriter:
+    def __init__(self, path: Optional[str] = "output.ndjson") -> None:
+        """
+        Append the lineage records to a newline-delimited JSON file one at a time, it can be given as the on_record
+        of a run so the records are on disk as soon as they are finished
+        :param path: the path to the NDJSON file, it is truncated first
+        """
+        self.path = path
+        self.count = 0
+        self.file = open(path, "w", encoding="utf-8")
+
+    def __call__(self, record: Optional[dict] = None) -> None:
+        self.file.write(json.dumps(record))
+        self.file.write("\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "NdjsonWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_ndjson(records: Any = None, path: Optional[str] = "output.ndjson") -> int:
+    """
+    Write the lineage records, e.g. from iter_lineage, to a newline-delimited JSON file as they come
+    :param records: an iterable of records in the output.json format
+    :param path: the path to the NDJSON file
+    :return: the number of records written
+    """
+    with NdjsonWriter(path=path) as writer:
+        for record in records:
+            writer(record)
+    return writer.count
+
+
+def produce_shards(
+    output_json: Optional[dict] = None, shard_by: Optional[str] = "table"
+) -> dict:
+    """
+    Write the lineage for the html as shards with a manifest, which shards.js loads for the viewer, only the shards of
+    the lineage of the table in the hash of the url if one is given. The manifest has the columns, the shard
+    and the upstream and downstream tables of every table. They are JavaScript files, so they can be loaded with a
+    script tag from the local file system as well.
+    :param output_json: the final output.json file
+    :param shard_by: table for one shard per table, schema for one shard per schema
+    :return: the manifest
+    """
+    if shard_by not in ("table", "schema"):
+        raise ValueError("shard_by should be table or schema, not {}".format(shard_by))
+    shard_dir = os.path.join(SHARD_DIR, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+    # the shards of a previous run
+    for f in os.listdir(shard_dir):
+        if f.endswith(".js"):
+            os.remove(os.path.join(shard_dir, f))
+    tables = {}
+    shard_dict = {}
+    for name, val in output_json.items():
+        table_id = val["table_name"]
+        if shard_by == "table":
+            key = name
+        else:
+            key = ".".join(table_id.split(".")[:-1])
+        if key not in shard_dict:
+            shard_dict[key] = "{}/shards/{}.js".format(SHARD_DIR, len(shard_dict))
+        # the tables the viewer draws the relations from, the same way it splits the column names
+        upstream = set()
+        for v in val["columns"].values():
+            for col in v[0] + v[1]:
+                if col:
+                    upstream.add(".".join(col.split(".")[:-1]))
+        tables[name] = {
+            "table_name": table_id,
+            "columns": list(val["columns"].keys()),
+            "shard": shard_dict[key],
+            "upstream": sorted(upstream),
+            "downstream": [],
+        }
+    id_dict = {val["table_name"]: name for name, val in tables.items()}
+    for name, val in tables.items():
+        for t in val["upstream"]:
+            if t in id_dict and name not in tables[id_dict[t]]["downstream"]:
+                tables[id_dict[t]]["downstream"].append(name)
+        val["upstream"] = [id_dict[t] for t in val["upstream"] if t in id_dict]
+    shards = {}
+    for name, val in output_json.items():
+        shards.setdefault(tables[name]["shard"], {})[name] = val
+    for shard, records in shards.items():
+        _write_js(
+            path=shard,
+            statement="window.lineageShards=window.lineageShards||{{}};window.lineageShards[{}]={};".format(
+                json.dumps(shard), json.dumps(records)
+            ),
+        )
+    manifest = {"shard_by": shard_by, "tables": tables}
+    _write_js(
+        path=SHARD_DIR + "/manifest.js",
+        statement="window.lineageManifest={};".format(json.dumps(manifest)),
+    )
+    return manifest
+
+
+def _write_js(path: Optional[str] = "", statement: Optional[str] = "") -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(statement)
+
+
+def _produce_html(
+    output_json: Optional[dict] = "", manifest: Optional[str] = None
+) -> None:
     """
     Produce the html file for viewing
     :param output_json: the final output.json file
+    :param manifest: the path to the manifest of the shards, shards.js loads them and then the viewer, the output_json
+    is inlined if not given
     """
+    if manifest is not None:
+        with open("index.html", "w", encoding="utf-8") as file_html:
+            file_html.write(
+                """<!DOCTYPE html>
+        <html lang="en">
+        <head>
+          <meta charset="UTF-8">
+          <meta name="viewport" content="width=device-width, initial-scale=1.0">
+          <meta http-equiv="X-UA-Compatible" content="ie=edge">
+        </head>
+        <body>
+          <script type="text/javascript" src="{}"></script>
+          <div id="main"></div>
+        <script type="text/javascript" src="shards.js"></script></body>
+        </html>""".format(
+                    manifest
+                )
+            )
+        return
     # Creating the HTML file
     with open("index.html", "w", encoding="utf-8") as file_html:
         # Adding the input data to the HTML file
@@ -0,0 +1,51 @@
+import pytest
+
+from lineagex.LineageXNoConn import LineageXNoConn
+from lineagex.lineagex import lineagex
+
+# table1 reads a base table and table2 reads table1, the tests add the statements for their own cases to it
+SQL = [
+    "CREATE TABLE table1 AS SELECT column1, column2 FROM schema1.other_table WHERE column3 IS NOT NULL;",
+    "CREATE TABLE table2 AS SELECT * FROM table1;",
+]
+
+
+@pytest.fixture
+def sql():
+    """
+    The statements shared by the tests, a new list for every test
+    """
+    return list(SQL)
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    """
+    Run LineageXNoConn in a temporary directory, with schema1 as the target and search path schema and without
+    the progress messages unless the keyword arguments say otherwise
+    """
+    monkeypatch.chdir(tmp_path)
+
+    def run(sql, **kwargs):
+        kwargs.setdefault("target_schema", "schema1")
+        kwargs.setdefault("search_path_schema", "schema1")
+        kwargs.setdefault("verbose", False)
+        return LineageXNoConn(sql=sql, **kwargs)
+
+    return run
+
+
+@pytest.fixture
+def run_lineagex(tmp_path, monkeypatch):
+    """
+    The same as run for the lineagex entry point, which also writes the viewer files
+    """
+    monkeypatch.chdir(tmp_path)
+
+    def run(sql, **kwargs):
+        kwargs.setdefault("target_schema", "schema1")
+        kwargs.setdefault("search_path_schema", "schema1")
+        kwargs.setdefault("verbose", False)
+        return lineagex(sql=sql, **kwargs)
+
+    return run
@@ -0,0 +1,36 @@
+from lineagex.Catalog import CATALOG_QUERY, Catalog
+
+
+class FakeFalDbt:
+    def __init__(self):
+        self.queries = []
+
+    def execute_sql(self, sql):
+        self.queries.append(sql)
+        assert sql == CATALOG_QUERY
+        rows = [
+            ("schema1", "MixedCase", "r", 1, "A"),
+            ("schema1", "table1", "r", 1, "column1"),
+            ("schema1", "table1", "r", 1, "column2"),
+            ("public", "table1", "v", 2, "other"),
+            ("public", "parent", "p", 2, "column3"),
+            ("empty", None, None, 3, None),
+        ]
+        return {
+            k: [r[i] for r in rows]
+            for i, k in enumerate(["nspname", "relname", "relkind", "ord", "attname"])
+        }
+
+
+def test_catalog_lookups():
+    engine = FakeFalDbt()
+    catalog = Catalog(engine=engine, search_schema="schema1, public, empty")
+    assert catalog.find_column("table1") == ["column1", "column2"]
+    assert catalog.find_column("TABLE1") == ["column1", "column2"]
+    assert catalog.find_column("public.table1") == ["other"]
+    assert catalog.find_column('"MixedCase"') == ["A"]
+    assert catalog.relkind("parent") == "p"
+    catalog.add_relation("empty.new_table", columns=["column4"])
+    assert catalog.find_column("new_table") == ["column4"]
+    assert len(engine.queries) == 1
+    assert catalog.saved_queries() == 4
@@ -0,0 +1,26 @@
+from sqlglot import exp, parse_one
+
+from lineagex.ColumnLineageNoConn import _find_all, _pruned_copy, shared_conditions
+
+SQL = """SELECT a.x, CASE WHEN a.y = 1 THEN b.z END AS c
+FROM s.a AS a JOIN (SELECT z, k FROM s.b WHERE k IN (SELECT k FROM s.d)) AS b ON a.k = b.k
+WHERE a.x > (SELECT MAX(x) FROM s.e) GROUP BY a.x"""
+
+
+def skip(child, parent):
+    return isinstance(child, tuple(shared_conditions))
+
+
+def test_skip_matches_popping_a_copy():
+    ast = parse_one(SQL, read="postgres")
+    popped = ast.copy()
+    for cond in shared_conditions:
+        for cond_sql in popped.find_all(cond):
+            cond_sql.pop()
+    for types in (exp.Table, exp.Column, exp.Select):
+        assert [_pruned_copy(n, skip).sql() for n in _find_all(ast, types, skip)] == [
+            n.sql() for n in popped.find_all(types)
+        ]
+    assert _pruned_copy(ast, skip).sql() == popped.sql()
+    # the original is left as it is
+    assert ast.sql() == parse_one(SQL, read="postgres").sql()
@@ -0,0 +1,170 @@
+import threading
+
+from lineagex.Instrumentation import Instrumentation
+from lineagex.LineageXWithConn import LineageXWithConn
+from lineagex.stack import Stack
+
+
+class FakeCatalog:
+    def relkind(self, table_name=""):
+        return None
+
+    def exists(self, schema="", table_name="", relkinds=None):
+        return False
+
+
+def make(sql_files_dict):
+    lx = LineageXWithConn.__new__(LineageXWithConn)
+    lx.schema = "schema1"
+    lx.s = Stack()
+    lx.sql_files_dict = sql_files_dict
+    lx.catalog = FakeCatalog()
+    lx.finished_list = []
+    lx.failed_set = set()
+    lx.not_parsed = 0
+    lx.lock = threading.Lock()
+    lx.instrumentation = Instrumentation(verbose=False)
+
+    def explain(name="", sql=""):
+        assert all(d in lx.finished_list for d in lx.dependency_dict[name])
+        lx.finished_list.append(name)
+
+    lx._explain_sql = explain
+    lx.dependency_dict = lx._find_dependencies()
+    for name in sql_files_dict:
+        if name not in lx.finished_list and name not in lx.failed_set:
+            lx._explain_in_order(name=name)
+    return lx
+
+
+def test_deep_chain():
+    n = 3000
+    sql_files_dict = {
+        "t{}".format(i): "SELECT a FROM t{}".format(i + 1) for i in range(n)
+    }
+    sql_files_dict["t{}".format(n)] = "SELECT a FROM base"
+    lx = make(sql_files_dict)
+    assert lx.finished_list == ["t{}".format(i) for i in range(n, -1, -1)]
+
+
+def test_cycle():
+    lx = make(
+        {
+            "a": "SELECT x FROM b",
+            "b": "WITH c AS (SELECT 1 AS x) SELECT x FROM a JOIN c ON TRUE",
+            "c": "SELECT 1 AS x",
+        }
+    )
+    assert lx.dependency_dict["b"] == ["a"]
+    assert lx.failed_set == {"a", "b"}
+    assert lx.finished_list == ["c"]
+
+
+class FakeConn:
+    autocommit = False
+
+
+class FakePool:
+    def getconn(self):
+        return FakeConn()
+
+    def putconn(self, conn):
+        pass
+
+    def closeall(self):
+        pass
+
+
+def test_concurrent_order():
+    lx = LineageXWithConn.__new__(LineageXWithConn)
+    lx.schema = "schema1"
+    lx.s = Stack()
+    lx.sql_files_dict = {
+        "a": "SELECT x FROM b JOIN c ON TRUE",
+        "b": "SELECT x FROM d",
+        "c": "SELECT x FROM base",
+        "d": "SELECT x FROM base",
+        "e": "SELECT x FROM a",
+    }
+    lx.catalog = FakeCatalog()
+    lx.finished_list = []
+    lx.failed_set = set()
+    lx.output_dict = {}
+    lx.on_record = None
+    lx.not_parsed = 0
+    lx.jobs = 3
+    lx.pool = FakePool()
+    lx.local = threading.local()
+    lx.lock = threading.Lock()
+    lx.instrumentation = Instrumentation(verbose=False)
+
+    def explain(name="", sql=""):
+        assert isinstance(lx.local.conn, FakeConn)
+        with lx.lock:
+            assert all(d in lx.finished_list for d in lx.dependency_dict[name])
+            lx.finished_list.append(name)
+            lx.output_dict["schema1." + name] = {
+                "tables": ["base"],
+                "columns": {"x": ["base.x"]},
+                "table_name": "schema1." + name,
+                "sql": sql,
+            }
+
+    lx._explain_sql = explain
+    lx.dependency_dict = lx._find_dependencies()
+    lx._explain_concurrently()
+    assert lx.finished_list == ["d", "b", "c", "a", "e"]
+    assert list(lx.output_dict.keys()) == ["schema1." + n for n in "dbcae"]
+
+
+def test_concurrent_runtime_dependency_on_failed():
+    lx = LineageXWithConn.__new__(LineageXWithConn)
+    lx.schema = "schema1"
+    lx.s = Stack()
+    # the static pass does not see that c reads from a
+    lx.sql_files_dict = {
+        "a": "SELECT x FROM base",
+        "b": "SELECT x FROM base",
+        "c": "SELECT x FROM unknown_view",
+        "d": "SELECT x FROM c",
+    }
+    lx.catalog = FakeCatalog()
+    lx.finished_list = []
+    lx.failed_set = set()
+    lx.output_dict = {}
+    lx.on_record = None
+    lx.not_parsed = 0
+    lx.jobs = 2
+    lx.pool = FakePool()
+    lx.local = threading.local()
+    lx.lock = threading.Lock()
+    lx.instrumentation = Instrumentation(verbose=False)
+    a_failed = threading.Event()
+
+    def explain(name="", sql=""):
+        if name == "a":
+            lx._add_failed(name="a", message="a failed")
+            a_failed.set()
+            return None
+        if name == "c":
+            # a has failed and been released by the time c finds it
+            a_failed.wait()
+            return "a"
+        with lx.lock:
+            lx.finished_list.append(name)
+            lx.output_dict["schema1." + name] = {
+                "tables": ["base"],
+                "columns": {"x": ["base.x"]},
+                "table_name": "schema1." + name,
+                "sql": sql,
+            }
+        return None
+
+    lx._explain_sql = explain
+    lx.dependency_dict = lx._find_dependencies()
+    lx._explain_concurrently()
+    assert lx.finished_list == ["b"]
+    assert lx.failed_set == {"a", "c", "d"}
+    messages = {k: r.message for k, r in lx.instrumentation.records.items()}
+    assert messages["c"] == "c is skipped because it is missing dependency table a"
+    assert messages["d"] == "d is skipped because it is missing dependency table c"
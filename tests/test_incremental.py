@@ -0,0 +1,82 @@
+from lineagex.utils import base_tables
+
+THIRD = "CREATE TABLE table3 AS SELECT column5 FROM schema1.third_table;"
+# table3 reads table1 by its schema-qualified name and table4 is apart from both
+EXTRA = [
+    "CREATE TABLE table3 AS SELECT t.column2 FROM schema1.table1 t;",
+    'CREATE TABLE table4 AS SELECT "Column5" FROM schema1.third_table;',
+]
+
+
+def test_incremental_matches_full(run, sql, tmp_path):
+    sql.append(THIRD)
+    run(sql)
+    (tmp_path / "output.json").rename(tmp_path / "previous.json")
+    changed = list(sql)
+    changed[0] = (
+        "CREATE TABLE table1 AS SELECT column1, column4 FROM schema1.other_table;"
+    )
+    run(changed)
+    full = (tmp_path / "output.json").read_bytes()
+    lx = run(changed, previous_output=str(tmp_path / "previous.json"))
+    assert lx.skipped == 1
+    assert (tmp_path / "output.json").read_bytes() == full
+    # for a list of sql the changed files are the indices in the list
+    lx = run(sql, previous_output=str(tmp_path / "previous.json"), changed_files=[2])
+    assert lx.skipped == 2
+
+
+def test_incremental_reruns_schema_qualified_readers(run, sql, tmp_path):
+    sql.extend(EXTRA)
+    run(sql)
+    (tmp_path / "output.json").rename(tmp_path / "previous.json")
+    changed = list(sql)
+    changed[0] = (
+        'CREATE TABLE table1 AS SELECT column1, "column2" FROM schema1.other_table;'
+    )
+    run(changed)
+    full = (tmp_path / "output.json").read_bytes()
+    lx = run(changed, previous_output=str(tmp_path / "previous.json"))
+    assert sorted(lx.reused_dict) == ["table4"]
+    assert (tmp_path / "output.json").read_bytes() == full
+    lx = run(sql, previous_output=str(tmp_path / "previous.json"), changed_files=[3])
+    assert sorted(lx.reused_dict) == ["table1", "table2", "table3"]
+
+
+def test_incremental_changed_files(run, sql, tmp_path):
+    sql_dir = tmp_path / "sql"
+    sql_dir.mkdir()
+    for idx, s in enumerate(sql + [THIRD]):
+        (sql_dir / "file{}.sql".format(idx)).write_text(s)
+    run(str(sql_dir))
+    (tmp_path / "output.json").rename(tmp_path / "previous.json")
+    lx = run(str(sql_dir), previous_output=str(tmp_path / "previous.json"))
+    assert lx.skipped == 3
+    # the downstream table2 is re-run with table1, relative and absolute paths name the same file
+    for changed_files in [[sql_dir / "file0.sql"], ["sql/file0.sql"]]:
+        lx = run(
+            str(sql_dir),
+            previous_output=str(tmp_path / "previous.json"),
+            changed_files=changed_files,
+        )
+        assert sorted(lx.reused_dict) == ["table3"]
+
+
+def test_base_tables_leave_out_the_unqualified_names():
+    tables = base_tables(
+        all_tables=[
+            "icustays",
+            "mimiciii_clinical.icustays",
+            "patients",
+            "mimiciii_clinical.patients",
+            "admissions",
+            "table1",
+        ],
+        output_names=["schema1.table1"],
+        base_table_noconn_dict={},
+    )
+    assert list(tables) == [
+        "admissions",
+        "mimiciii_clinical.icustays",
+        "mimiciii_clinical.patients",
+    ]
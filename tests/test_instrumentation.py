@@ -0,0 +1,44 @@
+from lineagex.LineageXNoConn import LineageXNoConn
+
+
+def test_records_and_summary(run, sql, capsys):
+    sql.append("CREATE TABLE table3 AS SELECT FROM WHERE;")
+    records = []
+    lx = run(sql, callbacks=[records.append])
+    assert capsys.readouterr().out == ""
+    assert sorted(r.name for r in records) == ["table1", "table2", "table3"]
+    summary = lx.instrumentation.summary()
+    assert summary["outcomes"] == {"parsed": 2, "failed": 1}
+    assert sum(summary["errors"].values()) == 1
+    assert lx.instrumentation.records["table1"].parse_time > 0
+    assert lx.instrumentation.records["table2"].resolve_time > 0
+    assert len(summary["slowest"]) == 3
+
+
+def test_retried_statement_counted_once(run, sql, monkeypatch):
+    get_lineage = LineageXNoConn._get_lineage
+    attempts = []
+
+    def flaky_get_lineage(self, name="", sql=""):
+        attempts.append(name)
+        if attempts.count("table1") == 1 and name == "table1":
+            raise ValueError("table1 failed")
+        return get_lineage(self, name=name, sql=sql)
+
+    monkeypatch.setattr(LineageXNoConn, "_get_lineage", flaky_get_lineage)
+    # table2 runs table1 ahead of its turn, where it fails, and table1 is run again on its own turn
+    sql.reverse()
+    finished = []
+    lx = run(sql, callbacks=[lambda r: finished.append((r.name, r.outcome))])
+    assert attempts == ["table1", "table1"]
+    assert list(lx.output_dict) == ["table1"]
+    assert lx.instrumentation.records["table1"].outcome == "parsed"
+    assert lx.instrumentation.records["table1"].error is None
+    summary = lx.instrumentation.summary()
+    assert summary["outcomes"] == {"parsed": 1, "failed": 1}
+    assert summary["errors"] == {"ValueError": 1}
+    assert finished == [
+        ("table1", "failed"),
+        ("table2", "failed"),
+        ("table1", "parsed"),
+    ]
@@ -0,0 +1,54 @@
+from lineagex.LineageCache import LineageCache
+
+# quoted identifiers keep their case, so the quoting is part of the sql the entries are keyed by
+QUOTED = 'CREATE TABLE "Table3" AS SELECT "Column1" FROM schema1."Other_Table";'
+UNQUOTED = 'CREATE TABLE "Table3" AS SELECT Column1 FROM schema1.Other_Table;'
+
+
+def test_cache_hit(run, sql, tmp_path):
+    sql.append(QUOTED)
+    first = run(sql, cache_dir=str(tmp_path / "cache"))
+    assert first.cache.stats()["misses"] == 3
+    second = run(sql, cache_dir=str(tmp_path / "cache"))
+    assert second.cache.stats()["hits"] == 3
+    assert second.output_dict == first.output_dict
+    assert second.output_dict['"Table3"']["columns"] == {
+        "Column1": [['schema1."Other_Table"."Column1"'], []]
+    }
+
+
+def test_cache_keeps_the_quoting_apart(run, sql, tmp_path):
+    run(sql + [QUOTED], cache_dir=str(tmp_path / "cache"))
+    lx = run(sql + [UNQUOTED], cache_dir=str(tmp_path / "cache"))
+    assert lx.cache.stats()["misses"] == 1
+    assert lx.output_dict == run(sql + [UNQUOTED]).output_dict
+
+
+def test_cache_invalidated_by_upstream_columns(run, sql, tmp_path):
+    # table3 reads the schema-qualified table1, whose columns stay the same
+    sql.append("CREATE TABLE table3 AS SELECT t.* FROM schema1.table1 t;")
+    for columns, hits in [
+        (["column1", "column2", "column3"], 0),
+        (["column1", "column2", "column4"], 2),
+    ]:
+        lx = run(
+            sql,
+            cache_dir=str(tmp_path / "cache"),
+            input_table_dict={"schema1.other_table": columns},
+        )
+        assert lx.cache.stats()["hits"] == hits
+        assert lx.cache.stats()["misses"] == 3 - hits
+
+
+def test_cache_eviction(tmp_path):
+    cache = LineageCache(cache_dir=str(tmp_path), max_size=2048)
+    for i in range(20):
+        cache.put(
+            sql="SELECT {}".format(i),
+            dialect="postgres",
+            deps={},
+            table_list=[],
+            column_dict={"c": [["t.c" * 20], []]},
+        )
+    assert cache.evictions > 0
+    assert cache.size <= 2048
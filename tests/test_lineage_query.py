@@ -0,0 +1,48 @@
+import pytest
+
+
+def test_upstream_and_downstream(run_lineagex, sql):
+    sql[1] = "CREATE TABLE table2 AS SELECT column1 FROM table1;"
+    sql.append("CREATE TABLE table3 AS SELECT column1 AS c FROM table2;")
+    q = run_lineagex(sql).query()
+    assert q.downstream("schema1.other_table.column3") == [
+        "table1.column1",
+        "table1.column2",
+        "table2.column1",
+        "table3.c",
+    ]
+    assert q.downstream("schema1.other_table.column3", direct_only=True) == []
+    assert q.downstream("schema1.other_table.column1", depth=1) == ["table1.column1"]
+    assert q.upstream("table3.c", direct_only=True) == [
+        "schema1.other_table.column1",
+        "table1.column1",
+        "table2.column1",
+    ]
+    assert q.upstream("table3", level="table") == [
+        "schema1.other_table",
+        "table1",
+        "table2",
+    ]
+    assert q.downstream("table1", level="table", depth=1) == ["table2"]
+    # the same answer from the memo
+    assert q.downstream("schema1.other_table.column3", depth=None) == q.downstream(
+        "schema1.other_table.column3"
+    )
+    with pytest.raises(KeyError):
+        q.upstream("table3.missing")
+
+
+def test_schema_qualified_and_quoted_names(run_lineagex, sql):
+    # table1 takes the schema table2 reads it with, as in output.json
+    sql[1] = "CREATE TABLE table2 AS SELECT column1 FROM schema1.table1;"
+    sql.append('CREATE TABLE "Table3" AS SELECT column1 AS "C" FROM table2;')
+    q = run_lineagex(sql).query()
+    assert q.upstream('"Table3".C') == [
+        "schema1.other_table.column1",
+        "schema1.other_table.column3",
+        "schema1.table1.column1",
+        "table2.column1",
+    ]
+    assert q.downstream("schema1.table1", level="table") == ['"Table3"', "table2"]
+    with pytest.raises(KeyError):
+        q.upstream("table1", level="table")
@@ -0,0 +1,69 @@
+import json
+
+from lineagex.LineageStore import LineageStore
+
+SPLIT = {
+    "tables": ["schema1.other_table"],
+    "columns": {
+        "column1": [["schema1.other_table.column1"], ["schema1.other_table.column3"]],
+        "column2": [[], ["schema1.other_table.column3"]],
+    },
+    "table_name": "table1",
+    "sql": "CREATE TABLE table1 AS SELECT column1, NULL AS column2 FROM schema1.other_table WHERE column3 IS NOT NULL",
+}
+
+FLAT = {
+    "tables": ["schema1.table1"],
+    "columns": {"column1": ["schema1.table1.column1"], "column2": []},
+    "table_name": "schema1.table2",
+    "sql": "CREATE TABLE table2 AS SELECT * FROM table1",
+}
+
+
+def test_records_round_trip():
+    store = LineageStore()
+    store.add(name="table1", record=SPLIT)
+    store.add(name="schema1.table2", record=FLAT)
+    assert list(store.records) == ["table1", "schema1.table2"]
+    assert store.materialize(name="table1") == SPLIT
+    assert store.materialize(name="schema1.table2") == FLAT
+    # the shared names are kept once
+    assert store.names.count("schema1.other_table.column3") == 1
+
+
+def test_sources_decided_per_record():
+    # the first columns have no sources, in both forms
+    flat = {
+        "tables": ["schema1.table1"],
+        "columns": {"column0": [], "column1": ["schema1.table1.column1"]},
+        "table_name": "schema1.table3",
+        "sql": "CREATE TABLE table3 AS SELECT NULL AS column0, column1 FROM table1",
+    }
+    split = {
+        "tables": ["schema1.table1"],
+        "columns": {"column0": [[], []], "column1": [["schema1.table1.column1"], []]},
+        "table_name": "schema1.table4",
+        "sql": "CREATE TABLE table4 AS SELECT NULL AS column0, column1 FROM table1",
+    }
+    empty = dict(flat, columns={"column0": []}, table_name="schema1.table5")
+    store = LineageStore()
+    for record in [flat, split, empty]:
+        store.add(name=record["table_name"], record=record)
+    for record in [flat, split, empty]:
+        assert store.materialize(name=record["table_name"]) == record
+    assert [t.split for t in store.records.values()] == [False, True, False]
+
+
+def test_output_dict_is_a_dict(run, sql):
+    sql[1] = "CREATE TABLE table2 AS SELECT * FROM schema1.table1;"
+    lx = run(sql)
+    assert type(lx.output_dict) is dict
+    with open("output.json") as f:
+        written = json.load(f)
+    assert {k: written[k] for k in lx.output_dict} == json.loads(
+        json.dumps(lx.output_dict)
+    )
+    # the schema is taken from the sql using the table
+    assert lx.output_dict["schema1.table1"]["table_name"] == "schema1.table1"
+    lx.output_dict["table2"]["columns"]["column1"][0].append("extra")
+    assert lx.output_dict["table2"]["columns"]["column1"][0][-1] == "extra"
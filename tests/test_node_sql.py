@@ -0,0 +1,20 @@
+from sqlglot import exp, parse_one
+
+from lineagex.ColumnLineageNoConn import node_sql, table_name_alias
+
+SQL = """SELECT "a""b".c, t.*, "X y".z /* note */, s.t.u.v, "select"
+FROM "My Tab" AS "q r", x.y t(a, b), z, a.b.c AS d JOIN unnest(arr) AS u ON TRUE"""
+
+
+def test_node_sql_matches_the_generator():
+    ast = parse_one(SQL, read="postgres")
+    cache = {}
+    for node in ast.find_all(exp.Column, exp.Table, exp.Identifier, exp.Star):
+        assert node_sql(node=node, cache=cache) == node.sql()
+        # the second time comes from the cache
+        assert node_sql(node=node, cache=cache) == node.sql()
+        if isinstance(node, exp.Table) and node.alias:
+            temp = node.sql().split(" ")
+            assert table_name_alias(table=node) == (
+                (temp[0], temp[2]) if temp[1] in ("AS", "as") else (None, None)
+            )
@@ -0,0 +1,74 @@
+import pytest
+
+from lineagex.SqlToDict import SqlToDict
+
+# the DAG has to follow the schema-qualified names of the tables written in the run
+QUALIFIED = [
+    "CREATE TABLE table3 AS SELECT t1.column1, t2.column2 FROM schema1.table1 t1 JOIN table2 t2 ON t1.column1 = t2.column1;",
+    "CREATE TABLE table4 AS SELECT t.* FROM schema1.table3 t;",
+    "CREATE TABLE table5 AS SELECT column2 FROM schema1.other_table;",
+]
+QUOTED = [
+    'CREATE TABLE "Table6" AS SELECT t.* FROM schema1.table4 t;',
+    'CREATE TABLE table7 AS SELECT "Table6".column1 FROM "Table6";',
+]
+
+
+def test_jobs_match_serial(run, sql):
+    sql.extend(
+        [
+            "CREATE TABLE table3 AS SELECT t1.column1, t2.column2 FROM table1 t1 JOIN table2 t2 ON t1.column1 = t2.column1;",
+            "CREATE TABLE table4 AS SELECT column2 FROM schema1.other_table;",
+        ]
+    )
+    serial = run(sql)
+    parallel = run(sql, jobs=2)
+    assert parallel.recomputed == 0
+    assert parallel.output_dict == serial.output_dict
+
+
+# the sqlite preprocessing turns the double quotes into single quotes
+@pytest.mark.parametrize(
+    "dialect, extra", [("postgres", QUALIFIED + QUOTED), ("sqlite", QUALIFIED)]
+)
+def test_jobs_follow_qualified_and_quoted_names(run, sql, dialect, extra):
+    sql.extend(extra)
+    serial = run(sql, dialect=dialect)
+    parallel = run(sql, dialect=dialect, jobs=2)
+    assert parallel.recomputed == 0
+    assert parallel.output_dict == serial.output_dict
+    assert len(serial.output_dict) == len(sql)
+    # read by table4 with its schema
+    assert serial.output_dict["schema1.table3"]["columns"]["column1"] == [
+        ["schema1.table1.column1"],
+        ["schema1.table1.column1", "table2.column1"],
+    ]
+
+
+def test_ingestion_matches_serial(tmp_path, capsys):
+    files = {
+        "a.sql": "CREATE TABLE t1 AS SELECT a FROM s; INSERT INTO t2 SELECT a FROM t1;",
+        "b.sql": "INSERT INTO t2 SELECT b FROM s; DELETE FROM t2 WHERE a IN (SELECT a FROM t1);",
+        "c.sql": "DROP TABLE IF EXISTS t1; CREATE TABLE t1 AS SELECT b FROM s;",
+        "d.sql": "SELECT a FROM t1",
+    }
+    for name, sql in files.items():
+        (tmp_path / name).write_text(sql)
+    results = []
+    for jobs in (None, 3):
+        s2d = SqlToDict(path=str(tmp_path), schema_list=["public"], jobs=jobs)
+        warnings = [
+            line
+            for line in capsys.readouterr().out.splitlines()
+            if line.startswith("WARNING")
+        ]
+        results.append((list(s2d.sql_files_dict.items()), s2d.file_dict, warnings))
+    assert results[0] == results[1]
+    assert list(results[0][1]) == [
+        "t1",
+        "t2_INSERTION_1",
+        "t2_INSERTION_2",
+        "t2_DELETION_1",
+        "d",
+    ]
+    assert results[0][2] == ["WARNING: duplicate script detected for t1"]
@@ -0,0 +1,54 @@
+from sqlglot import parse_one
+
+import lineagex.ColumnLineageNoConn as ColumnLineageNoConn_module
+import lineagex.LineageXNoConn as LineageXNoConn_module
+
+
+def test_parse_once(run, sql):
+    # table2 runs table1 ahead of its turn
+    sql.reverse()
+    sql.append(
+        "CREATE TABLE table3 AS WITH t AS (SELECT column1 FROM table2) SELECT column1 FROM t;"
+    )
+    lx = run(sql)
+    assert len(lx.output_dict) == 3
+    assert lx.parse_count == 3
+    assert lx.sql_ast_dict == {}
+
+
+def test_parse_once_sqlite(run, monkeypatch):
+    dialects = []
+
+    def counting_parse_one(sql, read=None):
+        dialects.append(read)
+        return parse_one(sql, read=read)
+
+    monkeypatch.setattr(LineageXNoConn_module, "parse_one", counting_parse_one)
+    monkeypatch.setattr(ColumnLineageNoConn_module, "parse_one", counting_parse_one)
+    sql = [
+        "CREATE TABLE table2 AS SELECT t.column1 FROM table1 AS t;",
+        "CREATE TABLE table1 AS SELECT column1 FROM schema1.other_table LIMIT 5 OFFSET 10;",
+    ]
+    for cache_dir in [None, "cache", "cache"]:
+        dialects.clear()
+        lx = run(sql, dialect="sqlite", cache_dir=cache_dir)
+        assert lx.output_dict["table2"]["columns"] == {
+            "column1": [["table1.column1"], []]
+        }
+        assert lx.parse_count == len(dialects)
+        assert set(dialects) <= {"sqlite"}
+    # the second run with the cache takes everything from it
+    assert dialects == []
+
+
+def test_parse_once_mysql(run):
+    # a double-quoted string in mysql, not a column as it would be parsed with postgres first
+    sql = [
+        'CREATE TABLE table1 AS SELECT "abc" AS column1, column2 FROM schema1.other_table;'
+    ]
+    lx = run(sql, dialect="mysql")
+    assert lx.output_dict["table1"]["columns"] == {
+        "column1": [[], []],
+        "column2": [["schema1.other_table.column2"], []],
+    }
+    assert lx.parse_count == 1
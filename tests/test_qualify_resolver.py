@@ -0,0 +1,81 @@
+import contextlib
+import io
+
+import pytest
+
+from lineagex.ColumnLineageNoConn import ColumnLineageNoConn
+from lineagex.LineageXNoConn import LineageXNoConn
+from lineagex.SchemaQualifier import SchemaQualifier
+
+
+def lineage(sql, input_table_dict, qualifier=None):
+    column_dict = ColumnLineageNoConn(
+        sql=sql, input_table_dict=input_table_dict, qualifier=qualifier
+    ).column_dict
+    return {k: [sorted(v[0]), sorted(v[1])] for k, v in column_dict.items()}
+
+
+def test_qualify_resolves_the_columns_from_the_schema():
+    input_table_dict = {"sch.t": ["id", "a"], "sch.u": ["id", "c"]}
+    sql = "SELECT a, c FROM sch.t JOIN sch.u ON t.id = u.id"
+    qualifier = SchemaQualifier(search_path_schema=["sch"])
+    assert lineage(sql, input_table_dict, qualifier) == {
+        "a": [["sch.t.a"], ["sch.t.id", "sch.u.id"]],
+        "c": [["sch.u.c"], ["sch.t.id", "sch.u.id"]],
+    }
+    # the heuristics can not tell the tables of the columns in the join condition
+    assert lineage(sql, input_table_dict)["a"] == [["sch.t.a"], ["t.id", "u.id"]]
+    assert (qualifier.qualified, qualifier.fallbacks) == (1, 0)
+
+
+def test_qualify_falls_back_without_the_sources():
+    input_table_dict = {"sch.t": ["id", "a"]}
+    qualifier = SchemaQualifier(search_path_schema=["sch"])
+    for sql in [
+        "SELECT a, c FROM sch.t JOIN missing ON true",
+        # sqlglot fails on a column the table does not have
+        "SELECT t.b FROM sch.t",
+    ]:
+        assert lineage(sql, input_table_dict, qualifier) == lineage(
+            sql, input_table_dict
+        )
+    assert (qualifier.qualified, qualifier.fallbacks) == (0, 2)
+
+
+def test_qualify_keeps_the_names_of_the_columns():
+    input_table_dict = {"sch.t": ["id", "a"]}
+    qualifier = SchemaQualifier(search_path_schema=["sch"])
+    column_dict = lineage(
+        "WITH x AS (SELECT a, COUNT(id) AS n FROM t GROUP BY a UNION ALL SELECT a, 0 FROM t) SELECT * FROM x",
+        input_table_dict,
+        qualifier,
+    )
+    assert sorted(column_dict) == ["a", "n"]
+    assert column_dict["n"][0] == ["t.id"]
+    # the star would take the name sqlglot gives to COUNT(id)
+    sql = "WITH x AS (SELECT a, COUNT(id) FROM t GROUP BY a) SELECT * FROM x"
+    assert lineage(sql, input_table_dict, qualifier) == lineage(sql, input_table_dict)
+    assert (qualifier.qualified, qualifier.fallbacks) == (1, 1)
+
+
+def test_qualify_schema_follows_new_columns(tmp_path, monkeypatch):
+    sql_dir = tmp_path / "sql"
+    sql_dir.mkdir()
+    (sql_dir / "one.sql").write_text("SELECT s.a, s.b FROM raw.src s;")
+    (sql_dir / "two.sql").write_text("SELECT * FROM one;")
+    monkeypatch.chdir(tmp_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        lx = LineageXNoConn(
+            sql=str(sql_dir),
+            target_schema="sch",
+            search_path_schema="raw",
+            input_table_dict={"raw.src": ["a", "b", "c"]},
+            resolver="qualify",
+        )
+    assert lx.output_dict["two"]["columns"] == {
+        "a": [["one.a"], []],
+        "b": [["one.b"], []],
+    }
+    assert lx.qualifier.qualified == 2
+    with pytest.raises(ValueError):
+        LineageXNoConn(sql=str(sql_dir), resolver="exact")
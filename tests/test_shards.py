@@ -0,0 +1,112 @@
+import json
+import shutil
+import subprocess
+from urllib.parse import quote
+
+import pytest
+
+THIRD = "CREATE TABLE table3 AS SELECT column1 FROM table2;"
+
+
+def load_js(path, prefix):
+    with open(path, encoding="utf-8") as f:
+        statement = f.read()
+    assert statement.startswith(prefix) and statement.endswith(";")
+    return json.loads(statement[len(prefix) : -1])
+
+
+def test_shards_cover_output_json(run_lineagex, sql):
+    run_lineagex(sql + [THIRD], shard_by="table")
+    with open("output.json") as f:
+        full = json.load(f)
+    with open("index.html") as f:
+        html = f.read()
+    assert "inlineSource" not in html and "lineage/manifest.js" in html
+    manifest = load_js("lineage/manifest.js", "window.lineageManifest=")
+    assert set(manifest["tables"]) == set(full)
+    records = {}
+    for shard in {t["shard"] for t in manifest["tables"].values()}:
+        prefix = "window.lineageShards=window.lineageShards||{{}};window.lineageShards[{}]=".format(
+            json.dumps(shard)
+        )
+        records.update(load_js(shard, prefix))
+    assert records == full
+    table2 = manifest["tables"]["table2"]
+    assert table2["upstream"] == ["table1"]
+    assert table2["downstream"] == ["table3"]
+
+
+# runs lineagex/shards.js with a stand-in for the browser that evaluates the scripts it adds from the working
+# directory, except the viewer, and prints what it hands over to the viewer
+LOADER = """
+const fs = require("fs");
+const vm = require("vm");
+const loaded = [];
+global.window = {
+  location: { hash: process.argv[2] },
+  addEventListener: function () {},
+};
+global.document = {
+  createElement: function () {
+    return {};
+  },
+  getElementById: function () {
+    return {};
+  },
+  body: {
+    appendChild: function (script) {
+      loaded.push(script.src);
+      if (!["vendor.js", "app.js"].includes(script.src)) {
+        vm.runInThisContext(fs.readFileSync(script.src, "utf-8"));
+      }
+      setImmediate(script.onload);
+    },
+  },
+};
+vm.runInThisContext(fs.readFileSync("lineage/manifest.js", "utf-8"));
+vm.runInThisContext(fs.readFileSync(process.argv[1], "utf-8"));
+setTimeout(function () {
+  console.log(JSON.stringify({ loaded: loaded, source: JSON.parse(window.inlineSource) }));
+}, 100);
+"""
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="needs node")
+def test_shards_js_loads_the_shards(run_lineagex, sql):
+    sql.extend(
+        [
+            THIRD,
+            "CREATE TABLE table5 AS SELECT column2 FROM schema1.other_table;",
+            'CREATE TABLE "Other"."Table4" AS SELECT "Col A" FROM schema1.base;',
+        ]
+    )
+    run_lineagex(sql, shard_by="table")
+    with open("output.json") as f:
+        full = json.load(f)
+    with open("index.html") as f:
+        assert '<script type="text/javascript" src="shards.js"></script>' in f.read()
+    manifest = load_js("lineage/manifest.js", "window.lineageManifest=")
+
+    def load(hash):
+        out = subprocess.run(
+            ["node", "-e", LOADER, "shards.js", hash],
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        return json.loads(out)
+
+    def shards(tables):
+        return sorted({manifest["tables"][t]["shard"] for t in tables})
+
+    result = load("")
+    assert result["source"] == full
+    assert sorted(result["loaded"][:-2]) == shards(full)
+    assert result["loaded"][-2:] == ["vendor.js", "app.js"]
+    # only the lineage of the table in the hash, not table5 reading from the same source
+    for name, tables in [
+        ("table2", ["schema1.other_table", "table1", "table2", "table3"]),
+        ('"Other"."Table4"', ["schema1.base", '"Other"."Table4"']),
+    ]:
+        result = load("#" + quote(name))
+        assert result["source"] == {t: full[t] for t in tables}
+        assert sorted(result["loaded"][:-2]) == shards(tables)
@@ -0,0 +1,27 @@
+from lineagex.ColumnLineageNoConn import ColumnLineageNoConn
+
+
+def lineage(sql, input_table_dict, star_index):
+    return ColumnLineageNoConn(
+        sql=sql, input_table_dict=input_table_dict, star_index=star_index
+    ).column_dict
+
+
+def test_star_index_follows_new_columns():
+    star_index = {}
+    input_table_dict = {"sch.t": ["a", "b"]}
+    assert lineage("SELECT * FROM sch.t", input_table_dict, star_index) == {
+        "a": [["sch.t.a"], []],
+        "b": [["sch.t.b"], []],
+    }
+    expansion = star_index["sch.t"][1]
+    # the expansion is shared by the next statement over the same columns
+    lineage("SELECT x.* FROM sch.t x", input_table_dict, star_index)
+    assert star_index["sch.t"][1] is expansion
+    # a statement writing the table gives it a new list of columns
+    input_table_dict["sch.t"] = ["a", "b", "c"]
+    column_dict = lineage("SELECT x.* FROM sch.t x", input_table_dict, star_index)
+    assert sorted(column_dict) == ["a", "b", "c"]
+    assert column_dict["c"] == [["sch.t.c"], []]
+    column_dict = lineage("SELECT COUNT(*) FROM sch.t", input_table_dict, star_index)
+    assert sorted(column_dict["count"][1]) == ["sch.t.a", "sch.t.b", "sch.t.c"]
@@ -0,0 +1,37 @@
+import json
+
+from lineagex.lineagex import iter_lineage
+from lineagex.utils import write_ndjson
+
+
+def test_stream_matches_output_json(run_lineagex, sql, tmp_path):
+    run_lineagex(sql)
+    with open("output.json") as f:
+        full = json.load(f)
+    n = write_ndjson(
+        iter_lineage(sql=sql, target_schema="schema1", search_path_schema="schema1"),
+        str(tmp_path / "lineage.ndjson"),
+    )
+    with open(tmp_path / "lineage.ndjson") as f:
+        records = [json.loads(line) for line in f]
+    assert n == len(records) == len(full)
+    assert sorted(records, key=lambda r: r["table_name"]) == sorted(
+        full.values(), key=lambda r: r["table_name"]
+    )
+
+
+def test_stream_keeps_the_names_of_the_sql(run_lineagex, sql):
+    # output.json puts the schema table2 reads table1 with in front of it, the records are handed over before that
+    sql[1] = "CREATE TABLE table2 AS SELECT * FROM schema1.table1;"
+    run_lineagex(sql)
+    with open("output.json") as f:
+        full = json.load(f)
+    records = {
+        r["table_name"]: r
+        for r in iter_lineage(
+            sql=sql, target_schema="schema1", search_path_schema="schema1"
+        )
+    }
+    assert sorted(records) == ["schema1.other_table", "table1", "table2"]
+    assert records["table1"] == dict(full["schema1.table1"], table_name="table1")
+    assert records["table2"] == full["table2"]
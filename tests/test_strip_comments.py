@@ -0,0 +1,45 @@
+from lineagex.utils import remove_comments_pg, remove_comments_sqlite, split_sql
+
+
+def test_comments_inside_quotes_are_kept():
+    sql = (
+        "SELECT 'a -- b', \"c#d\" , x -- comment\nFROM t /* block */ WHERE y = 1 # more"
+    )
+    expected = "SELECT 'a -- b',\"c#d\",x FROM t WHERE y = 1"
+    assert remove_comments_pg(str1=sql) == expected
+    assert remove_comments_sqlite(str1=sql) == expected
+
+
+def test_postgres_quoting():
+    assert (
+        remove_comments_pg(str1="SELECT $f$ -- x, y $f$ , E'it\\'s -- z' FROM t")
+        == "SELECT $f$ -- x, y $f$,E'it\\'s -- z' FROM t"
+    )
+    assert remove_comments_pg(str1="SELECT a /* x /* y */ z */ FROM t") == (
+        "SELECT a FROM t"
+    )
+    assert remove_comments_pg(str1="SELECT $1 ,\n\n  a$b FROM t") == (
+        "SELECT $1,a$b FROM t"
+    )
+
+
+def test_split_sql_at_chunk_boundaries():
+    sql = (
+        "CREATE TABLE a AS SELECT 'x;y' AS c, $f$ ; $f$ AS d, \"q;\" -- c;\n"
+        "FROM t /* a; /* b; */ c; */;\n"
+        "SELECT E'it\\'s;' FROM b;\n"
+        "COPY t (a) FROM stdin;\n1\t;2\n\\.\n"
+        "INSERT INTO c VALUES (1);"
+    )
+    expected = [
+        "CREATE TABLE a AS SELECT 'x;y' AS c, $f$ ; $f$ AS d, \"q;\" -- c;\n"
+        "FROM t /* a; /* b; */ c; */",
+        "\nSELECT E'it\\'s;' FROM b",
+        "\nCOPY t (a) FROM stdin",
+        "INSERT INTO c VALUES (1)",
+    ]
+    for chunk_size in (1, 7, 64, 1024):
+        assert list(split_sql(reader=sql, chunk_size=chunk_size)) == expected
+    assert list(split_sql(reader="SELECT `a;b` FROM t # x;\n; ", postgres=False)) == [
+        "SELECT `a;b` FROM t # x;\n"
+    ]
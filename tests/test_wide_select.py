@@ -0,0 +1,30 @@
+from lineagex.ColumnLineageNoConn import ColumnLineageNoConn, _prefer_prefixed
+
+SIZE = 300
+SQL = "SELECT {} FROM sch.src s JOIN sch.other o ON s.id = o.id WHERE o.flag = 1 ORDER BY {}".format(
+    ", ".join("s.c{0} + o.d{0} AS x{0}".format(i) for i in range(SIZE)),
+    ", ".join("x{}".format(i) for i in range(0, SIZE, 10)),
+)
+
+
+def test_order_by_new_columns():
+    col_lineage = ColumnLineageNoConn(sql=SQL, input_table_dict={})
+    indirect = {"sch.src.id", "sch.other.id", "sch.other.flag"}
+    for i in range(0, SIZE, 10):
+        indirect.update(["sch.src.c{}".format(i), "sch.other.d{}".format(i)])
+    assert len(col_lineage.column_dict) == SIZE
+    for i in range(SIZE):
+        direct, ref = col_lineage.column_dict["x{}".format(i)]
+        assert sorted(direct) == ["sch.other.d{}".format(i), "sch.src.c{}".format(i)]
+        assert sorted(ref) == sorted(indirect)
+
+
+def test_prefer_prefixed():
+    prefixed = {"a": "t.a", "b": "t.B"}
+    assert _prefer_prefixed(cols=["a", "A", "c", "t.x"], prefixed=prefixed) == [
+        "c",
+        "t.x",
+        "t.a",
+        "t.a",
+    ]
+    assert _prefer_prefixed(cols=["B", "t.B"], prefixed=prefixed) == ["t.B"]